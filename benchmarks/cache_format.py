@@ -0,0 +1,124 @@
+"""
+Benchmark: on-disk cache formats
+Compares the legacy one-pretty-JSON-file-per-plan layout with the SQLite store
+using raw, zlib and lzma payloads. Reports bytes on disk and cold read latency
+(memory tier bypassed).
+
+Run with: python benchmarks/cache_format.py [--entries 500]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils import cache
+from common import make_plan, percentile
+
+
+def dir_size(path: Path) -> int:
+    """Bytes stored in path, leaving out SQLite's -wal/-shm scratch files"""
+    return sum(f.stat().st_size for f in path.iterdir()
+               if f.is_file() and not f.name.endswith(("-wal", "-shm")))
+
+
+def bench_legacy_json(plans: dict, workdir: Path) -> dict:
+    """The original format: cache/<key>.json with indent=2"""
+    for key, plan in plans.items():
+        with open(workdir / f"{key}.json", "w") as f:
+            json.dump({
+                "timestamp": datetime.now().isoformat(),
+                "request": "benchmark",
+                "result": plan
+            }, f, indent=2)
+
+    latencies = []
+    for key in plans:
+        start = time.perf_counter()
+        with open(workdir / f"{key}.json") as f:
+            data = json.load(f)
+        datetime.fromisoformat(data["timestamp"])
+        latencies.append(time.perf_counter() - start)
+
+    return {"bytes": dir_size(workdir), "latencies": latencies}
+
+
+def bench_sqlite(plans: dict, workdir: Path, compression: str) -> dict:
+    """The SQLite store with the given payload compression"""
+    saved = (cache.CACHE_DIR, cache.CACHE_COMPRESSION)
+    cache.CACHE_DIR = workdir
+    cache.CACHE_COMPRESSION = compression
+    cache._memory_cache.clear()
+    try:
+        # save_to_cache prints one line per write; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            for key, plan in plans.items():
+                cache.save_to_cache("benchmark", plan, cache_key=key)
+
+        conn = cache._get_connection()
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        # Size the store before reading: lookups write hit counts
+        size = dir_size(workdir)
+
+        latencies = []
+        for key in plans:
+            cache._memory_cache.clear()  # measure the disk tier only
+            start = time.perf_counter()
+            cache.get_cached_result("", cache_key=key)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        cache.CACHE_DIR, cache.CACHE_COMPRESSION = saved
+        cache._memory_cache.clear()
+
+    return {"bytes": size, "latencies": latencies}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=500, help="Number of plans to store")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    plans = {f"{i:016x}": make_plan(rng) for i in range(args.entries)}
+    raw_bytes = sum(len(p.encode()) for p in plans.values())
+
+    print("=" * 72)
+    print(f"📦 CACHE FORMAT BENCHMARK - {args.entries} plans, {raw_bytes / 1e6:.1f} MB of plan text")
+    print("=" * 72)
+    print(f"{'format':<16}{'on disk':>12}{'vs JSON':>10}{'read p50':>12}{'read p95':>12}")
+
+    baseline = None
+    runs = [("json (legacy)", None), ("sqlite raw", "none"), ("sqlite zlib", "zlib"), ("sqlite lzma", "lzma")]
+    for label, compression in runs:
+        with tempfile.TemporaryDirectory() as tmp:
+            if compression is None:
+                result = bench_legacy_json(plans, Path(tmp))
+            else:
+                result = bench_sqlite(plans, Path(tmp), compression)
+
+        baseline = baseline or result["bytes"]
+        print(
+            f"{label:<16}"
+            f"{result['bytes'] / 1e6:>10.2f}MB"
+            f"{result['bytes'] / baseline:>9.0%} "
+            f"{statistics.median(result['latencies']) * 1e6:>10.0f}µs"
+            f"{percentile(result['latencies'], 95) * 1e6:>10.0f}µs"
+        )
+
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
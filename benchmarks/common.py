@@ -0,0 +1,27 @@
+"""
+Helpers shared by the benchmark scripts: synthetic plans and percentiles
+"""
+
+import random
+
+SECTIONS = [
+    "## 🏔️ Best Destination: {place}\n{place} is perfect for trekking and photography. ",
+    "## 🏠 Top Accommodations\n1. **Snow Peak Homestay** - $18/night, Old Manali, free breakfast.\n",
+    "## 💰 Budget Breakdown\n- Transport: $80\n- Stay: $90\n- Food: $60\n- Activities: $120\n",
+    "## 📅 Day {day}\nMorning trek to the viewpoint, lunch at a local dhaba, sunset photography. ",
+]
+PLACES = ["Manali", "Bali", "Kasol", "Rishikesh", "Pokhara", "Ubud", "Leh", "Munnar"]
+
+
+def make_plan(rng: random.Random) -> str:
+    """Synthetic markdown plan of roughly the size Captain produces (10-40 KB)"""
+    place = rng.choice(PLACES)
+    parts = []
+    while sum(len(p) for p in parts) < rng.randint(10_000, 40_000):
+        parts.append(rng.choice(SECTIONS).format(place=place, day=len(parts)) * rng.randint(1, 4))
+    return "".join(parts)
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
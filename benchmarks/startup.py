@@ -0,0 +1,89 @@
+"""
+Benchmark: cold start import time
+Imports each entry point in a fresh interpreter and reports wall time, plus
+whether the heavy dependencies (crewai, litellm) were pulled in. A page that
+only reads the cache should never pay for them.
+
+Run with: python benchmarks/startup.py [--runs 5] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+
+# Entry points and what they import at startup
+TARGETS = {
+    "pipeline": "import pipeline",
+    "jobs (UI + workers)": "import jobs",
+    "main (CLI)": "import main",
+    "warm_cache": "import warm_cache",
+    "utils.cache": "from utils import cache",
+    "agents (first stage run)": "import pipeline; pipeline._task_creators()",
+}
+
+HEAVY_MODULES = ["crewai", "litellm", "duckduckgo_search"]
+
+_PROBE = """
+import sys, time, json, io, contextlib
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    {statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(statement: str) -> dict:
+    """Time one import in a fresh interpreter"""
+    code = _PROBE.format(src=str(SRC_DIR), statement=statement, heavy=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True, text=True, check=True,
+        env={"LITELLM_LOCAL_MODEL_COST_MAP": "True", **os.environ}
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = {}
+    for label, statement in TARGETS.items():
+        samples = [measure(statement) for _ in range(args.runs)]
+        seconds = [s["seconds"] for s in samples]
+        results[label] = {
+            "median_seconds": round(statistics.median(seconds), 4),
+            "max_seconds": round(max(seconds), 4),
+            "heavy_modules": samples[-1]["loaded"],
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("=" * 72)
+    print(f"🚀 STARTUP BENCHMARK - median of {args.runs} cold imports")
+    print("=" * 72)
+    print(f"{'entry point':<28}{'median':>10}{'max':>10}   heavy deps loaded")
+    for label, result in results.items():
+        print(
+            f"{label:<28}"
+            f"{result['median_seconds'] * 1000:>8.0f}ms"
+            f"{result['max_seconds'] * 1000:>8.0f}ms   "
+            f"{', '.join(result['heavy_modules']) or '-'}"
+        )
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""
+Benchmark suite: latency, memory and throughput of our own code
+LLM and search backends are stubbed, so the numbers are the orchestration
+overhead around the providers and are comparable from run to run. Covers
+the plan/stage cache, the community database tool and direct group matching
+at growing database sizes, search result formatting, crew construction and
+the full four-agent pipeline.
+
+Run with:
+    python benchmarks/suite.py                                   # report
+    python benchmarks/suite.py --output results.json             # also save JSON
+    python benchmarks/suite.py --compare results.json            # diff against a saved run
+    python benchmarks/suite.py --only cache --only community     # a subset
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# Stubbed backends must never reach the network (crewai telemetry, litellm's price list)
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils import cache, rate_limit
+from common import make_plan, percentile
+
+COMMUNITY_DB_SIZES = [6, 100, 1000, 10000]
+
+# Change in p50 that --compare flags as a regression / improvement
+COMPARE_THRESHOLD = 0.10
+
+_PLACES = ["Triund", "Kedarkantha", "Manali", "Kasol", "Spiti", "Rishikesh", "Bir Billing", "Goa"]
+_INTERESTS = ["trekking", "photography", "camping", "nature", "adventure", "culture", "food", "rafting"]
+
+
+# ---------------------------------------------------------------------------
+# Measuring
+# ---------------------------------------------------------------------------
+
+def measure(fn, iterations: int, setup=None, memory_iterations: int = 3) -> dict:
+    """
+    Time `fn` and record its peak memory
+
+    Timing runs without tracemalloc (it slows allocation-heavy code several
+    times over); the peak comes from a few extra traced calls.
+
+    Args:
+        fn: Zero-argument callable to benchmark (its output is discarded)
+        iterations: Timed calls
+        setup: Optional zero-argument callable run before every call, untimed
+        memory_iterations: Traced calls used for the memory peak
+
+    Returns:
+        dict with 'n', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms',
+        'throughput_per_s' and 'peak_kb'
+    """
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(iterations):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        peak = 0
+        for _ in range(memory_iterations):
+            if setup:
+                setup()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            fn()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+
+    return {
+        "n": iterations,
+        "p50_ms": round(percentile(samples, 50) * 1000, 4),
+        "p95_ms": round(percentile(samples, 95) * 1000, 4),
+        "p99_ms": round(percentile(samples, 99) * 1000, 4),
+        "mean_ms": round(statistics.mean(samples) * 1000, 4),
+        "throughput_per_s": round(len(samples) / sum(samples), 1) if sum(samples) else None,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data and stub backends
+# ---------------------------------------------------------------------------
+
+def make_groups(count: int, rng: random.Random) -> list:
+    """Community groups in the shape of tools.group_matching.MOCK_TRAVELERS"""
+    groups = []
+    for i in range(count):
+        start = rng.randint(1, 25)
+        groups.append({
+            "id": f"user_{i:05d}",
+            "name": f"Group {i}",
+            "destination": f"{rng.choice(_PLACES)} Trek",
+            "dates": f"2026-03-{start:02d} to 2026-03-{start + 3:02d}",
+            "group_size": rng.randint(2, 8),
+            "looking_for": rng.randint(0, 4),
+            "interests": rng.sample(_INTERESTS, 3),
+            "budget_per_person": rng.randint(150, 900),
+            "description": "Friendly group, all levels welcome.",
+            "contact": f"group{i}@example.com",
+        })
+    return groups
+
+
+def search_results(query: str, count: int = 5) -> list:
+    return [
+        {
+            "title": f"{query.title()} - travel guide {i}",
+            "body": "Everything you need to know before you go: when to visit, costs, routes. " * 4,
+            "href": f"https://example.com/{i}",
+        }
+        for i in range(count)
+    ]
+
+
+# Final answers per agent role, in the format crewai's executor parses
+_STUB_ANSWERS = {
+    "Travel Discovery Specialist": json.dumps({"destinations": [
+        {"name": p, "location": "Himachal Pradesh", "why": "Great treks", "best_time": "March-June",
+         "estimated_budget_usd": 400, "highlight": "Snow views"} for p in _PLACES[:3]
+    ]}),
+    "Accommodation Specialist": json.dumps({"destination": "Triund", "options": [
+        {"name": f"Stay {i}", "type": "hostel", "location": "McLeod Ganj", "price_per_night_usd": 15,
+         "feature": "Mountain view", "contact": "example.com"} for i in range(3)
+    ]}),
+    "Travel Community Connector": json.dumps({"groups": [
+        {"name": "Adventure Squad", "destination": "Triund Trek", "dates": "2026-03-15 to 2026-03-18",
+         "size": 4, "budget_usd": 400, "contact": "adventuresquad@example.com", "why": "Same dates"}
+    ]}),
+    "Travel Planning Coordinator": "## Your Plan\n" + "### Day\nTrek, eat, rest.\n" * 20,
+}
+
+
+def stub_llm_call(self, messages, callbacks=[]):
+    """Answers like a well-behaved model, immediately"""
+    system = str(messages[0].get("content", ""))
+    for role, answer in _STUB_ANSWERS.items():
+        if role in system:
+            return f"Thought: I now can give a great answer\nFinal Answer: {answer}"
+    return "Thought: I now can give a great answer\nFinal Answer: Done."
+
+
+@contextlib.contextmanager
+def stubbed_backends(workdir: Path):
+    """Stub the LLM, point the caches and limiter at `workdir` and lift rate limits"""
+    from crewai import LLM
+    import pipeline
+
+    saved = (LLM.call, cache.CACHE_DIR, rate_limit.RATE_LIMIT_DIR, rate_limit.RATE_LIMITS,
+             rate_limit.RATE_LIMIT_SHARED, pipeline.GROUP_MATCHING)
+    LLM.call = stub_llm_call
+    cache.CACHE_DIR = workdir
+    rate_limit.RATE_LIMIT_DIR = workdir
+    rate_limit.RATE_LIMITS = {m: {"rpm": 10**9, "tpm": 10**12} for m in rate_limit.RATE_LIMITS}
+    rate_limit.RATE_LIMIT_SHARED = False
+    rate_limit._limiters.clear()
+    pipeline.GROUP_MATCHING = "agent"  # run all four agents
+    try:
+        yield
+    finally:
+        (LLM.call, cache.CACHE_DIR, rate_limit.RATE_LIMIT_DIR, rate_limit.RATE_LIMITS,
+         rate_limit.RATE_LIMIT_SHARED, pipeline.GROUP_MATCHING) = saved
+        rate_limit._limiters.clear()
+        cache._memory_cache.clear()
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks (each returns {name: measurement})
+# ---------------------------------------------------------------------------
+
+def bench_cache(iterations: int) -> dict:
+    rng = random.Random(1)
+    plans = [make_plan(rng) for _ in range(64)]
+    keys = iter(range(10**9))
+    results = {}
+
+    saved_dir = cache.CACHE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        cache.CACHE_DIR = Path(tmp)
+        cache._memory_cache.clear()
+        try:
+            results["cache.save"] = measure(
+                lambda: cache.save_to_cache("benchmark", rng.choice(plans), cache_key=f"{next(keys):016x}"),
+                iterations
+            )
+            with contextlib.redirect_stdout(io.StringIO()):
+                cache.save_to_cache("benchmark", plans[0], cache_key="hit")
+            results["cache.lookup_memory_hit"] = measure(
+                lambda: cache.get_cached_result("", cache_key="hit"), iterations
+            )
+            results["cache.lookup_disk_hit"] = measure(
+                lambda: cache.get_cached_result("", cache_key="hit"), iterations,
+                setup=cache._memory_cache.clear
+            )
+            results["cache.lookup_miss"] = measure(
+                lambda: cache.get_cached_result("", cache_key="missing"), iterations
+            )
+        finally:
+            cache.CACHE_DIR = saved_dir
+            cache._memory_cache.clear()
+
+    return results
+
+
+def bench_community(iterations: int) -> dict:
+    from tools import community_db
+    from tools.group_matching import rank_groups
+
+    rng = random.Random(2)
+    saved = community_db.MOCK_TRAVELERS
+    results = {}
+    try:
+        for size in COMMUNITY_DB_SIZES:
+            groups = make_groups(size, rng)
+            community_db.MOCK_TRAVELERS = groups
+            n = max(5, iterations // max(1, size // 100))
+            results[f"community_db.run[{size}]"] = measure(
+                lambda: community_db.community_db_tool._run("trekking"), n
+            )
+            results[f"group_matching.rank[{size}]"] = measure(
+                lambda: rank_groups("Triund", ["Trekking", "Photography"], budget=500, groups=groups), n
+            )
+    finally:
+        community_db.MOCK_TRAVELERS = saved
+    return results
+
+
+def bench_search_formatting(iterations: int) -> dict:
+    from tools import web_search
+
+    tool = web_search.web_search_tool
+    queries = [f"best treks near {p}" for p in _PLACES]
+    web_search._search_cache.clear()
+    for query in queries:
+        # Served from the search cache: only normalizing and formatting is timed
+        web_search._search_cache.set(f"{web_search.normalize_query(query)}|{tool.max_results}",
+                                     search_results(query, tool.max_results))
+    cycle = iter(queries * (iterations // len(queries) + 4))
+    result = {"web_search.format": measure(lambda: tool._run(next(cycle)), iterations)}
+    web_search._search_cache.clear()
+    return result
+
+
+def bench_crew_construction(iterations: int) -> dict:
+    """Building a stage's task, agent copy and crew (import time: benchmarks/startup.py)"""
+    import pipeline
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        creators = pipeline._task_creators()
+
+    def build():
+        task = creators["discovery"]("Destination: Manali\nInterests: Trekking")
+        task.agent = task.agent.copy()
+        pipeline._crew_class()(agents=[task.agent], tasks=[task])
+
+    return {"crew.build": measure(build, iterations)}
+
+
+def bench_pipeline(iterations: int) -> dict:
+    import pipeline
+
+    trips = iter(range(10**9))
+
+    def trip():
+        # A new destination every time so no stage is served from the cache
+        return pipeline.TripRequest(destination=f"Place {next(trips)}", interests=["🥾 Trekking"],
+                                    budget=500, duration=5, looking_for_group=True)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, stubbed_backends(Path(tmp)):
+        n = max(3, iterations // 20)
+        results["pipeline.cold_plan"] = measure(lambda: pipeline.plan_trip(trip()), n, memory_iterations=1)
+        cached_trip = trip()
+        with contextlib.redirect_stdout(io.StringIO()):
+            pipeline.plan_trip(cached_trip)
+        results["pipeline.cached_plan"] = measure(lambda: pipeline.plan_trip(cached_trip), iterations)
+    return results
+
+
+BENCHMARKS = {
+    "cache": bench_cache,
+    "community": bench_community,
+    "search": bench_search_formatting,
+    "crew": bench_crew_construction,
+    "pipeline": bench_pipeline,
+}
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: dict, previous: dict) -> list:
+    """Lines describing p50 changes beyond COMPARE_THRESHOLD against a saved run"""
+    lines = []
+    for name, current in results.items():
+        before = previous.get(name)
+        if not before or not before.get("p50_ms") or current["p50_ms"] is None:
+            continue
+        change = current["p50_ms"] / before["p50_ms"] - 1
+        if abs(change) >= COMPARE_THRESHOLD:
+            marker = "🔺 slower" if change > 0 else "🟢 faster"
+            lines.append(f"{marker} {name}: {before['p50_ms']:.3f}ms → {current['p50_ms']:.3f}ms ({change:+.0%})")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per micro-benchmark")
+    parser.add_argument("--only", action="append", choices=list(BENCHMARKS),
+                        help="Run only these groups (repeatable)")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--compare", type=Path, help="Flag p50 changes against a saved JSON run")
+    args = parser.parse_args()
+
+    results = {}
+    for group in args.only or BENCHMARKS:
+        print(f"⏱️ {group}...", file=sys.stderr)
+        results.update(BENCHMARKS[group](args.iterations))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+
+    print("=" * 86)
+    print(f"📊 BENCHMARK SUITE - stubbed LLM/search, {args.iterations} iterations")
+    print("=" * 86)
+    print(f"{'benchmark':<32}{'p50':>10}{'p95':>10}{'p99':>10}{'ops/s':>12}{'peak mem':>12}")
+    for name, r in results.items():
+        throughput = f"{r['throughput_per_s']:,.0f}" if r["throughput_per_s"] else "-"
+        peak = f"{r['peak_kb']:,.0f}KB" if r["peak_kb"] is not None else "-"
+        print(f"{name:<32}{r['p50_ms']:>8.3f}ms{r['p95_ms']:>8.3f}ms{r['p99_ms']:>8.3f}ms"
+              f"{throughput:>12}{peak:>12}")
+    print("=" * 86)
+
+    if args.compare:
+        previous = json.loads(args.compare.read_text())["results"]
+        changes = compare(results, previous)
+        print(f"Compared with {args.compare}:")
+        print("\n".join(changes) if changes else f"No p50 change beyond {COMPARE_THRESHOLD:.0%}")
+        print("=" * 86)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,6 @@
 ### Finds perfect travel destinations based on user mood and preferences
 
 from crewai import Agent
-from crewai import LLM
-import os
 from dotenv import load_dotenv
 
 ## load environment variables from .env file
@@ -15,13 +13,11 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent ))
 
 from tools.web_search import web_search_tool
+from utils.llm import create_llm
 
 
-# Configure the LLM (brain) for Atlas
-atlas_llm = LLM(
-    model="groq/llama-3.1-8b-instant",
-    api_key=os.getenv("GROQ_API_KEY")
-)
+# Configure the LLM (brain) for Atlas (model tier and fallbacks from utils.llm.ROUTES)
+atlas_llm = create_llm("atlas")
 
 # Create Atlas - The Discovery Agent
 atlas = Agent(
@@ -38,6 +34,7 @@ atlas = Agent(
     IMPORTANT: You can ONLY use the 'Web Search' tool to find destinations.
     When searching, use queries like: 'best trekking destinations [region]',
     'budget travel [country]', 'adventure travel under $500'.
+    To search several at once, pass them together as "queries": [...].
     Do NOT try to use any other tools.""",
     tools=[web_search_tool],
     llm=atlas_llm,
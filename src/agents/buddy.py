@@ -2,8 +2,7 @@
 ## connect travelers with similar intrests and finds travel groups
 
 
-from crewai import Agent, LLM
-import os
+from crewai import Agent
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -16,13 +15,11 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from tools.community_db import community_db_tool
 from tools.web_search import web_search_tool
+from utils.llm import create_llm
 
 
-# Configure the LLM (brain) for Buddy
-buddy_llm = LLM(
-    model="groq/llama-3.1-8b-instant",
-    api_key=os.getenv("GROQ_API_KEY")
-)
+# Configure the LLM (brain) for Buddy (model tier and fallbacks from utils.llm.ROUTES)
+buddy_llm = create_llm("buddy")
 
 
 # Create Buddy - The Community Agent
@@ -3,8 +3,7 @@ Captain - The Orchestrator Agent
 Coordinates Atlas, Shelter, and Buddy to create complete travel plans
 """
 
-from crewai import Agent, LLM
-import os
+from crewai import Agent
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -15,12 +14,11 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from utils.llm import create_llm
 
-# Configure the LLM (brain) for Captain
-captain_llm = LLM(
-    model="groq/llama-3.1-8b-instant",
-    api_key=os.getenv("GROQ_API_KEY")
-)
+
+# Configure the LLM (brain) for Captain (model tier and fallbacks from utils.llm.ROUTES)
+captain_llm = create_llm("captain")
 
 # Create Captain - The Orchestrator Agent
 captain = Agent(
@@ -3,8 +3,7 @@ Shelter - The Accommodation Agent
 Finds perfect hotels, homestays, and accommodations based on budget and preferences
 """
 
-from crewai import Agent, LLM
-import os
+from crewai import Agent
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -16,13 +15,11 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from tools.web_search import web_search_tool
+from utils.llm import create_llm
 
 
-# Configure the LLM (brain) for Shelter
-shelter_llm = LLM(
-    model="groq/llama-3.1-8b-instant",
-    api_key=os.getenv("GROQ_API_KEY")
-)
+# Configure the LLM (brain) for Shelter (model tier and fallbacks from utils.llm.ROUTES)
+shelter_llm = create_llm("shelter")
 
 # Create Shelter - The Accommodation Agent
 
@@ -40,6 +37,7 @@ shelter = Agent(
     IMPORTANT: You can ONLY use the 'Web Search' tool to find accommodations. 
     When searching, use queries like: 'budget hotels in [destination]', 
     'homestays near [location]', 'guesthouses [city] under $30'.
+    To search several at once, pass them together as "queries": [...].
     Do NOT try to use any other tools.""",
     tools=[web_search_tool],
     llm=shelter_llm,
@@ -0,0 +1,243 @@
+"""
+Batch planning
+Generates plans for a JSONL file of requests (e.g. partner itinerary
+templates) with a fixed number of workers. Results are appended to an output
+JSONL as each plan finishes; the output doubles as the checkpoint, so a rerun
+after a crash skips every request that is already done (failed ones and
+incomplete plans, where some agents ran out of time, are retried and get a
+new line - the last line per id wins).
+
+Input lines are planner form fields or a free-text request, with an optional id:
+    {"id": "manali-trek", "destination": "Manali", "interests": ["🥾 Trekking"], "budget": 500}
+    {"id": "goa-relax", "request": "A relaxed week in Goa under $800"}
+
+Usage:
+    python src/batch.py requests.jsonl plans.jsonl
+    python src/batch.py requests.jsonl plans.jsonl --workers 4 --min-interval 2
+    python src/batch.py requests.jsonl plans.jsonl --fresh    # ignore earlier results
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Iterator
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pipeline import TripRequest, plan_trip
+from utils.rate_limit import RateGate, get_rate_limit_stats, rate_limit_wait
+
+
+def read_requests(path: Path) -> Iterator[tuple]:
+    """
+    Stream (id, TripRequest or error message) pairs from a JSONL file
+
+    Requests without an id are named after their line number. A line that
+    can't be parsed yields its error instead of stopping the batch.
+    """
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            request_id = f"line-{line_number}"
+            try:
+                record = json.loads(line)
+                request_id = str(record.pop("id", request_id))
+                if "request" in record:
+                    trip = TripRequest.from_text(
+                        record["request"], looking_for_group=record.get("looking_for_group", True)
+                    )
+                else:
+                    trip = TripRequest(**record)
+            except Exception as e:
+                yield request_id, f"Invalid request: {e}"
+                continue
+            yield request_id, trip
+
+
+def completed_ids(path: Path) -> set:
+    """Ids already planned successfully according to an earlier output file"""
+    done = set()
+    if not path.exists():
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by a crash
+            if record.get("status") == "done":
+                done.add(record["id"])
+    return done
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def _ends_mid_line(path: Path) -> bool:
+    if not path.exists() or path.stat().st_size == 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, 2)
+        return f.read(1) != b"\n"
+
+
+def plan_one(request_id: str, trip: TripRequest, gate: RateGate, max_retries: int,
+             deadline_seconds: float = None) -> dict:
+    """Plan one request; returns its output record (never raises)"""
+    start = time.time()
+    error = "No attempts allowed (max_retries < 1)"
+    for attempt in range(max_retries):
+        gate.wait()
+        try:
+            plan = plan_trip(trip, deadline_seconds=deadline_seconds)
+            degraded = plan.get("degraded", [])
+            return {
+                "id": request_id,
+                # Incomplete plans aren't cached; not "done" so a rerun tries again
+                "status": "degraded" if degraded else "done",
+                "cached": plan["cached"],
+                "degraded": degraded,
+                "seconds": round(time.time() - start, 1),
+                "request": trip.model_dump(mode="json"),
+                "plan": plan["result"],
+            }
+        except Exception as e:
+            wait_time = rate_limit_wait(e)
+            if wait_time is None or attempt == max_retries - 1:
+                error = str(e)
+                break
+            print(f"⏳ Rate limit hit on {request_id}. Pausing all workers {int(wait_time)}s...")
+            gate.pause(wait_time)
+    return {"id": request_id, "status": "failed", "seconds": round(time.time() - start, 1), "error": error}
+
+
+def run_batch(input_path: Path, output_path: Path, workers: int = 2, min_interval: float = 2.0,
+              max_retries: int = 3, deadline_seconds: float = None, fresh: bool = False) -> dict:
+    """
+    Plan every request in `input_path`, appending results to `output_path`
+
+    Args:
+        input_path: JSONL of requests (see module docstring)
+        output_path: JSONL the results are appended to, one line per request
+        workers: Plans generated at once
+        min_interval: Min seconds between plan starts across all workers
+        max_retries: Attempts per plan when rate limited
+        deadline_seconds: Per-plan deadline (defaults to PLAN_DEADLINE_SECONDS)
+        fresh: Start over instead of skipping requests done in an earlier run
+
+    Returns:
+        dict with counts ('done', 'cached', 'degraded' (incomplete plans),
+        'failed', 'skipped'),
+        'seconds', 'tokens', 'plans_per_minute' and 'tokens_per_minute'
+    """
+    if fresh and output_path.exists():
+        output_path.unlink()
+    done_before = completed_ids(output_path)
+    if done_before:
+        print(f"↩️ Resuming: {len(done_before)} requests already done in {output_path}")
+
+    summary = {"done": 0, "cached": 0, "degraded": 0, "failed": 0, "skipped": 0}
+    tokens_before = sum(s["tokens"] for s in get_rate_limit_stats().values())
+    start = time.time()
+    gate = RateGate(min_interval)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "a") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        if _ends_mid_line(output_path):
+            out.write("\n")  # a crash cut the last line short; start a new one
+
+        def record(result):
+            # Only this thread writes, one complete line per request
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            summary[result["status"]] += 1
+            if result["status"] == "done":
+                summary["cached"] += result["cached"]
+                timing = "cached" if result["cached"] else f"{result['seconds']}s"
+                print(f"✅ {result['id']} ({timing})")
+            elif result["status"] == "degraded":
+                print(f"⏱️ {result['id']} incomplete ({', '.join(result['degraded'])} ran out of time)")
+            else:
+                print(f"❌ {result['id']} - {result['error']}")
+
+        def collect(futures):
+            """Record whatever finished (waiting for at least one); returns the rest"""
+            done, pending = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                record(future.result())
+            return pending
+
+        running = set()
+        for request_id, trip in read_requests(input_path):
+            if request_id in done_before:
+                summary["skipped"] += 1
+                continue
+            if isinstance(trip, str):
+                record({"id": request_id, "status": "failed", "seconds": 0, "error": trip})
+                continue
+            # Keep only a few requests queued so large files are streamed, not loaded
+            if len(running) >= workers * 2:
+                running = collect(running)
+            running.add(pool.submit(plan_one, request_id, trip, gate, max_retries, deadline_seconds))
+
+        while running:
+            running = collect(running)
+
+    elapsed = time.time() - start
+    tokens = sum(s["tokens"] for s in get_rate_limit_stats().values()) - tokens_before
+    minutes = max(elapsed, 1e-9) / 60
+    summary.update({
+        "seconds": round(elapsed, 1),
+        "tokens": tokens,
+        "plans_per_minute": round(summary["done"] / minutes, 2),
+        "tokens_per_minute": round(tokens / minutes),
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate travel plans for a JSONL file of requests")
+    parser.add_argument("input", type=Path, help="JSONL of requests (form fields or {'request': text})")
+    parser.add_argument("output", type=Path, help="JSONL the plans are appended to (also the checkpoint)")
+    parser.add_argument("--workers", type=_positive_int, default=2, help="Plans generated concurrently")
+    parser.add_argument("--min-interval", type=float, default=2.0,
+                        help="Seconds between plan starts across all workers")
+    parser.add_argument("--max-retries", type=_positive_int, default=3, help="Attempts per plan when rate limited")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Seconds allowed per plan (defaults to PLAN_DEADLINE_SECONDS)")
+    parser.add_argument("--fresh", action="store_true", help="Discard earlier results instead of resuming")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"📦 BATCH PLANNING - {args.input} → {args.output}")
+    print("=" * 60)
+
+    summary = run_batch(
+        args.input,
+        args.output,
+        workers=args.workers,
+        min_interval=args.min_interval,
+        max_retries=args.max_retries,
+        deadline_seconds=args.deadline,
+        fresh=args.fresh
+    )
+
+    print("=" * 60)
+    print(f"Done: {summary['done']} ({summary['cached']} from cache) | Incomplete: {summary['degraded']} | "
+          f"Failed: {summary['failed']} | Skipped: {summary['skipped']}")
+    print(f"⏱️ {summary['seconds']}s | {summary['plans_per_minute']} plans/min | "
+          f"{summary['tokens_per_minute']:,} tokens/min ({summary['tokens']:,} tokens)")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
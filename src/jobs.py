@@ -0,0 +1,577 @@
+"""
+Background job queue for plan generation
+The UI submits a job and polls for its status; a pool of worker processes
+drains the queue and runs the crews. Rate limit waits happen in the queue
+(the job is rescheduled), never in a web session.
+
+Admission control: a global cap on running plans, per-session and per-IP
+quotas, a bounded queue, and fair ordering so one busy user can't starve
+everyone else. A rate limit pauses the whole queue rather than letting every
+worker run into it. Rebuilds of stale cached plans are queued as background
+jobs that only run when no user is waiting.
+
+Usage:
+    python src/jobs.py --workers 4     # run a worker pool next to the UI
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pipeline import TripRequest, plan_trip
+from utils.rate_limit import rate_limit_wait
+
+# Queue settings
+JOBS_DIR = Path(__file__).parent.parent / "cache"
+JOBS_DB_NAME = "jobs.db"
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL = 0.5
+JOB_MAX_WAIT_SECONDS = int(os.getenv("JOB_MAX_WAIT_SECONDS", "900"))  # UI gives up polling after this
+
+# Admission control (the running cap applies across every worker process)
+JOB_MAX_RUNNING = int(os.getenv("JOB_MAX_RUNNING", "4"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "100"))
+JOB_SESSION_QUOTA = int(os.getenv("JOB_SESSION_QUOTA", "2"))  # queued + running per session
+JOB_IP_QUOTA = int(os.getenv("JOB_IP_QUOTA", "6"))  # queued + running per client IP
+JOB_SCHEDULING = os.getenv("JOB_SCHEDULING", "fair")  # fair | fifo
+
+# A worker that hasn't checked in for this long is presumed dead and its
+# running job goes back on the queue
+WORKER_HEARTBEAT_SECONDS = 5
+WORKER_TIMEOUT_SECONDS = 30
+
+# Streamed plan text is written to the job row at most this often
+PARTIAL_FLUSH_SECONDS = 0.5
+
+# Finished jobs are kept this long so late pollers can still read them
+JOB_RETENTION_HOURS = 24
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,          -- queued | running | done | failed
+    request TEXT NOT NULL,         -- TripRequest JSON
+    session TEXT,
+    client_ip TEXT,
+    weight REAL NOT NULL DEFAULT 1,  -- share of workers under fair scheduling
+    background INTEGER NOT NULL DEFAULT 0,  -- 1 for stale plan rebuilds (run after user jobs)
+    submitted_at REAL NOT NULL,
+    available_at REAL NOT NULL,    -- not claimed before this (rate limit backoff)
+    started_at REAL,
+    finished_at REAL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    stage TEXT,                    -- stage currently running
+    stages TEXT,                   -- JSON {stage: cached} of finished stages
+    partial TEXT,                  -- Captain's plan so far while streaming
+    message TEXT,                  -- e.g. rate limit notice
+    plan TEXT,                     -- JSON plan_trip() result when done
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, available_at, submitted_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_session ON jobs(session, status);
+
+-- Queue-wide settings such as a rate limit pause
+CREATE TABLE IF NOT EXISTS queue_meta (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    pid INTEGER,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+# Fair order: a job's rank is how many jobs its session already has running or
+# queued ahead of it (scaled by weight), so sessions take turns; ties are FIFO.
+# Background jobs always come after user jobs.
+_FAIR_ORDER = """
+    ORDER BY j.background, (
+        SELECT COUNT(*) FROM jobs r
+        WHERE r.session IS j.session
+          AND (r.status = 'running' OR (r.status = 'queued' AND r.submitted_at < j.submitted_at))
+    ) / j.weight, j.submitted_at
+"""
+_FIFO_ORDER = "ORDER BY j.background, j.submitted_at"
+
+
+class AdmissionError(Exception):
+    """A job was turned away (quota reached or queue full); the message is user-facing"""
+
+
+# One connection per thread, like the cache database
+_local = threading.local()
+
+# Worker processes started by this process (see ensure_workers)
+_local_workers = []
+_workers_lock = threading.Lock()
+
+
+def _get_connection() -> sqlite3.Connection:
+    """Open (or reuse) this thread's connection to the jobs database"""
+    db_path = JOBS_DIR / JOBS_DB_NAME
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == db_path and _local.pid == os.getpid():
+        return conn
+
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    _local.conn = conn
+    _local.path = db_path
+    _local.pid = os.getpid()  # connections must not cross a fork
+    return conn
+
+
+def _row_to_job(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["stages"] = json.loads(job["stages"]) if job["stages"] else {}
+    job["plan"] = json.loads(job["plan"]) if job["plan"] else None
+    return job
+
+
+def _queue_order() -> str:
+    return _FIFO_ORDER if JOB_SCHEDULING == "fifo" else _FAIR_ORDER
+
+
+def submit_job(trip: TripRequest, session: str = "", client_ip: str = "",
+               weight: float = 1.0) -> str:
+    """
+    Queue a plan for generation
+
+    Args:
+        trip: The structured request
+        session: Who asked (quota and fair-share unit)
+        client_ip: Caller's address (quota across sessions from one client)
+        weight: Relative share of workers under fair scheduling
+
+    Returns:
+        The job id to poll with get_job
+
+    Raises:
+        AdmissionError: Quota reached or the queue is full
+    """
+    job_id = uuid.uuid4().hex[:16]
+    conn = _get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        if queued >= JOB_MAX_QUEUED:
+            raise AdmissionError("We're planning a lot of trips right now. Please try again in a few minutes.")
+
+        active = "status IN ('queued', 'running')"
+        if session:
+            count = conn.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE session = ? AND {active}", (session,)
+            ).fetchone()[0]
+            if count >= JOB_SESSION_QUOTA:
+                raise AdmissionError(f"You already have {count} plans in progress. "
+                                     f"Please wait for one to finish.")
+        if client_ip:
+            count = conn.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE client_ip = ? AND {active}", (client_ip,)
+            ).fetchone()[0]
+            if count >= JOB_IP_QUOTA:
+                raise AdmissionError("Too many plans are in progress from your network. "
+                                     "Please wait for one to finish.")
+
+        now = time.time()
+        conn.execute(
+            "INSERT INTO jobs (job_id, status, request, session, client_ip, weight, "
+            "submitted_at, available_at) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+            (job_id, trip.model_dump_json(), session, client_ip, weight, now, now)
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return job_id
+
+
+def submit_refresh(trip: TripRequest):
+    """
+    Queue a background rebuild of a stale cached plan
+
+    Skipped (returns None) when a rebuild of the same request is already
+    pending or the queue is full: the stale plan is still being served.
+
+    Returns:
+        The job id, or None if nothing was queued
+    """
+    request = trip.model_dump_json()
+    conn = _get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        pending = conn.execute(
+            "SELECT 1 FROM jobs WHERE background = 1 AND request = ? "
+            "AND status IN ('queued', 'running')", (request,)
+        ).fetchone()
+        queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        job_id = None
+        if pending is None and queued < JOB_MAX_QUEUED:
+            job_id = uuid.uuid4().hex[:16]
+            now = time.time()
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, request, background, submitted_at, available_at) "
+                "VALUES (?, 'queued', ?, 1, ?, ?)",
+                (job_id, request, now, now)
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return job_id
+
+
+def get_job(job_id: str):
+    """
+    Current state of a job
+
+    Returns:
+        dict with the job's columns ('stages' and 'plan' decoded), or None
+    """
+    conn = _get_connection()
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    finally:
+        conn.row_factory = None
+    return _row_to_job(row) if row else None
+
+
+def queue_position(job_id: str):
+    """
+    Where a queued job stands in the current scheduling order
+
+    Returns:
+        dict with 'position' (1-based), 'queued' (total waiting) and
+        'eta_seconds' (rough wait, None until some jobs have finished),
+        or None if the job isn't queued
+    """
+    order = [row[0] for row in _get_connection().execute(
+        f"SELECT j.job_id FROM jobs j WHERE j.status = 'queued' {_queue_order()}"
+    )]
+    if job_id not in order:
+        return None
+
+    position = order.index(job_id) + 1
+    average = _get_connection().execute(
+        "SELECT AVG(finished_at - started_at) FROM ("
+        "SELECT finished_at, started_at FROM jobs WHERE status = 'done' "
+        "ORDER BY finished_at DESC LIMIT 20)"
+    ).fetchone()[0]
+    eta = None
+    if average is not None:
+        rounds = (position + JOB_MAX_RUNNING - 1) // JOB_MAX_RUNNING
+        eta = rounds * average + max(0.0, paused_for())
+    return {"position": position, "queued": len(order), "eta_seconds": eta}
+
+
+def pause_queue(seconds: float):
+    """Stop every worker from claiming jobs for `seconds` (e.g. after a rate limit)"""
+    _get_connection().execute(
+        "INSERT INTO queue_meta (name, value) VALUES ('paused_until', ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)",
+        (time.time() + seconds,)
+    )
+
+
+def paused_for() -> float:
+    """Seconds until the queue resumes (0 if not paused)"""
+    row = _get_connection().execute(
+        "SELECT value FROM queue_meta WHERE name = 'paused_until'"
+    ).fetchone()
+    return max(0.0, row[0] - time.time()) if row else 0.0
+
+
+def claim_job(worker_id: str):
+    """
+    Take the next runnable job off the queue
+
+    Nothing is claimed while the queue is paused or JOB_MAX_RUNNING jobs are
+    already running. Otherwise jobs are taken in JOB_SCHEDULING order.
+
+    Returns:
+        The claimed job dict, or None if nothing is runnable
+    """
+    if paused_for() > 0:
+        return None
+
+    conn = _get_connection()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+        row = None
+        if running < JOB_MAX_RUNNING:
+            row = conn.execute(
+                f"SELECT j.job_id FROM jobs j WHERE j.status = 'queued' AND j.available_at <= ? "
+                f"{_queue_order()} LIMIT 1",
+                (now,)
+            ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, "
+                "attempts = attempts + 1, message = NULL WHERE job_id = ?",
+                (worker_id, now, row[0])
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return get_job(row[0]) if row else None
+
+
+def update_job(job_id: str, **fields):
+    """Set columns on a job (dict values are stored as JSON)"""
+    if not fields:
+        return
+    values = [json.dumps(v) if isinstance(v, dict) else v for v in fields.values()]
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    _get_connection().execute(
+        f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*values, job_id)
+    )
+
+
+def complete_job(job_id: str, plan: dict):
+    update_job(job_id, status="done", plan=plan, partial=None, stage=None,
+               message=None, finished_at=time.time())
+
+
+def fail_job(job_id: str, error: str):
+    update_job(job_id, status="failed", error=error, partial=None, finished_at=time.time())
+
+
+def retry_job(job_id: str, delay: float, message: str):
+    """Put a job back on the queue, runnable again after `delay` seconds"""
+    update_job(job_id, status="queued", worker=None, stage=None, partial=None,
+               message=message, available_at=time.time() + delay)
+
+
+def requeue_stuck_jobs(max_attempts: int = JOB_MAX_ATTEMPTS) -> int:
+    """
+    Put running jobs whose worker stopped heartbeating back on the queue
+
+    A job that has already been tried `max_attempts` times is failed instead,
+    so a request that crashes its worker doesn't take down workers forever.
+
+    Returns:
+        Number of jobs requeued
+    """
+    cutoff = time.time() - WORKER_TIMEOUT_SECONDS
+    stuck = ("status = 'running' AND worker NOT IN "
+             "(SELECT worker_id FROM workers WHERE heartbeat_at >= ?)")
+    conn = _get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            f"UPDATE jobs SET status = 'failed', partial = NULL, finished_at = ?, "
+            f"error = 'The planner stopped while working on this trip ' || attempts || ' times' "
+            f"WHERE {stuck} AND attempts >= ?",
+            (time.time(), cutoff, max_attempts)
+        )
+        requeued = conn.execute(
+            f"UPDATE jobs SET status = 'queued', worker = NULL, stage = NULL, partial = NULL, "
+            f"message = 'Restarted after a worker stopped' WHERE {stuck}",
+            (cutoff,)
+        ).rowcount
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return requeued
+
+
+def clear_old_jobs() -> int:
+    """Delete finished jobs past JOB_RETENTION_HOURS; returns how many"""
+    cutoff = time.time() - JOB_RETENTION_HOURS * 3600
+    return _get_connection().execute(
+        "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+    ).rowcount
+
+
+def active_workers() -> int:
+    """Workers (in any process) that heartbeated recently"""
+    cutoff = time.time() - WORKER_TIMEOUT_SECONDS
+    return _get_connection().execute(
+        "SELECT COUNT(*) FROM workers WHERE heartbeat_at >= ?", (cutoff,)
+    ).fetchone()[0]
+
+
+def get_queue_stats() -> dict:
+    """Job counts by status plus live workers"""
+    rows = _get_connection().execute(
+        "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+    ).fetchall()
+    stats = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+    stats.update(dict(rows))
+    stats["workers"] = active_workers()
+    stats["max_running"] = JOB_MAX_RUNNING
+    stats["paused_for"] = round(paused_for(), 1)
+    return stats
+
+
+def _heartbeat(worker_id: str):
+    _get_connection().execute(
+        "INSERT INTO workers (worker_id, pid, heartbeat_at) VALUES (?, ?, ?) "
+        "ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+        (worker_id, os.getpid(), time.time())
+    )
+
+
+def run_job(job: dict, max_attempts: int = JOB_MAX_ATTEMPTS) -> str:
+    """
+    Generate the plan for a claimed job, recording progress as it goes
+
+    Returns:
+        The job's new status ('done', 'queued' for a rate limit retry, or 'failed')
+    """
+    job_id = job["job_id"]
+    trip = TripRequest.model_validate_json(job["request"])
+    stages = {}
+    streamed = {"text": "", "flushed_at": 0.0}
+
+    def on_progress(stage, cached=None):
+        if cached is None:
+            update_job(job_id, stage=stage)
+        else:
+            stages[stage] = cached
+            update_job(job_id, stages=stages)
+
+    def on_token(text):
+        streamed["text"] += text
+        if time.time() - streamed["flushed_at"] > PARTIAL_FLUSH_SECONDS:
+            update_job(job_id, partial=streamed["text"])
+            streamed["flushed_at"] = time.time()
+
+    try:
+        # A background rebuild must not be answered with the stale plan it replaces
+        extra = {"allow_stale": False} if job.get("background") else {}
+        plan = plan_trip(trip, on_progress=on_progress, on_token=on_token, **extra)
+    except Exception as e:
+        wait_time = rate_limit_wait(e)
+        if wait_time is not None and job["attempts"] < max_attempts:
+            # The limit is shared by every worker: hold the whole queue back
+            # instead of letting each job hit it in turn. Stages that finished
+            # are cached, so the retry only redoes the failed one.
+            pause_queue(wait_time)
+            retry_job(job_id, wait_time, f"Rate limit hit. Retrying in {int(wait_time)}s "
+                                         f"(attempt {job['attempts']}/{max_attempts})")
+            return "queued"
+        fail_job(job_id, str(e))
+        return "failed"
+
+    complete_job(job_id, plan)
+    return "done"
+
+
+def run_worker(worker_id: str = None, poll_interval: float = JOB_POLL_INTERVAL,
+               stop: threading.Event = None, exit_when_idle: bool = False):
+    """
+    Drain the queue until stopped
+
+    Args:
+        worker_id: Name shown on claimed jobs (defaults to host:pid)
+        poll_interval: Seconds to sleep when the queue is empty
+        stop: Event that ends the loop after the current job
+        exit_when_idle: Return as soon as no job is runnable (tests, one-off drains)
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    stop = stop or threading.Event()
+
+    # Heartbeat from a side thread so long crew runs don't look like dead workers
+    def beat():
+        while not stop.wait(WORKER_HEARTBEAT_SECONDS):
+            _heartbeat(worker_id)
+
+    _heartbeat(worker_id)
+    threading.Thread(target=beat, daemon=True, name=f"heartbeat-{worker_id}").start()
+
+    try:
+        while not stop.is_set():
+            requeue_stuck_jobs()
+            job = claim_job(worker_id)
+            if job is None:
+                if exit_when_idle:
+                    break
+                stop.wait(poll_interval)
+                continue
+
+            trip_name = json.loads(job["request"]).get("destination") or job["job_id"]
+            print(f"🛠️ [{worker_id}] Planning {trip_name} (job {job['job_id']})")
+            status = run_job(job)
+            print(f"🛠️ [{worker_id}] Job {job['job_id']} {status}")
+    finally:
+        stop.set()
+        _get_connection().execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+
+def _worker_process(index: int):
+    run_worker(f"{socket.gethostname()}:{os.getpid()}:{index}")
+
+
+def start_workers(count: int = JOB_WORKERS) -> list:
+    """Start `count` worker processes; returns the Process objects"""
+    processes = []
+    for index in range(count):
+        process = multiprocessing.Process(target=_worker_process, args=(index,), daemon=True,
+                                          name=f"plan-worker-{index}")
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def ensure_workers(count: int = JOB_WORKERS) -> int:
+    """
+    Make sure someone is draining the queue
+
+    Used by the UI so a single `streamlit run` works out of the box; when a
+    separate worker pool (`python src/jobs.py`) is running, nothing is started.
+
+    Returns:
+        Number of live workers
+    """
+    with _workers_lock:
+        alive = [p for p in _local_workers if p.is_alive()]
+        if not alive and active_workers() == 0:
+            alive = start_workers(count)
+        _local_workers[:] = alive
+    return max(len(alive), active_workers())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run plan generation workers")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="Worker processes to run")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"🛠️ PLAN WORKERS - {args.workers} processes on {JOBS_DIR / JOBS_DB_NAME}")
+    print("=" * 60)
+
+    clear_old_jobs()
+    processes = start_workers(args.workers)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("\n👋 Stopping workers...")
+
+
+if __name__ == "__main__":
+    main()
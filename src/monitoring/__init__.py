@@ -7,8 +7,7 @@ from .logger import (
     setup_logger,
     log_agent_action,
     log_api_call,
-    log_error,
-    default_logger
+    log_error
 )
 
 from .costs import (
@@ -23,6 +22,13 @@ from .metrics import (
     track_time
 )
 
+def __getattr__(name):
+    # See logger.__getattr__: don't open the log file on import
+    if name == "default_logger":
+        return setup_logger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = [
     # Logger
     'setup_logger',
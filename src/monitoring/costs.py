@@ -14,6 +14,7 @@ COSTS_FILE = COSTS_DIR / "usage_costs.json"
 COST_PER_MILLION_TOKENS = {
     "llama-3.3-70b-versatile": 0.59,
     "llama-3.1-8b-instant": 0.05,
+    "gpt-4o-mini": 0.15,
 }
 
 
@@ -6,9 +6,8 @@ import logging
 from datetime import datetime
 from pathlib import Path
 
-# Create logs directory
+# Logs directory (created when the first logger is set up)
 LOGS_DIR = Path(__file__).parent.parent.parent / "logs"
-LOGS_DIR.mkdir(exist_ok=True)
 
 # Log file
 LOG_FILE = LOGS_DIR / f"travel_agent_{datetime.now().strftime('%Y%m%d')}.log"
@@ -32,6 +31,7 @@ def setup_logger(name: str = "travel_agent", level: str = "INFO"):
     console_handler.setFormatter(console_format)
     
     # File handler
+    LOGS_DIR.mkdir(exist_ok=True)
     file_handler = logging.FileHandler(LOG_FILE)
     file_handler.setLevel(logging.DEBUG)
     file_format = logging.Formatter(
@@ -73,4 +73,8 @@ def log_error(component: str, error: Exception, context: dict = None):
     logger.error(f"[ERROR: {component}] {str(error)}{context_str}", exc_info=True)
 
 
-default_logger = setup_logger()
\ No newline at end of file
+def __getattr__(name):
+    # The default logger opens the log file, so it is only created when used
+    if name == "default_logger":
+        return setup_logger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
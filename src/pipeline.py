@@ -0,0 +1,619 @@
+"""
+Staged planning pipeline
+Runs Atlas, Shelter, Buddy and Captain as separate stages so every stage's
+output is cached on its own and only stages whose inputs changed re-run.
+Stages form a dependency graph; independent stages run concurrently.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date
+from pydantic import BaseModel, Field
+from typing import Callable, List, Optional
+import asyncio
+import functools
+import os
+import sys
+import threading
+import weakref
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+# Import cache utilities
+from utils.cache import (
+    get_cached_result,
+    save_to_cache,
+    build_plan_cache_key,
+    build_stage_cache_key,
+    budget_bucket,
+    duration_bucket,
+    nightly_budget_bucket,
+    clean_label,
+    normalize_request,
+    fingerprint,
+    claim_inflight,
+    release_inflight,
+    is_inflight
+)
+from utils.budget import (
+    PLAN_DEADLINE_SECONDS,
+    BudgetExceeded,
+    Deadline,
+    StageBudget,
+    stage_budget
+)
+from utils.singleflight import SingleFlight
+from tasks.models import CommunityResult, GroupMatch, compact_output
+from tools.group_matching import rank_groups
+
+
+STAGES = ["discovery", "accommodation", "community", "captain"]
+
+# What a stage that ran out of time hands downstream instead of its output
+DEGRADED_OUTPUTS = {
+    "discovery": "No destination research finished in time; suggest destinations from general knowledge.",
+    "accommodation": "No accommodation search finished in time; give general advice on where to stay.",
+    "community": "The travel group search did not finish in time.",
+}
+
+# How the community stage finds groups: "direct" ranks them from the form
+# fields and only asks Buddy when nothing matches; "agent" always asks Buddy
+GROUP_MATCHING = os.getenv("GROUP_MATCHING", "direct").lower()
+
+# Max plans plan_trip_async keeps in flight per event loop
+PLAN_CONCURRENCY = int(os.getenv("PLAN_CONCURRENCY", "24"))
+
+# crewai runs LLM and tool calls synchronously (Crew.kickoff_async is a thread
+# wrapper too), so async plans run on their own pool instead of the loop's default
+_async_plan_executor = ThreadPoolExecutor(max_workers=PLAN_CONCURRENCY, thread_name_prefix="plan")
+_async_semaphores = weakref.WeakKeyDictionary()
+
+# crewai (and litellm under it) take seconds to import and building the agents
+# means importing them; both are deferred until a stage actually runs so the
+# UI, the job queue and cache lookups start without them
+Crew = None
+
+
+def _crew_class():
+    global Crew
+    if Crew is None:
+        from crewai import Crew as crew_class
+        Crew = crew_class
+    return Crew
+
+
+@functools.lru_cache(maxsize=None)
+def _task_creators() -> dict:
+    """Task creator for each stage (first call imports crewai and builds the agents)"""
+    from tasks.discovery_tasks import create_discovery_task
+    from tasks.accommodation_tasks import create_stay_task
+    from tasks.community_tasks import create_community_task
+    from tasks.planning_tasks import create_planning_task
+    return {
+        "discovery": create_discovery_task,
+        "accommodation": create_stay_task,
+        "community": create_community_task,
+        "captain": create_planning_task,
+    }
+
+
+# Identical concurrent requests share one crew run (in this process and across
+# processes through claim rows in the cache database)
+_plan_flight = SingleFlight(
+    claim=claim_inflight,
+    release=release_inflight,
+    is_claimed=is_inflight
+)
+
+
+class TripRequest(BaseModel):
+    """Structured planner input (the fields of the Plan Trip form)"""
+    destination: str = ""
+    interests: List[str] = Field(default_factory=list)
+    budget: int = 0
+    duration: int = 0
+    accommodation: str = ""
+    looking_for_group: bool = False
+    notes: str = ""
+    start_date: Optional[date] = None
+
+    @classmethod
+    def from_text(cls, user_request: str, looking_for_group: bool = True) -> "TripRequest":
+        """Wrap a free-text request (e.g. from the CLI)"""
+        return cls(notes=user_request.strip(), looking_for_group=looking_for_group)
+
+    @property
+    def interest_names(self) -> List[str]:
+        """Interests without emoji, e.g. '🥾 Trekking' -> 'Trekking'"""
+        return [i.split(' ', 1)[1] if ' ' in i else i for i in self.interests]
+
+    @property
+    def travel_month(self) -> str:
+        """'YYYY-MM' of the start date, or '' if no date was given"""
+        return self.start_date.strftime("%Y-%m") if self.start_date else ""
+
+    @property
+    def nightly_budget(self) -> Optional[int]:
+        if self.budget and self.duration:
+            return self.budget // self.duration
+        return None
+
+    def describe(self) -> str:
+        """Preferences text for Atlas (leaves out fields discovery does not use)"""
+        lines = []
+        if self.destination:
+            lines.append(f"Destination: {self.destination}")
+        if self.interests:
+            lines.append(f"Interests: {', '.join(self.interests)}")
+        if self.budget:
+            lines.append(f"Budget: ${self.budget}")
+        if self.duration:
+            lines.append(f"Duration: {self.duration} days")
+        if self.notes:
+            lines.append(f"Notes: {self.notes}")
+        return "\n".join(lines)
+
+    def cache_key(self) -> str:
+        """Plan-level cache key (see build_plan_cache_key)"""
+        return build_plan_cache_key(
+            destination=self.destination,
+            interests=self.interests,
+            budget=self.budget,
+            duration=self.duration,
+            accommodation=self.accommodation,
+            looking_for_group=self.looking_for_group,
+            notes=self.notes,
+            # Dates only change the plan through group matching
+            travel_month=self.travel_month if self.looking_for_group else ""
+        )
+
+
+def _discovery_inputs(trip: TripRequest) -> dict:
+    return {
+        "destination": clean_label(trip.destination),
+        "interests": sorted({clean_label(i) for i in trip.interests}),
+        "budget": budget_bucket(trip.budget),
+        "duration": duration_bucket(trip.duration),
+        "notes": normalize_request(trip.notes),
+    }
+
+
+def _community_inputs(trip: TripRequest) -> dict:
+    return {
+        "destination": clean_label(trip.destination) or normalize_request(trip.notes),
+        "interests": sorted({clean_label(i) for i in trip.interests}),
+        "budget": budget_bucket(trip.budget),
+        "month": trip.travel_month or None,
+    }
+
+
+def match_groups_directly(trip: TripRequest) -> Optional[str]:
+    """
+    Rank the community groups from the form fields, without an LLM call
+
+    Returns:
+        CommunityResult JSON (the same shape Buddy answers in), or None if no
+        group matches and Buddy should search instead
+    """
+    groups = rank_groups(
+        destination=trip.destination or trip.notes,
+        interests=trip.interest_names,
+        budget=trip.budget or None,
+        start_date=trip.start_date
+    )
+    if not groups:
+        return None
+    return CommunityResult(groups=[
+        GroupMatch(
+            name=g["name"],
+            destination=g["destination"],
+            dates=g["dates"],
+            size=g["group_size"],
+            budget_usd=g["budget_per_person"],
+            contact=g["contact"],
+            why="; ".join(g["reasons"])
+        )
+        for g in groups
+    ]).model_dump_json()
+
+
+def stream_task(task, on_token: Callable) -> str:
+    """
+    Run a tool-less task straight against its agent's LLM, streaming the answer
+
+    Sends the same persona and task prompt the crew would, through the
+    agent's LLM (see utils.llm.RateLimitedLLM.stream).
+
+    Args:
+        task: crewai Task whose agent has no tools (e.g. Captain's planning task)
+        on_token: Callback(text) called with each chunk as it arrives
+
+    Returns:
+        The full answer text
+    """
+    agent = task.agent
+    llm = agent.llm
+    messages = [
+        {
+            "role": "system",
+            "content": f"You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}"
+        },
+        {
+            "role": "user",
+            "content": f"{task.description}\n\n"
+                       f"This is the expected criteria for your final answer: {task.expected_output}\n"
+                       f"Respond with the complete final answer only."
+        },
+    ]
+
+    # Paced by the shared limiter and routed like the agent's other calls
+    return llm.stream(messages, on_token)
+
+
+def run_stage(stage: str, inputs: dict, build_task: Callable, use_cache: bool = True,
+              verbose: bool = False, refresh: bool = False, on_token: Callable = None,
+              budget: StageBudget = None) -> dict:
+    """
+    Run a single stage as its own one-task crew, reusing a cached output if one exists
+
+    Args:
+        stage: Stage name (one of STAGES)
+        inputs: The inputs this stage depends on (used as its cache key)
+        build_task: Zero-argument callable that builds the crewai Task
+        use_cache: Look up / store the stage output in the cache
+        verbose: Pass through to the Crew
+        refresh: Skip the lookup but still store the new output
+        on_token: Stream the answer through this callback instead of running a
+                  crew (only for stages whose agent has no tools)
+        budget: Wall-time, iteration and tool-call limits for this run (see
+                utils.budget); the LLM and the tools check it while it runs
+
+    Returns:
+        dict with 'output' (str) and 'cached' (bool)
+
+    Raises:
+        BudgetExceeded: The stage ran out of time (nothing is cached)
+    """
+    cache_key = build_stage_cache_key(stage, inputs)
+
+    if use_cache and not refresh:
+        cached = get_cached_result(stage, cache_key=cache_key, allow_stale=False, kind="stage")
+        if cached["found"]:
+            return {"output": cached["result"], "cached": True}
+
+    with stage_budget(budget):
+        task = build_task()
+        if on_token is not None:
+            output = stream_task(task, on_token)
+        else:
+            # Agents are shared module-level objects and Crew mutates them; give every run
+            # its own copy so concurrent plans don't share executor state
+            task.agent = task.agent.copy()
+            if budget is not None and budget.max_iter:
+                # crewai asks for a final answer once the agent hits max_iter
+                task.agent.max_iter = budget.max_iter
+            crew = _crew_class()(agents=[task.agent], tasks=[task], verbose=verbose)
+            result = crew.kickoff()
+            # Keep the structured JSON when the task has an output model
+            structured = getattr(result, "pydantic", None)
+            output = structured.model_dump_json() if structured is not None else str(result)
+
+    if use_cache:
+        save_to_cache(f"[{stage}] {inputs}", output, cache_key=cache_key, kind="stage")
+
+    return {"output": output, "cached": False}
+
+
+def lookup_plan(trip: TripRequest, allow_stale: bool = None) -> Optional[dict]:
+    """
+    Return the cached plan for this request without generating anything
+
+    A stale hit also starts a background rebuild (see _queue_refresh).
+    Returns None on a miss, otherwise the same dict plan_trip returns.
+    """
+    plan_key = trip.cache_key()
+    cached = get_cached_result(trip.describe(), cache_key=plan_key, allow_stale=allow_stale)
+    if not cached["found"]:
+        return None
+
+    if cached["stale"]:
+        _queue_refresh(trip)
+    return {
+        "result": cached["result"],
+        "cached": True,
+        "stale": cached["stale"],
+        "coalesced": False,
+        "age_hours": cached["age_hours"],
+        "stages": {},
+        "degraded": []
+    }
+
+
+def _queue_refresh(trip: TripRequest):
+    """
+    Rebuild a stale plan on a worker, after any user's job
+
+    With no workers running (the CLI, batch runs) nothing would pick the job
+    up, so the plan is rebuilt on a daemon thread in this process instead.
+    """
+    from jobs import active_workers, submit_refresh  # jobs imports this module
+    try:
+        if active_workers() > 0:
+            submit_refresh(trip)
+            return
+    except Exception as e:
+        print(f"⚠️ Could not queue a refresh of the stale plan: {e}")
+    threading.Thread(target=_refresh_plan, args=(trip,), daemon=True).start()
+
+
+def _refresh_plan(trip: TripRequest):
+    """Rebuild a stale plan; concurrent refreshes of it share one build"""
+    try:
+        plan_trip(trip, allow_stale=False)
+    except Exception as e:
+        print(f"⚠️ Background refresh of the stale plan failed: {e}")
+
+
+def plan_trip(trip: TripRequest, on_progress: Callable = None, use_cache: bool = True,
+              verbose: bool = False, allow_stale: bool = None, refresh: bool = False,
+              on_token: Callable = None, deadline_seconds: float = None) -> dict:
+    """
+    Produce a complete travel plan, re-running only stages whose inputs changed
+
+    Args:
+        trip: The structured request
+        on_progress: Optional callback(stage, cached) called as each stage starts/finishes
+        use_cache: Use the plan and stage caches
+        verbose: Show crew logs
+        allow_stale: Serve an expired plan immediately and rebuild it in the
+                     background (defaults to CACHE_STALE_WHILE_REVALIDATE)
+        refresh: Rebuild every stage even if cached (used by cache warming)
+        on_token: Optional callback(text) receiving Captain's plan chunk by chunk
+                  as it is generated. Runs in the calling thread. Not called when
+                  the plan comes from the cache or a concurrent identical request.
+        deadline_seconds: Hard bound for building the plan (defaults to
+                  PLAN_DEADLINE_SECONDS, 0 for none). Stages that run out of
+                  time are left out and Captain plans with what finished.
+
+    Returns:
+        dict with 'result' (plan text), 'cached' (whole plan from cache),
+        'stale' (served past its TTL), 'coalesced' (result shared with a
+        concurrent identical request), 'age_hours' (if cached) and
+        'stages' (per-stage cached flags; True also when no agent was
+        needed, e.g. groups matched directly from the form) and 'degraded'
+        (stages that ran out of time; such plans are not cached)
+    """
+    plan_key = trip.cache_key()
+
+    if use_cache and not refresh:
+        cached = lookup_plan(trip, allow_stale=allow_stale)
+        if cached is not None:
+            return cached
+
+    if deadline_seconds is None:
+        deadline_seconds = PLAN_DEADLINE_SECONDS
+
+    def build():
+        return _build_plan(trip, on_progress, use_cache, verbose, refresh, on_token,
+                           Deadline(deadline_seconds))
+
+    if not use_cache:
+        result, stages, degraded = build()
+        return {"result": result, "cached": False, "stale": False, "coalesced": False,
+                "stages": stages, "degraded": degraded}
+
+    def generate():
+        result, stages, degraded = build()
+        # Store the request as JSON so cache warming can replay popular plans.
+        # A plan missing stages is served once but not kept
+        if not degraded:
+            save_to_cache(trip.model_dump_json(), result, cache_key=plan_key)
+        return result, stages, degraded
+
+    def recheck():
+        if refresh:
+            return None
+        cached = get_cached_result(trip.describe(), cache_key=plan_key, allow_stale=False)
+        return (cached["result"], {}, []) if cached["found"] else None
+
+    (result, stages, degraded), coalesced = _plan_flight.do(plan_key, generate, recheck=recheck)
+
+    return {
+        "result": result,
+        "cached": False,
+        "stale": False,
+        "coalesced": coalesced,
+        "stages": stages,
+        "degraded": degraded
+    }
+
+
+async def plan_trip_async(trip: TripRequest, **kwargs) -> dict:
+    """
+    Async version of plan_trip: waits on the crew without blocking the event loop
+
+    At most PLAN_CONCURRENCY plans run at once per event loop; extra callers
+    wait for a slot. Accepts the same keyword arguments and returns the same
+    dict as plan_trip.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _async_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _async_semaphores[loop] = asyncio.Semaphore(PLAN_CONCURRENCY)
+
+    async with semaphore:
+        return await loop.run_in_executor(
+            _async_plan_executor, lambda: plan_trip(trip, **kwargs)
+        )
+
+
+def _stage_graph(trip: TripRequest) -> dict:
+    """
+    The plan as a dependency graph
+
+    Each stage lists the stages whose output it needs ('deps'), how to derive its
+    cache inputs and how to build its task from those outputs. Stages without a
+    dependency between them (Buddy vs. Atlas→Shelter) run concurrently.
+    Outputs reach the next agent in their compact structured form (tasks.models).
+    """
+    nightly = trip.nightly_budget
+
+    graph = {
+        # Stage 1: Atlas finds destinations
+        "discovery": {
+            "deps": [],
+            "inputs": lambda out: _discovery_inputs(trip),
+            "build": lambda out: _task_creators()["discovery"](trip.describe()),
+        },
+        # Stage 2: Shelter finds accommodations for Atlas's picks
+        "accommodation": {
+            "deps": ["discovery"],
+            "inputs": lambda out: {
+                "destinations": fingerprint(out["discovery"]),
+                "nightly_budget": nightly_budget_bucket(nightly) if nightly else None,
+                "type": clean_label(trip.accommodation),
+            },
+            "build": lambda out: _task_creators()["accommodation"](
+                compact_output("discovery", out["discovery"]), nightly, trip.accommodation
+            ),
+        },
+    }
+
+    # Stage 3: Buddy finds travel groups (only if asked, needs nothing from Atlas)
+    if trip.looking_for_group:
+        graph["community"] = {
+            "deps": [],
+            "inputs": lambda out: _community_inputs(trip),
+            "direct": (lambda out: match_groups_directly(trip)) if GROUP_MATCHING == "direct" else None,
+            "build": lambda out: _task_creators()["community"](
+                destination=trip.destination or trip.notes,
+                interests=trip.interest_names,
+                budget=trip.budget or None
+            ),
+        }
+
+    # Stage 4: Captain synthesizes once everything it reads is done
+    graph["captain"] = {
+        "deps": [name for name in graph],
+        "inputs": lambda out: {
+            "destinations": fingerprint(out["discovery"]),
+            "accommodations": fingerprint(out["accommodation"]),
+            "groups": fingerprint(out["community"]) if out.get("community") else None,
+        },
+        "build": lambda out: _task_creators()["captain"](
+            compact_output("discovery", out["discovery"]),
+            compact_output("accommodation", out["accommodation"]),
+            compact_output("community", out["community"]) if out.get("community") else None
+        ),
+    }
+
+    return graph
+
+
+def _fallback_plan(outputs: dict) -> str:
+    """The plan when Captain itself runs out of time: what the other agents found"""
+    lines = ["⏱️ The full itinerary could not be finished in time. Here is what our agents found:"]
+    for title, stage in (("🗺️ Destinations", "discovery"),
+                         ("🏠 Where to Stay", "accommodation"),
+                         ("👥 Travel Groups", "community")):
+        if stage in outputs:
+            lines.append(f"\n## {title}\n{compact_output(stage, outputs[stage])}")
+    return "\n".join(lines)
+
+
+def _build_plan(trip: TripRequest, on_progress: Callable, use_cache: bool, verbose: bool,
+                refresh: bool = False, on_token: Callable = None, deadline: Deadline = None):
+    """
+    Run (or reuse) every stage; returns (Captain's plan, per-stage cached flags,
+    stages that ran out of time)
+
+    With on_token, Captain streams its plan and runs in the calling thread (it
+    is the last stage, so nothing else is running by then) - UI callbacks such
+    as Streamlit's must not be called from worker threads.
+
+    Every stage runs under a StageBudget cut from `deadline`. A stage that runs
+    out is abandoned (its thread stops at its next LLM call) and the stages
+    after it get DEGRADED_OUTPUTS instead; if Captain runs out, the plan is the
+    other stages' findings.
+    """
+    graph = _stage_graph(trip)
+    outputs = {}
+    stages = {}
+    degraded = []
+
+    def notify(stage, cached=None):
+        if on_progress:
+            on_progress(stage, cached)
+
+    def execute(name, upstream, budget, stream=None):
+        spec = graph[name]
+        # Stages that can be answered without an agent report cached=True
+        direct = spec.get("direct")
+        output = direct(upstream) if direct else None
+        if output is not None:
+            return {"output": output, "cached": True}
+        return run_stage(
+            name,
+            spec["inputs"](upstream),
+            lambda: spec["build"](upstream),
+            use_cache, verbose, refresh, stream, budget
+        )
+
+    def finish(name, stage):
+        outputs[name] = stage["output"]
+        stages[name] = stage["cached"]
+        notify(name, stage["cached"])
+
+    def degrade(name):
+        print(f"⏱️ {name} ran out of time; continuing without it")
+        degraded.append(name)
+        finish(name, {
+            "output": _fallback_plan(outputs) if name == "captain" else DEGRADED_OUTPUTS[name],
+            "cached": False
+        })
+
+    pending = dict(graph)
+    running = {}
+    pool = ThreadPoolExecutor(max_workers=len(graph), thread_name_prefix="stage")
+    try:
+        while pending or running:
+            # Start every stage whose inputs are ready
+            for name in [n for n, spec in pending.items() if all(d in outputs for d in spec["deps"])]:
+                spec = pending.pop(name)
+                notify(name)
+                if name != "captain" and any(d in degraded for d in spec["deps"]):
+                    degrade(name)  # nothing useful to work from
+                    continue
+                budget = StageBudget(name, deadline)
+                if name == "captain" and on_token is not None:
+                    try:
+                        finish(name, execute(name, dict(outputs), budget, on_token))
+                    except BudgetExceeded:
+                        degrade(name)
+                    continue
+                running[pool.submit(execute, name, dict(outputs), budget)] = (name, budget)
+
+            if not running:
+                continue
+            limits = [b.remaining() for _, b in running.values() if b.expires_at is not None]
+            done, _ = wait(running, timeout=min(limits) if limits else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, _ = running.pop(future)
+                try:
+                    stage = future.result()  # re-raises a failed stage's error
+                except BudgetExceeded:
+                    degrade(name)
+                    continue
+                finish(name, stage)
+
+            # Stop waiting for stages past their budget
+            for future, (name, budget) in list(running.items()):
+                if budget.expired():
+                    del running[future]
+                    degrade(name)
+    finally:
+        # Abandoned stages must not hold up the plan
+        pool.shutdown(wait=False)
+
+    return outputs["captain"], stages, degraded
@@ -11,6 +11,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from agents.shelter import shelter
+from tasks.models import AccommodationResult
 
 
 def create_accommodation_task(destination: str, budget: str, preferences: str = "") -> Task:
@@ -45,7 +46,41 @@ def create_accommodation_task(destination: str, budget: str, preferences: str =
         Prioritize value for money, good reviews, and convenient locations.
         """,
         agent=shelter,
-        expected_output="A list of 5-7 accommodation recommendations with full details"
+        expected_output="A list of 5-7 accommodation recommendations with full details",
+        output_pydantic=AccommodationResult
+    )
+    
+    return task
+
+
+def create_stay_task(destinations: str, nightly_budget: int = None, accommodation_type: str = "") -> Task:
+    """
+    Create a task for Shelter based on destinations Atlas already found
+    
+    Args:
+        destinations: Atlas's destinations (compact form, see tasks.models)
+        nightly_budget: Max price per night in USD (None for "budget-friendly")
+        accommodation_type: Preferred type (e.g., "Budget (Hostels)")
+    
+    Returns:
+        A Task object for Shelter to execute
+    """
+    budget_text = f"${nightly_budget}/night max" if nightly_budget else "budget-friendly"
+    type_text = accommodation_type or "Any"
+    
+    task = Task(
+        description=f"""
+        Destinations recommended by Atlas:
+        {destinations}
+        
+        Find 5 accommodations for the TOP destination above.
+        Budget: {budget_text}.
+        Type: {type_text}
+        Be concise: name, price, location, 1 key feature.
+        """,
+        agent=shelter,
+        expected_output="5 accommodation options",
+        output_pydantic=AccommodationResult
     )
     
     return task
@@ -11,6 +11,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from agents.buddy import buddy
+from tasks.models import CommunityResult
 
 def create_community_task(destination: str, interests: list = None, budget: int = None) -> Task:
     """
@@ -52,7 +53,8 @@ def create_community_task(destination: str, interests: list = None, budget: int
         If no perfect matches exist, suggest the closest alternatives and explain why.
         """,
         agent=buddy,
-        expected_output="A list of 3-5 matching travel groups with detailed compatibility analysis and contact information"
+        expected_output="A list of 3-5 matching travel groups with detailed compatibility analysis and contact information",
+        output_pydantic=CommunityResult
     )
     
     return task
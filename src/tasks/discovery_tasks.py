@@ -11,6 +11,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from agents.atlas import atlas
+from tasks.models import DiscoveryResult
 
 
 def create_discovery_task(user_preferences: str) -> Task:
@@ -41,7 +42,8 @@ def create_discovery_task(user_preferences: str) -> Task:
         Be specific and enthusiastic! Help them get excited about the trip.
         """,
         agent=atlas,
-        expected_output="A list of 3-5 recommended destinations with detailed information for each"
+        expected_output="A list of 3-5 recommended destinations with detailed information for each",
+        output_pydantic=DiscoveryResult
     )
     
     return task
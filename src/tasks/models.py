@@ -0,0 +1,133 @@
+"""
+Structured outputs for the agents' tasks
+Atlas, Shelter and Buddy answer in these shapes (crewai's output_pydantic).
+Downstream stages get the compact() form instead of the full prose, and the
+JSON is what the stage cache stores.
+"""
+
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+
+class Destination(BaseModel):
+    """One destination recommended by Atlas"""
+    name: str
+    location: str = ""
+    why: str = Field("", description="Why it matches the traveler's interests (one sentence)")
+    best_time: str = ""
+    estimated_budget_usd: Optional[int] = None
+    highlight: str = Field("", description="What makes it special (a few words)")
+
+
+class DiscoveryResult(BaseModel):
+    """Atlas's answer: 3-5 destinations, best match first"""
+    destinations: List[Destination]
+
+    def compact(self) -> str:
+        lines = []
+        for i, d in enumerate(self.destinations, 1):
+            parts = [f"{i}. {d.name}" + (f" ({d.location})" if d.location else "")]
+            if d.estimated_budget_usd:
+                parts.append(f"~${d.estimated_budget_usd}")
+            if d.best_time:
+                parts.append(f"best: {d.best_time}")
+            if d.highlight:
+                parts.append(d.highlight)
+            if d.why:
+                parts.append(d.why)
+            lines.append(" | ".join(parts))
+        return "\n".join(lines)
+
+
+class Accommodation(BaseModel):
+    """One place to stay found by Shelter"""
+    name: str
+    type: str = Field("", description="hotel, hostel, homestay, guesthouse, resort...")
+    location: str = ""
+    price_per_night_usd: Optional[int] = None
+    feature: str = Field("", description="The one key feature (a few words)")
+    contact: str = Field("", description="Booking website or phone, if found")
+
+
+class AccommodationResult(BaseModel):
+    """Shelter's answer for the top destination"""
+    destination: str = ""
+    options: List[Accommodation]
+
+    def compact(self) -> str:
+        lines = [f"In {self.destination}:"] if self.destination else []
+        for i, a in enumerate(self.options, 1):
+            parts = [f"{i}. {a.name}" + (f" ({a.type})" if a.type else "")]
+            if a.price_per_night_usd:
+                parts.append(f"${a.price_per_night_usd}/night")
+            if a.location:
+                parts.append(a.location)
+            if a.feature:
+                parts.append(a.feature)
+            if a.contact:
+                parts.append(a.contact)
+            lines.append(" | ".join(parts))
+        return "\n".join(lines)
+
+
+class GroupMatch(BaseModel):
+    """One travel group suggested by Buddy"""
+    name: str
+    destination: str = ""
+    dates: str = ""
+    size: Optional[int] = None
+    budget_usd: Optional[int] = None
+    contact: str = ""
+    why: str = Field("", description="Why it suits the traveler (one sentence)")
+
+
+class CommunityResult(BaseModel):
+    """Buddy's answer: the best matching groups (may be empty)"""
+    groups: List[GroupMatch] = Field(default_factory=list)
+
+    def compact(self) -> str:
+        if not self.groups:
+            return "No matching travel groups found."
+        lines = []
+        for i, g in enumerate(self.groups, 1):
+            parts = [f"{i}. {g.name}"]
+            if g.destination:
+                parts.append(g.destination)
+            if g.dates:
+                parts.append(g.dates)
+            if g.size:
+                parts.append(f"{g.size} people")
+            if g.budget_usd:
+                parts.append(f"${g.budget_usd}")
+            if g.contact:
+                parts.append(g.contact)
+            if g.why:
+                parts.append(g.why)
+            lines.append(" | ".join(parts))
+        return "\n".join(lines)
+
+
+# Output model of each pipeline stage that has one
+STAGE_MODELS = {
+    "discovery": DiscoveryResult,
+    "accommodation": AccommodationResult,
+    "community": CommunityResult,
+}
+
+
+def compact_output(stage: str, output: str) -> str:
+    """
+    The form of a stage's output that is forwarded to the next agent
+
+    Structured (JSON) outputs are rendered compactly; prose (a model that
+    ignored the schema, or entries cached before outputs were structured) is
+    passed through unchanged.
+    """
+    model = STAGE_MODELS.get(stage)
+    if model is None:
+        return output
+    try:
+        return model.model_validate_json(output).compact()
+    except ValidationError:
+        return output
@@ -0,0 +1,56 @@
+"""
+Tasks for Captain - The Orchestrator Agent
+Defines the final synthesis task
+"""
+
+from crewai import Task
+
+# Import our agents
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agents.captain import captain
+
+
+def create_planning_task(destinations: str, accommodations: str, groups: str = None) -> Task:
+    """
+    Create a task for Captain to combine the team's findings into one plan
+    
+    Args:
+        destinations: Atlas's destinations (compact form, see tasks.models)
+        accommodations: Shelter's accommodations (compact form)
+        groups: Buddy's travel groups (compact form, None if not requested)
+    
+    Returns:
+        A Task object for Captain to execute
+    """
+    groups_text = f"""
+        Travel groups from Buddy:
+        {groups}
+        """ if groups else ""
+    
+    task = Task(
+        description=f"""
+        Destinations from Atlas:
+        {destinations}
+        
+        Accommodations from Shelter:
+        {accommodations}
+        {groups_text}
+        Create a concise travel plan.
+        
+        Include:
+        1. Best destination (why it's perfect)
+        2. Top 3 accommodations
+        3. Travel group option (if a good match was found)
+        4. Budget breakdown
+        5. 3-day sample itinerary
+        
+        Keep under 500 words. Be enthusiastic!
+        """,
+        agent=captain,
+        expected_output="Complete actionable plan"
+    )
+    
+    return task
@@ -6,77 +6,14 @@ Uses mock data (in real app, this would be a real database)
 from crewai.tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
+import sys
+from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
-# Mock data for travelers looking for groups
-MOCK_TRAVELERS = [
-    {
-        "id": "user_001",
-        "name": "Adventure Squad",
-        "destination": "Triund Trek",
-        "dates": "2026-03-15 to 2026-03-18",
-        "group_size": 4,
-        "looking_for": 2,
-        "interests": ["trekking", "photography", "camping"],
-        "budget_per_person": 400,
-        "contact": "adventuresquad@example.com"
-    },
-    {
-        "id": "user_002",
-        "name": "Mountain Wanderers",
-        "destination": "Valley of Flowers",
-        "dates": "2026-04-10 to 2026-04-15",
-        "group_size": 3,
-        "looking_for": 3,
-        "interests": ["trekking", "nature", "photography"],
-        "budget_per_person": 600,
-        "contact": "wanderers@example.com"
-    },
-    {
-        "id": "user_003",
-        "name": "Himalayan Explorers",
-        "destination": "Har Ki Dun Trek",
-        "dates": "2026-03-20 to 2026-03-25",
-        "group_size": 5,
-        "looking_for": 1,
-        "interests": ["trekking", "adventure", "culture"],
-        "budget_per_person": 500,
-        "contact": "explorers@example.com"
-    },
-    {
-        "id": "user_004",
-        "name": "Trek Buddies",
-        "destination": "Kedarkantha Trek",
-        "dates": "2026-02-20 to 2026-02-25",
-        "group_size": 2,
-        "looking_for": 4,
-        "interests": ["trekking", "snow", "adventure"],
-        "budget_per_person": 450,
-        "contact": "buddies@example.com"
-    },
-    {
-        "id": "user_005",
-        "name": "Solo to Group",
-        "destination": "Triund Trek",
-        "dates": "2026-03-12 to 2026-03-15",
-        "group_size": 1,
-        "looking_for": 5,
-        "interests": ["trekking", "making friends", "budget travel"],
-        "budget_per_person": 300,
-        "contact": "solo@example.com"
-    },
-    {
-        "id": "user_006",
-        "name": "Weekend Warriors",
-        "destination": "Manali Adventure",
-        "dates": "2026-03-08 to 2026-03-10",
-        "group_size": 3,
-        "looking_for": 3,
-        "interests": ["adventure", "paragliding", "rafting"],
-        "budget_per_person": 350,
-        "contact": "warriors@example.com"
-    }
-]
+# Mock data for travelers looking for groups (shared with the direct matcher)
+from tools.group_matching import MOCK_TRAVELERS
+from utils.budget import tool_budget_message
 
 
 class CommunitySearchInput(BaseModel):
@@ -99,6 +36,11 @@ class CommunityDatabaseTool(BaseTool):
         Returns:
             Matching travel groups with details
         """
+        # The running stage may be out of tool calls or time
+        over_budget = tool_budget_message()
+        if over_budget:
+            return over_budget
+
         try:
             query_lower = query.lower()
             matches = []
@@ -0,0 +1,188 @@
+"""
+Direct travel group matching
+Ranks community groups against the structured form fields with plain
+scoring - no LLM involved. Buddy is only needed when nothing matches.
+"""
+
+import re
+from datetime import date, datetime
+from typing import List, Optional
+
+
+# Mock data for travelers looking for groups
+MOCK_TRAVELERS = [
+    {
+        "id": "user_001",
+        "name": "Adventure Squad",
+        "destination": "Triund Trek",
+        "dates": "2026-03-15 to 2026-03-18",
+        "group_size": 4,
+        "looking_for": 2,
+        "interests": ["trekking", "photography", "camping"],
+        "budget_per_person": 400,
+        "contact": "adventuresquad@example.com"
+    },
+    {
+        "id": "user_002",
+        "name": "Mountain Wanderers",
+        "destination": "Valley of Flowers",
+        "dates": "2026-04-10 to 2026-04-15",
+        "group_size": 3,
+        "looking_for": 3,
+        "interests": ["trekking", "nature", "photography"],
+        "budget_per_person": 600,
+        "contact": "wanderers@example.com"
+    },
+    {
+        "id": "user_003",
+        "name": "Himalayan Explorers",
+        "destination": "Har Ki Dun Trek",
+        "dates": "2026-03-20 to 2026-03-25",
+        "group_size": 5,
+        "looking_for": 1,
+        "interests": ["trekking", "adventure", "culture"],
+        "budget_per_person": 500,
+        "contact": "explorers@example.com"
+    },
+    {
+        "id": "user_004",
+        "name": "Trek Buddies",
+        "destination": "Kedarkantha Trek",
+        "dates": "2026-02-20 to 2026-02-25",
+        "group_size": 2,
+        "looking_for": 4,
+        "interests": ["trekking", "snow", "adventure"],
+        "budget_per_person": 450,
+        "contact": "buddies@example.com"
+    },
+    {
+        "id": "user_005",
+        "name": "Solo to Group",
+        "destination": "Triund Trek",
+        "dates": "2026-03-12 to 2026-03-15",
+        "group_size": 1,
+        "looking_for": 5,
+        "interests": ["trekking", "making friends", "budget travel"],
+        "budget_per_person": 300,
+        "contact": "solo@example.com"
+    },
+    {
+        "id": "user_006",
+        "name": "Weekend Warriors",
+        "destination": "Manali Adventure",
+        "dates": "2026-03-08 to 2026-03-10",
+        "group_size": 3,
+        "looking_for": 3,
+        "interests": ["adventure", "paragliding", "rafting"],
+        "budget_per_person": 350,
+        "contact": "warriors@example.com"
+    }
+]
+
+
+# Words that say nothing about where a group is going
+_PLACE_STOPWORDS = {"trek", "trip", "tour", "adventure", "the", "of", "and", "india", "valley"}
+
+# Scoring weights
+DESTINATION_SCORE = 3.0
+INTEREST_SCORE = 1.0
+BUDGET_SCORE = 1.0
+DATE_SCORE = 1.0
+
+# Groups whose per-person budget is more than this times the traveler's are dropped
+MAX_BUDGET_RATIO = 1.5
+
+# Groups starting more than this many days from the traveler's start date are dropped
+MAX_DATE_GAP_DAYS = 30
+
+
+def _words(text: str) -> set:
+    words = set(re.findall(r"[a-z]+", str(text).lower()))
+    return {w for w in words if len(w) > 2 and w not in _PLACE_STOPWORDS}
+
+
+def _start_date(group: dict) -> Optional[date]:
+    try:
+        return datetime.strptime(group["dates"].split(" to ")[0], "%Y-%m-%d").date()
+    except (KeyError, ValueError):
+        return None
+
+
+def score_group(group: dict, destination: str = "", interests: List[str] = None,
+                budget: int = None, start_date: date = None):
+    """
+    How well one group fits the traveler
+
+    Returns:
+        (score, reasons) or None if the group is not a match at all
+    """
+    if group.get("looking_for", 0) <= 0:
+        return None
+
+    score = 0.0
+    reasons = []
+
+    shared_place = _words(destination) & _words(group["destination"])
+    if shared_place:
+        score += DESTINATION_SCORE
+        reasons.append(f"going to {group['destination']}")
+
+    wanted = {i.lower() for i in (interests or [])}
+    shared_interests = sorted(wanted & {i.lower() for i in group["interests"]})
+    if shared_interests:
+        score += INTEREST_SCORE * len(shared_interests)
+        reasons.append(f"shares your interest in {', '.join(shared_interests)}")
+
+    # A group must share the destination or at least one interest
+    if not shared_place and not shared_interests:
+        return None
+
+    if budget:
+        group_budget = group["budget_per_person"]
+        if group_budget > budget * MAX_BUDGET_RATIO:
+            return None
+        if group_budget <= budget:
+            score += BUDGET_SCORE
+            reasons.append(f"${group_budget} per person fits your budget")
+        else:
+            score += BUDGET_SCORE / 2
+            reasons.append(f"${group_budget} per person is a little over budget")
+
+    if start_date:
+        group_start = _start_date(group)
+        if group_start is None:
+            return None
+        gap = abs((group_start - start_date).days)
+        if gap > MAX_DATE_GAP_DAYS:
+            return None
+        score += DATE_SCORE * (1 - gap / (MAX_DATE_GAP_DAYS + 1))
+        reasons.append("same dates" if gap == 0 else f"starts {gap} days from your date")
+
+    return score, reasons
+
+
+def rank_groups(destination: str = "", interests: List[str] = None, budget: int = None,
+                start_date: date = None, top_k: int = 3, groups: List[dict] = None) -> List[dict]:
+    """
+    Best matching groups for the traveler, highest score first
+
+    Args:
+        destination: Where the traveler wants to go
+        interests: Interest names without emoji (e.g. ["Trekking"])
+        budget: Traveler's total budget in USD (None to ignore)
+        start_date: Traveler's start date (None to ignore dates)
+        top_k: How many groups to return
+        groups: Groups to rank (defaults to MOCK_TRAVELERS)
+
+    Returns:
+        The matching group dicts, each with added 'score' and 'reasons'
+    """
+    ranked = []
+    for group in (MOCK_TRAVELERS if groups is None else groups):
+        match = score_group(group, destination, interests, budget, start_date)
+        if match is not None:
+            score, reasons = match
+            ranked.append({**group, "score": round(score, 2), "reasons": reasons})
+
+    ranked.sort(key=lambda g: (-g["score"], g["budget_per_person"]))
+    return ranked[:top_k]
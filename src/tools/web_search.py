@@ -3,53 +3,282 @@ Web search tool for agents to find travel information
 Uses DuckDuckGo search (free, no API key needed)
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from crewai.tools import BaseTool
-from typing import Type
+from typing import List, Type, Union
 from pydantic import BaseModel, Field
 from duckduckgo_search import DDGS
+import atexit
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import replay
+from utils.budget import tool_budget_message
+from utils.memory_cache import MemoryCache
+
+
+# Search result cache settings
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(6 * 3600)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "512"))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Queries one Web Search call may run at once, and threads shared by all calls
+MAX_FANOUT_QUERIES = int(os.getenv("SEARCH_MAX_FANOUT_QUERIES", "4"))
+SEARCH_FANOUT_WORKERS = int(os.getenv("SEARCH_FANOUT_WORKERS", "8"))
+
+# Long-lived DuckDuckGo clients (one search at a time each) and the per-request timeout
+SEARCH_CLIENT_POOL_SIZE = int(os.getenv("SEARCH_CLIENT_POOL_SIZE", str(SEARCH_FANOUT_WORKERS)))
+SEARCH_TIMEOUT_SECONDS = int(os.getenv("SEARCH_TIMEOUT_SECONDS", "10"))
+
+# Filler words that don't change what a travel search returns. Words that
+# carry direction or intent ("to", "from", "best", "top") are kept.
+_QUERY_STOPWORDS = {"a", "an", "the", "in", "of"}
+
+# Shared by every agent's tool instance, so Atlas, Shelter and Buddy reuse each other's searches
+_search_cache = MemoryCache(
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=SEARCH_CACHE_MAX_BYTES,
+    ttl_seconds=SEARCH_CACHE_TTL_SECONDS
+)
+
+# Runs the queries of multi-query calls (shared, so concurrent plans can't pile up threads)
+_fanout_pool = ThreadPoolExecutor(max_workers=SEARCH_FANOUT_WORKERS, thread_name_prefix="search")
+
+
+class SearchClientPool:
+    """
+    DDGS clients kept alive and shared by every search
+
+    Each DDGS holds one HTTP client (keep-alive connection, cookies), so
+    reusing it skips the session and TLS setup. A DDGS must not serve two
+    threads at once and refuses every request after one has failed, so the
+    pool lends each search a client of its own, creates at most `size` of
+    them and replaces any client whose request failed.
+    """
+
+    def __init__(self, size: int, timeout: int):
+        self.size = size
+        self.timeout = timeout
+        self._idle = []  # used as a stack: the most recent client's connection is warmest
+        self._created = 0
+        self._generation = 0
+        # Signalled whenever a client is returned or a slot frees up (a client
+        # was discarded), so a waiting search can take it or create a new one
+        self._available = threading.Condition()
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._available:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No search client free after {self.timeout}s")
+                self._available.wait(remaining)
+
+        # Create outside the lock; give the slot back if that fails
+        try:
+            return DDGS(timeout=self.timeout)
+        except Exception:
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+
+    @contextmanager
+    def client(self):
+        """Borrow a client for one search"""
+        generation = self._generation
+        client = self._acquire()
+        healthy = False
+        try:
+            yield client
+            healthy = True
+        finally:
+            with self._available:
+                if generation == self._generation:
+                    if healthy:
+                        self._idle.append(client)
+                    else:
+                        self._created -= 1  # discarded; a waiter may create a new one
+                    self._available.notify()
+
+    def text(self, query: str, max_results: int) -> list:
+        with self.client() as ddgs:
+            return list(ddgs.text(query, max_results=max_results))
+
+    def close(self):
+        """Drop every client and its connections (searches still work afterwards, on new clients)"""
+        with self._available:
+            self._generation += 1
+            self._created = 0
+            self._idle.clear()
+            self._available.notify_all()
+
+
+# Shared by every tool instance; closed on interpreter exit
+_client_pool = SearchClientPool(SEARCH_CLIENT_POOL_SIZE, SEARCH_TIMEOUT_SECONDS)
+atexit.register(_client_pool.close)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query for caching
+    
+    "Budget hotels in Manali!" and "budget hotels, manali" both become
+    "budget hotels manali": lowercase, punctuation and filler words removed.
+    Word order is kept ("delhi to goa" is not "goa to delhi").
+    """
+    words = re.findall(r"[\w$]+", query.lower())
+    return " ".join(w for w in words if w not in _QUERY_STOPWORDS)
+
+
+def get_search_cache_stats() -> dict:
+    """Hit/miss counters and occupancy of the search result cache"""
+    stats = _search_cache.get_stats()
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
 
 
 class WebSearchInput(BaseModel):
     """Input for web search tool"""
-    query: str = Field(..., description="Search query for finding travel information")
+    query: Union[str, List[str]] = Field("", description="Search query for finding travel information")
+    queries: List[str] = Field(
+        default_factory=list,
+        description=f"Several search queries to run at once (up to {MAX_FANOUT_QUERIES}), "
+                    f"faster than searching one at a time"
+    )
+
+
+def _format_results(results: list) -> str:
+    formatted_results = ""
+    for i, result in enumerate(results, 1):
+        formatted_results += f"{i}. {result['title']}\n"
+        formatted_results += f"   {result['body'][:200]}...\n"
+        formatted_results += f"   URL: {result['href']}\n\n"
+    return formatted_results
+
+
+def merge_results(result_lists: list) -> list:
+    """
+    Merge several queries' results into one list without duplicate URLs
+
+    Results are interleaved (every query's first hit, then every second hit...)
+    so each query keeps a place near the top.
+    """
+    merged = []
+    seen_urls = set()
+    for rank in range(max((len(r) for r in result_lists), default=0)):
+        for results in result_lists:
+            if rank < len(results):
+                result = results[rank]
+                url = result.get("href", "").rstrip("/").lower()
+                if url in seen_urls:
+                    continue
+                seen_urls.add(url)
+                merged.append(result)
+    return merged
 
 
 class WebSearchTool(BaseTool):
     name: str = "Web Search"
-    description: str = "Useful for searching the web to find information about travel destinations, hotels, activities, and more. Input should be a search query string."
+    description: str = "Useful for searching the web to find information about travel destinations, hotels, activities, and more. Input should be a search query string, or a list of queries to run at once."
     args_schema: Type[BaseModel] = WebSearchInput
+    max_results: int = 5
     
-    def _run(self, query: str) -> str:
+    def _search(self, query: str) -> list:
+        """Fetch raw results, served from the shared cache when possible"""
+        cache_key = f"{normalize_query(query)}|{self.max_results}"
+        results = _search_cache.get(cache_key)
+        if results is not None:
+            return results
+        
+        def fetch():
+            # Use DuckDuckGo search (free, no API needed) on a pooled client
+            return _client_pool.text(query, self.max_results)
+        
+        # Recorded / replayed by utils.replay when it is on
+        results = replay.search(cache_key, fetch)
+        _search_cache.set(cache_key, results)
+        return results
+    
+    def _run(self, query: Union[str, List[str]] = "", queries: List[str] = None) -> str:
         """
         Search the web
         
         Args:
             query: Search query (e.g., "best trekking destinations in Himalayas")
+            queries: Several queries, searched concurrently and merged
         
         Returns:
             Search results as formatted text
         """
+        # The running stage may be out of tool calls or time
+        over_budget = tool_budget_message()
+        if over_budget:
+            return over_budget
+
+        # Models sometimes pass the list as `query`; accept either
+        all_queries = ([query] if isinstance(query, str) else list(query)) + list(queries or [])
+        unique = {}
+        for q in all_queries:
+            if q and q.strip():
+                unique.setdefault(normalize_query(q), q.strip())
+        all_queries = list(unique.values())[:MAX_FANOUT_QUERIES]
+        if not all_queries:
+            return "Search failed: no query given"
+        if len(all_queries) > 1:
+            return self._run_many(all_queries)
+        query = all_queries[0]
+
         try:
-            # Use DuckDuckGo search (free, no API needed)
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=5))
+            results = self._search(query)
             
             # Check if we got any results
             if not results:
                 return f"No results found for: {query}"
             
             # Format results nicely
-            formatted_results = f"Search results for '{query}':\n\n"
-            
-            for i, result in enumerate(results, 1):
-                formatted_results += f"{i}. {result['title']}\n"
-                formatted_results += f"   {result['body'][:200]}...\n"
-                formatted_results += f"   URL: {result['href']}\n\n"
-            
-            return formatted_results
+            return f"Search results for '{query}':\n\n" + _format_results(results)
             
+        except replay.ReplayMiss:
+            raise  # a replay that diverged from its recording must not look like a flaky search
         except Exception as e:
             return f"Search failed: {str(e)}"
+    
+    def _run_many(self, queries: List[str]) -> str:
+        """Search several queries concurrently and return one merged block"""
+        futures = [_fanout_pool.submit(self._search, q) for q in queries]
+        result_lists = []
+        failures = []
+        for q, future in zip(queries, futures):
+            try:
+                result_lists.append(future.result())
+            except replay.ReplayMiss:
+                raise
+            except Exception as e:
+                failures.append(f"Search failed for '{q}': {e}")
+        
+        merged = merge_results(result_lists)
+        if not merged:
+            return "\n".join(failures) or f"No results found for: {', '.join(queries)}"
+        
+        quoted = ", ".join(f"'{q}'" for q in queries)
+        formatted_results = f"Search results for {quoted}:\n\n" + _format_results(merged)
+        if failures:
+            formatted_results += "\n".join(failures) + "\n"
+        return formatted_results
 
 
 # Create instance
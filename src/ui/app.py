@@ -11,7 +11,7 @@ from pathlib import Path
 import time
 from datetime import datetime
 from dotenv import load_dotenv
-import re
+import uuid
 
 # Load environment
 load_dotenv()
@@ -20,22 +20,32 @@ load_dotenv()
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 # Import system components
-from agents.atlas import atlas
-from agents.shelter import shelter
-from agents.buddy import buddy
-from agents.captain import captain
-from crewai import Crew, Task, Process
-from tasks.discovery_tasks import create_discovery_task
-from tasks.accommodation_tasks import create_accommodation_task
-from tasks.community_tasks import create_community_task
+from pipeline import TripRequest, lookup_plan
+from jobs import (
+    JOB_MAX_WAIT_SECONDS,
+    JOB_POLL_INTERVAL,
+    AdmissionError,
+    ensure_workers,
+    get_job,
+    queue_position,
+    submit_job
+)
 
 # Import cache utilities
 try:
-    from utils.cache import get_cached_result, save_to_cache, clear_old_cache
+    from utils.cache import clear_old_cache, get_cache_count
     CACHE_AVAILABLE = True
 except:
     CACHE_AVAILABLE = False
 
+# Status message and progress for each pipeline stage
+STAGE_PROGRESS = {
+    "discovery": ("🗺️ Atlas is discovering destinations...", 20),
+    "accommodation": ("🏠 Shelter is finding accommodations...", 45),
+    "community": ("👥 Buddy is finding travel groups...", 65),
+    "captain": ("👨‍✈️ Captain is creating your plan...", 80),
+}
+
 # Page config
 st.set_page_config(
     page_title="TravelAI - Smart Travel Planner",
@@ -44,6 +54,23 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Identifies this browser session on submitted jobs
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+
+@st.cache_resource(ttl=60)
+def start_plan_workers() -> int:
+    """Start local plan workers once per server (re-checked every minute, not every rerun)"""
+    return ensure_workers()
+
+
+def client_ip() -> str:
+    """Caller's address as reported by the proxy in front of Streamlit (if any)"""
+    forwarded = st.context.headers.get("X-Forwarded-For", "")
+    return forwarded.split(",")[0].strip()
+
+
 # Modern CSS with vibrant colors
 def load_css():
     st.markdown("""
@@ -432,6 +459,12 @@ if selected == "🚀 Plan Trip":
         )
         
         looking_for_group = st.checkbox("👥 Looking to join a travel group?", value=True)
+
+        start_date = st.date_input(
+            "🗓️ Start Date (Optional)",
+            value=None,
+            help="Used to match travel groups leaving around the same time"
+        )
     
     # Optional notes
     with st.expander("✍️ Additional Notes (Optional)", expanded=False):
@@ -448,7 +481,6 @@ if selected == "🚀 Plan Trip":
     col1, col2, col3 = st.columns([1.5, 1, 1.5])
     with col2:
         generate_btn = st.button("🚀 Generate Travel Plan", use_container_width=True, type="primary")
-    ")
 
     # Process request
     if generate_btn:
@@ -456,147 +488,96 @@ if selected == "🚀 Plan Trip":
             st.error("❌ Please enter a destination!")
         else:
             # Build request
-            user_request = f"""
-            Destination: {destination}
-            Interests: {', '.join(interests)}
-            Budget: ${budget}
-            Duration: {duration} days
-            Accommodation: {accommodation_pref}
-            {f'Notes: {additional_notes}' if additional_notes else ''}
-            {' Looking for travel group.' if looking_for_group else ''}
-            """
+            trip = TripRequest(
+                destination=destination,
+                interests=interests,
+                budget=budget,
+                duration=duration,
+                accommodation=accommodation_pref,
+                looking_for_group=looking_for_group,
+                notes=additional_notes or "",
+                start_date=start_date
+            )
             
-            # Check cache
-            cache_hit = False
             result = None
+            plan = None
             
-            if CACHE_AVAILABLE:
-                cache_result = get_cached_result(user_request)
-                if cache_result["found"]:
-                    cache_hit = True
-                    st.success(f"⚡ Found a recent plan (from {cache_result['age_hours']} hours ago)! Instant result!")
-                    result = cache_result["result"]
+            # Show simple progress
+            status_placeholder = st.empty()
+            progress_placeholder = st.empty()
+            stream_placeholder = st.empty()
             
-            if not cache_hit:
-                # Show simple progress
-                status_placeholder = st.empty()
-                progress_placeholder = st.empty()
-                
-                try:
-                    # Step 1
-                    status_placeholder.info("🗺️ Atlas is discovering destinations...")
-                    progress_placeholder.progress(20)
-                    
-                    discovery_task = create_discovery_task(user_request)
-                    
-                    # Step 2
-                    status_placeholder.info("🏠 Shelter is finding accommodations...")
-                    progress_placeholder.progress(40)
-                    
-                    accommodation_task = Task(
-                        description=f"""
-                        Find 5 accommodations for the destination.
-                        Budget: ${budget//duration}/night max.
-                        Type: {accommodation_pref}
-                        Be concise: name, price, location, 1 key feature.
-                        """,
-                        agent=shelter,
-                        expected_output="5 accommodation options",
-                        context=[discovery_task]
-                    )
-                    
-                    # Step 3
-                    if looking_for_group:
-                        status_placeholder.info("👥 Buddy is finding travel groups...")
-                        progress_placeholder.progress(60)
-                        
-                        community_task = create_community_task(
-                            destination=destination,
-                            interests=[i.split()[1] if ' ' in i else i for i in interests],
-                            budget=budget
-                        )
-                    else:
-                        community_task = None
+            try:
+                # Cached plans are answered right away; anything else is generated by
+                # a background worker while this page polls the job (rate limit
+                # retries happen in the queue, not in this session)
+                started_at = time.time()
+                plan = lookup_plan(trip) if CACHE_AVAILABLE else None
+                if plan is not None and plan["stale"]:
+                    start_plan_workers()  # they pick up the queued refresh
+                if plan is None:
+                    start_plan_workers()
+                    job_id = submit_job(trip, session=st.session_state.session_id, client_ip=client_ip())
                     
-                    # Step 4
-                    status_placeholder.info("👨‍✈️ Captain is creating your plan...")
-                    progress_placeholder.progress(75)
-                    
-                    captain_task = Task(
-                        description=f"""
-                        Create a concise travel plan.
-                        
-                        Include:
-                        1. Best destination (why it's perfect)
-                        2. Top 3 accommodations
-                        3. Budget breakdown
-                        4. 3-day sample itinerary
-                        
-                        Keep under 500 words. Be enthusiastic!
-                        """,
-                        agent=captain,
-                        expected_output="Complete actionable plan",
-                        context=[discovery_task, accommodation_task] + ([community_task] if community_task else [])
-                    )
-                    
-                    # Create crew
-                    tasks = [discovery_task, accommodation_task]
-                    agents_list = [atlas, shelter]
-                    
-                    if community_task:
-                        tasks.append(community_task)
-                        agents_list.append(buddy)
-                    
-                    tasks.append(captain_task)
-                    agents_list.append(captain)
-                    
-                    crew = Crew(
-                        agents=agents_list,
-                        tasks=tasks,
-                        process=Process.sequential,
-                        verbose=False
-                    )
-                    
-                    # Execute with retry
-                    status_placeholder.info("⚡ AI agents working...")
-                    progress_placeholder.progress(85)
-                    
-                    max_retries = 3
-                    for attempt in range(max_retries):
-                        try:
-                            result = crew.kickoff()
-                            
-                            # Save to cache
-                            if CACHE_AVAILABLE:
-                                save_to_cache(user_request, result)
-                            
+                    while True:
+                        job = get_job(job_id)
+                        if job is None:
+                            raise RuntimeError("Your plan request was lost. Please submit it again.")
+                        if time.time() - started_at > JOB_MAX_WAIT_SECONDS:
+                            raise RuntimeError("Planning is taking much longer than usual.")
+                        if job["status"] == "done":
+                            plan = job["plan"]
                             break
-                            
-                        except Exception as e:
-                            error_str = str(e)
-                            if "rate_limit" in error_str.lower() and attempt < max_retries - 1:
-                                wait_match = re.search(r'(\d+\.?\d*)\s*s', error_str)
-                                wait_time = float(wait_match.group(1)) if wait_match else 20
-                                wait_time = min(wait_time + 5, 60)
-                                
-                                status_placeholder.warning(f"⏳ Rate limit hit. Waiting {int(wait_time)}s... (Attempt {attempt + 1}/{max_retries})")
-                                time.sleep(wait_time)
+                        if job["status"] == "failed":
+                            raise RuntimeError(job["error"])
+                        
+                        if job["status"] == "queued":
+                            place = queue_position(job_id)
+                            waiting = "🕐 Waiting for a free planner"
+                            if place:
+                                waiting += f" - you're #{place['position']} of {place['queued']} in line"
+                                if place["eta_seconds"]:
+                                    waiting += f" (about {max(1, round(place['eta_seconds'] / 60))} min)"
+                            if job["message"]:
+                                status_placeholder.warning(f"⏳ {job['message']}\n\n{waiting}")
                             else:
-                                raise e
-                    
-                    # Clear progress
-                    progress_placeholder.progress(100)
-                    status_placeholder.success("✅ Plan ready!")
-                    time.sleep(1)
-                    status_placeholder.empty()
-                    progress_placeholder.empty()
+                                status_placeholder.info(waiting)
+                        elif job["stage"]:
+                            message, percent = STAGE_PROGRESS[job["stage"]]
+                            status_placeholder.info(message)
+                            progress_placeholder.progress(percent)
+                            if job["partial"]:
+                                # Captain's plan as it is written
+                                stream_placeholder.markdown(job["partial"] + " ▌")
+                        
+                        time.sleep(JOB_POLL_INTERVAL)
                 
-                except Exception as e:
-                    status_placeholder.empty()
-                    progress_placeholder.empty()
-                    st.error(f"❌ Error: {str(e)}")
-                    st.info("💡 Try again in a moment or simplify your request.")
-                    st.stop()
+                result = plan["result"]
+                
+                # Clear progress (the finished plan is shown below)
+                status_placeholder.empty()
+                progress_placeholder.empty()
+                stream_placeholder.empty()
+                if plan["stale"]:
+                    st.info(f"🔄 Showing a plan from {plan['age_hours']} hours ago. A fresh one is being prepared in the background.")
+                elif plan["cached"]:
+                    st.success(f"⚡ Found a recent plan (from {plan['age_hours']} hours ago)! Instant result!")
+                elif plan.get("degraded"):
+                    st.warning(f"⏱️ Some agents ran out of time ({', '.join(plan['degraded'])}). "
+                               f"This plan uses what they found; try again later for a complete one.")
+            
+            except AdmissionError as e:
+                status_placeholder.empty()
+                st.warning(f"🚦 {e}")
+                st.stop()
+            
+            except Exception as e:
+                status_placeholder.empty()
+                progress_placeholder.empty()
+                stream_placeholder.empty()
+                st.error(f"❌ Error: {str(e)}")
+                st.info("💡 Try again in a moment or simplify your request.")
+                st.stop()
             
             # Display result (only if we have one)
             if result:
@@ -618,10 +599,13 @@ if selected == "🚀 Plan Trip":
                 
                 # Stats in expander
                 with st.expander("📊 Stats"):
+                    agents_run = sum(1 for cached in plan["stages"].values() if not cached)
                     col1, col2, col3 = st.columns(3)
-                    col1.metric("Agents", len(agents_list) if not cache_hit else 0)
-                    col2.metric("Time", "Instant" if cache_hit else "~2 min")
-                    col3.metric("Status", "Cached" if cache_hit else "Fresh")
+                    col1.metric("Agents", agents_run)
+                    elapsed = time.time() - started_at
+                    col2.metric("Time", "Instant" if elapsed < 1 else
+                                f"{elapsed:.0f}s" if elapsed < 60 else f"{elapsed / 60:.1f} min")
+                    col3.metric("Status", "Cached" if plan["cached"] else "Shared" if plan["coalesced"] else "Fresh")
 
 elif selected == "ℹ️ About":
     st.markdown('<div class="white-card">', unsafe_allow_html=True)
@@ -700,11 +684,7 @@ elif selected == "ℹ️ About":
     with col3:
         st.metric("Avg Speed", "2-3 min", help="Plan generation time")
     with col4:
-        cache_count = 0
-        if CACHE_AVAILABLE:
-            cache_dir = Path(__file__).parent.parent.parent / "cache"
-            if cache_dir.exists():
-                cache_count = len(list(cache_dir.glob("*.json")))
+        cache_count = get_cache_count() if CACHE_AVAILABLE else 0
         st.metric("Cached Plans", cache_count, help="Instant results available")
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -760,7 +740,8 @@ elif selected == "⚙️ How It Works":
     with st.expander("🔧 Technical Details"):
         st.markdown("""
         **Architecture Highlights:**
-        - Sequential multi-agent workflow with context sharing
+        - Dependency-ordered multi-agent workflow (Buddy runs alongside Atlas → Shelter)
+        - Per-stage caching: only agents whose inputs changed re-run
         - Smart caching system (7-day cache duration)
         - Automatic retry logic for rate limit handling
         - Token optimization (reduced from 15k to 8k tokens/plan)
@@ -0,0 +1,140 @@
+"""
+Request deadlines and per-stage budgets
+A plan gets one deadline; each stage gets a slice of it with a cap on wall
+time, agent iterations and tool calls. The running stage's budget is kept in
+a context variable so the LLM wrapper and the tools can check it without it
+being passed through crewai.
+"""
+
+import contextvars
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+# Hard bound for a whole plan (0 disables deadlines)
+PLAN_DEADLINE_SECONDS = float(os.getenv("PLAN_DEADLINE_SECONDS", "300"))
+
+# Per-stage limits. Override with STAGE_BUDGETS='{"discovery": {"seconds": 60, ...}}'
+DEFAULT_STAGE_BUDGETS = {
+    "discovery": {"seconds": 120, "max_iter": 6, "max_tool_calls": 4},
+    "accommodation": {"seconds": 120, "max_iter": 6, "max_tool_calls": 4},
+    "community": {"seconds": 90, "max_iter": 4, "max_tool_calls": 3},
+    "captain": {"seconds": 120, "max_iter": 3, "max_tool_calls": 0},
+}
+STAGE_BUDGETS = {**DEFAULT_STAGE_BUDGETS, **json.loads(os.getenv("STAGE_BUDGETS", "{}"))}
+
+# Time kept back for Captain: earlier stages must finish this long before the deadline
+CAPTAIN_RESERVE_SECONDS = float(os.getenv("CAPTAIN_RESERVE_SECONDS", "90"))
+
+# The last part of a stage's time is for writing the final answer: tools stop
+# answering and the agent is told to wrap up with what it has
+FINAL_ANSWER_SECONDS = float(os.getenv("FINAL_ANSWER_SECONDS", "25"))
+
+WRAP_UP_MESSAGE = (
+    "The time or tool budget for this step is used up. Do not call any more "
+    "tools; give your Final Answer now using what you already found."
+)
+
+_current = contextvars.ContextVar("stage_budget", default=None)
+
+
+class BudgetExceeded(Exception):
+    """A stage ran past its wall-time budget"""
+
+
+class Deadline:
+    """Absolute point in time a whole plan must be done by"""
+
+    def __init__(self, seconds: float = None):
+        self.expires_at = time.time() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (None for no deadline)"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.time())
+
+
+class StageBudget:
+    """Wall time, iteration and tool-call limits for one stage run"""
+
+    def __init__(self, stage: str, deadline: Deadline = None, seconds: float = None,
+                 max_iter: int = None, max_tool_calls: int = None):
+        limits = STAGE_BUDGETS.get(stage, {})
+        self.stage = stage
+        self.max_iter = max_iter if max_iter is not None else limits.get("max_iter")
+        self.max_tool_calls = (
+            max_tool_calls if max_tool_calls is not None else limits.get("max_tool_calls")
+        )
+        self.tool_calls = 0
+
+        seconds = seconds if seconds is not None else limits.get("seconds")
+        ends = [time.time() + seconds] if seconds else []
+        if deadline is not None and deadline.expires_at is not None:
+            reserve = 0 if stage == "captain" else CAPTAIN_RESERVE_SECONDS
+            ends.append(deadline.expires_at - reserve)
+        self.expires_at = min(ends) if ends else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the stage is cut off (None for no limit)"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.time())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    def wrapping_up(self) -> bool:
+        """Whether the stage should stop gathering and answer"""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= FINAL_ANSWER_SECONDS
+
+    def take_tool_call(self) -> bool:
+        """Count a tool call; False if the stage may not make it"""
+        if self.wrapping_up():
+            return False
+        if self.max_tool_calls is not None and self.tool_calls >= self.max_tool_calls:
+            return False
+        self.tool_calls += 1
+        return True
+
+
+def current_budget() -> Optional[StageBudget]:
+    """The budget of the stage running in this thread, if any"""
+    return _current.get()
+
+
+@contextmanager
+def stage_budget(budget: Optional[StageBudget]):
+    """Make `budget` the current one for the duration of the block"""
+    token = _current.set(budget)
+    try:
+        yield budget
+    finally:
+        _current.reset(token)
+
+
+def check_deadline(expected_wait: float = 0.0):
+    """
+    Raise BudgetExceeded if the current stage is out of time
+
+    Args:
+        expected_wait: Seconds the caller is about to block (e.g. for the
+                       rate limiter); counts against what is left
+    """
+    budget = current_budget()
+    if budget is None:
+        return
+    remaining = budget.remaining()
+    if remaining is not None and remaining <= expected_wait:
+        raise BudgetExceeded(f"{budget.stage} ran out of time")
+
+
+def tool_budget_message() -> Optional[str]:
+    """None if the current stage may call a tool now, else what the tool should answer"""
+    budget = current_budget()
+    if budget is None or budget.take_tool_call():
+        return None
+    return WRAP_UP_MESSAGE
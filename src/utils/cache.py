@@ -1,26 +1,166 @@
 """
 Smart caching system to reduce API calls
+
+Two tiers: a bounded in-process LRU in front of a single SQLite file
+(WAL mode) that holds every cached plan with an index on creation time.
 """
 
 import json
 import hashlib
+import lzma
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
 from pathlib import Path
 from datetime import datetime, timedelta
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.memory_cache import MemoryCache
+
 # Cache settings
-CACHE_DIR = Path(__file__).parent.parent.parent / "cache"
-CACHE_DIR.mkdir(exist_ok=True)
+CACHE_DIR = Path(__file__).parent.parent.parent / "cache"  # created on first connection
+CACHE_DB_NAME = "plans.db"
 CACHE_DURATION_DAYS = 7  # Cache results for 1 week
 
+# On-disk format: results are stored as a BLOB with a one-byte format header.
+# Payloads smaller than CACHE_COMPRESS_MIN_BYTES are stored raw.
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "zlib")  # none | zlib | lzma
+CACHE_COMPRESS_MIN_BYTES = 512
+CACHE_ZLIB_LEVEL = 6
+CACHE_LZMA_PRESET = 6
+FORMAT_RAW = b"\x00"
+FORMAT_ZLIB = b"\x01"
+FORMAT_LZMA = b"\x02"
+
+# Structured keys: requests in the same bucket share a plan
+BUDGET_BUCKETS_USD = [300, 750, 1500, 3000, 6000, 12000]
+DURATION_BUCKETS_DAYS = [3, 6, 10, 16, 23]
+NIGHTLY_BUDGET_BUCKETS_USD = [15, 30, 60, 120, 250]
+
+# Stale-while-revalidate: serve expired plans instantly while a fresh one is
+# built in the background. Expired entries are kept this long before deletion.
+CACHE_STALE_WHILE_REVALIDATE = os.getenv("CACHE_STALE_WHILE_REVALIDATE", "false").lower() in ("1", "true", "yes")
+CACHE_STALE_MAX_DAYS = int(os.getenv("CACHE_STALE_MAX_DAYS", "30"))
+
+# In-memory tier (checked before the disk tier)
+MEMORY_CACHE_MAX_ENTRIES = int(os.getenv("MEMORY_CACHE_MAX_ENTRIES", "256"))
+MEMORY_CACHE_MAX_BYTES = int(os.getenv("MEMORY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+_memory_cache = MemoryCache(
+    max_entries=MEMORY_CACHE_MAX_ENTRIES,
+    max_bytes=MEMORY_CACHE_MAX_BYTES,
+    ttl_seconds=CACHE_DURATION_DAYS * 24 * 3600
+)
+
+_tier_stats = {
+    "memory_hits": 0,
+    "disk_hits": 0,
+    "misses": 0,
+    "stale_hits": 0,
+    "writes": 0,
+}
+
+# A claim older than this is treated as abandoned (crashed worker)
+INFLIGHT_TIMEOUT_SECONDS = int(os.getenv("INFLIGHT_TIMEOUT_SECONDS", "900"))
+
+# Hit counts are buffered in memory and written in batches by a background
+# thread, so a lookup never waits on a database write
+ACCESS_STATS_FLUSH_EVERY = 50
+ACCESS_STATS_FLUSH_SECONDS = 60
+_pending_hits = Counter()
+_pending_count = [0]  # sum of _pending_hits, kept so hits don't re-add the Counter
+_pending_lock = threading.Lock()
+_flush_wanted = threading.Event()
+_flusher = {"thread": None, "pid": None}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    cache_key TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    request TEXT,
+    result BLOB NOT NULL,  -- encode_result() payload (older rows may hold TEXT)
+    kind TEXT NOT NULL DEFAULT 'plan'  -- 'plan' or 'stage' (per-stage outputs)
+);
+CREATE INDEX IF NOT EXISTS idx_plans_created_at ON plans(created_at);
+
+CREATE TABLE IF NOT EXISTS cache_meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('entry_count', 0);
+
+-- Cross-process single-flight claims (one row per plan being generated)
+CREATE TABLE IF NOT EXISTS inflight (
+    cache_key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    claimed_at REAL NOT NULL
+);
+
+-- Hit counts per key, used to find popular requests for cache warming
+CREATE TABLE IF NOT EXISTS access_stats (
+    cache_key TEXT PRIMARY KEY,
+    request TEXT,
+    hits INTEGER NOT NULL DEFAULT 0,
+    last_hit_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_access_stats_hits ON access_stats(hits);
+
+-- Keep the plan count in sync so counting never scans the table. Stage
+-- outputs share the table but are not plans, so they are not counted.
+CREATE TRIGGER IF NOT EXISTS plans_count_insert AFTER INSERT ON plans
+WHEN NEW.kind = 'plan'
+BEGIN
+    UPDATE cache_meta SET value = value + 1 WHERE name = 'entry_count';
+END;
+CREATE TRIGGER IF NOT EXISTS plans_count_delete AFTER DELETE ON plans
+WHEN OLD.kind = 'plan'
+BEGIN
+    UPDATE cache_meta SET value = value - 1 WHERE name = 'entry_count';
+END;
+"""
+
+# One connection per thread (Streamlit serves sessions from several threads)
+_local = threading.local()
+_migrated_dirs = set()
+_migration_lock = threading.Lock()
+
+
+def _get_connection() -> sqlite3.Connection:
+    """Open (or reuse) this thread's connection to the cache database"""
+    db_path = CACHE_DIR / CACHE_DB_NAME
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == db_path and _local.pid == os.getpid():
+        return conn
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    _local.conn = conn
+    _local.path = db_path
+    _local.pid = os.getpid()  # connections must not cross a fork (plan workers)
+
+    # Import any legacy one-file-per-key entries the first time we see this dir
+    with _migration_lock:
+        if CACHE_DIR not in _migrated_dirs:
+            _migrated_dirs.add(CACHE_DIR)
+            migrate_json_cache()
+
+    return conn
+
 
 def normalize_request(user_request: str) -> str:
     """Normalize user request for consistent caching"""
-    # Convert to lowercase, remove extra spaces
-    normalized = user_request.lower().strip()
-    # Remove numbers (budget/dates change but similar requests)
-    import re
-    normalized = re.sub(r'\d+', 'X', normalized)
-    return normalized
+    # Convert to lowercase, collapse whitespace. Numbers are kept: budget and
+    # duration decide which plan is right, so they must stay in the key.
+    return re.sub(r'\s+', ' ', user_request.lower()).strip()
 
 
 def get_cache_key(user_request: str) -> str:
@@ -29,95 +169,515 @@ def get_cache_key(user_request: str) -> str:
     return hashlib.md5(normalized.encode()).hexdigest()[:16]
 
 
-def get_cached_result(user_request: str) -> dict:
+def _bucket(value: float, bounds: list) -> str:
+    """Map a number onto a labelled range, e.g. 500 -> '300-750'"""
+    lower = 0
+    for upper in bounds:
+        if value < upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f"{lower}+"
+
+
+def clean_label(label: str) -> str:
+    """Strip emoji/punctuation from a form label: '🏨 Mid-range (Hotels)' -> 'mid-range hotels'"""
+    cleaned = re.sub(r'[^\w\s-]', ' ', str(label).lower())
+    return re.sub(r'\s+', ' ', cleaned).strip()
+
+
+def budget_bucket(budget: float) -> str:
+    """Budget class used in cache keys (total trip budget in USD)"""
+    return _bucket(budget, BUDGET_BUCKETS_USD)
+
+
+def duration_bucket(duration: int) -> str:
+    """Trip length class used in cache keys (days)"""
+    return _bucket(duration, DURATION_BUCKETS_DAYS)
+
+
+def nightly_budget_bucket(nightly_budget: float) -> str:
+    """Per-night accommodation budget class used in cache keys (USD)"""
+    return _bucket(nightly_budget, NIGHTLY_BUDGET_BUCKETS_USD)
+
+
+def build_plan_cache_key(destination: str, interests: list = None, budget: float = 0,
+                         duration: int = 0, accommodation: str = "",
+                         looking_for_group: bool = False, notes: str = "",
+                         travel_month: str = "") -> str:
+    """
+    Generate a cache key from the structured planner form fields
+
+    Args:
+        destination: Where the user wants to go
+        interests: Selected interests (order and emoji do not matter)
+        budget: Total budget in USD (bucketed)
+        duration: Trip length in days (bucketed)
+        accommodation: Accommodation tier label
+        looking_for_group: Whether group matching was requested
+        notes: Free-text notes (included verbatim after normalizing)
+        travel_month: "YYYY-MM" the trip starts (only keyed when set, so
+                      requests without dates keep their existing keys)
+
+    Returns:
+        16-char hex key, identical for requests that only differ within a bucket
+    """
+    fields = {
+        "v": 1,
+        "destination": clean_label(destination),
+        "interests": sorted({clean_label(i) for i in (interests or [])}),
+        "budget": budget_bucket(budget),
+        "duration": duration_bucket(duration),
+        "accommodation": clean_label(accommodation),
+        "group": bool(looking_for_group),
+        "notes": normalize_request(notes or ""),
+    }
+    if travel_month:
+        fields["month"] = travel_month
+    canonical = json.dumps(fields, sort_keys=True, separators=(',', ':'))
+    return hashlib.md5(canonical.encode()).hexdigest()[:16]
+
+
+def fingerprint(text: str) -> str:
+    """Short content hash, used to key a stage on its upstream output"""
+    return hashlib.md5(str(text).encode()).hexdigest()[:16]
+
+
+def build_stage_cache_key(stage: str, inputs: dict) -> str:
+    """
+    Generate a cache key for one pipeline stage
+
+    Args:
+        stage: Stage name (e.g. "discovery", "accommodation")
+        inputs: Only the inputs this stage actually uses, already normalized
+                (bucketed numbers, cleaned labels, fingerprints of upstream output)
+
+    Returns:
+        16-char hex key, namespaced by stage
+    """
+    canonical = json.dumps({"v": 1, "stage": stage, "inputs": inputs},
+                           sort_keys=True, separators=(',', ':'))
+    return hashlib.md5(canonical.encode()).hexdigest()[:16]
+
+
+def _retention_days() -> int:
+    """How long an entry is kept on disk (longer than its TTL in stale-while-revalidate mode)"""
+    if CACHE_STALE_WHILE_REVALIDATE:
+        return max(CACHE_STALE_MAX_DAYS, CACHE_DURATION_DAYS)
+    return CACHE_DURATION_DAYS
+
+
+def get_cached_result(user_request: str, cache_key: str = None, allow_stale: bool = None,
+                      kind: str = "plan") -> dict:
     """
     Try to get cached result
-    
+
+    Args:
+        user_request: Raw request text (hashed if no cache_key is given)
+        cache_key: Precomputed key, e.g. from build_plan_cache_key()
+        allow_stale: Return expired entries (marked 'stale') instead of a miss.
+                     Defaults to CACHE_STALE_WHILE_REVALIDATE.
+        kind: "plan" or "stage"; only plan hits count towards popular requests
+
     Returns:
-        dict with 'found' (bool) and 'result' (str if found)
+        dict with 'found' (bool), 'result' (str if found) and 'stale' (bool if found)
     """
-    cache_key = get_cache_key(user_request)
-    cache_file = CACHE_DIR / f"{cache_key}.json"
-    
-    if not cache_file.exists():
-        return {"found": False}
-    
+    cache_key = cache_key or get_cache_key(user_request)
+    if allow_stale is None:
+        allow_stale = CACHE_STALE_WHILE_REVALIDATE
+
+    # Tier 1: memory
+    cached_data = _memory_cache.get(cache_key)
+    if cached_data is not None:
+        _tier_stats["memory_hits"] += 1
+        _record_hit(cache_key, kind)
+        return _build_hit(cached_data, "memory")
+
+    # Tier 2: disk
     try:
-        with open(cache_file, 'r') as f:
-            cached_data = json.load(f)
-        
+        conn = _get_connection()
+        row = conn.execute(
+            "SELECT created_at, result FROM plans WHERE cache_key = ?",
+            (cache_key,)
+        ).fetchone()
+
+        if row is None:
+            _tier_stats["misses"] += 1
+            return {"found": False}
+
+        created_at, payload = row
+
         # Check if cache is still fresh
-        cached_time = datetime.fromisoformat(cached_data['timestamp'])
+        cached_time = datetime.fromtimestamp(created_at)
         age = datetime.now() - cached_time
-        
+
         if age > timedelta(days=CACHE_DURATION_DAYS):
             # Cache expired
-            cache_file.unlink()  # Delete old cache
+            if allow_stale and age <= timedelta(days=CACHE_STALE_MAX_DAYS):
+                _tier_stats["stale_hits"] += 1
+                _record_hit(cache_key, kind)
+                cached_data = {'timestamp': cached_time.isoformat(), 'result': decode_result(payload)}
+                return _build_hit(cached_data, "disk", stale=True)
+            if age > timedelta(days=_retention_days()):
+                conn.execute("DELETE FROM plans WHERE cache_key = ?", (cache_key,))
+            _tier_stats["misses"] += 1
             return {"found": False}
-        
-        return {
-            "found": True,
-            "result": cached_data['result'],
-            "cached_at": cached_data['timestamp'],
-            "age_hours": int(age.total_seconds() / 3600)
-        }
-    
+
+        # Only decompress once we know the entry will be served
+        cached_data = {'timestamp': cached_time.isoformat(), 'result': decode_result(payload)}
+
+        # Promote to memory so the next lookup skips the database
+        _memory_cache.set(cache_key, cached_data, stored_at=created_at)
+        _tier_stats["disk_hits"] += 1
+        _record_hit(cache_key, kind)
+        return _build_hit(cached_data, "disk")
+
     except Exception as e:
         print(f"Cache read error: {e}")
+        _tier_stats["misses"] += 1
         return {"found": False}
 
 
-def save_to_cache(user_request: str, result: str):
-    """Save result to cache"""
-    cache_key = get_cache_key(user_request)
-    cache_file = CACHE_DIR / f"{cache_key}.json"
-    
+def _build_hit(cached_data: dict, tier: str, stale: bool = False) -> dict:
+    """Shape a cache entry into the get_cached_result response"""
+    age = datetime.now() - datetime.fromisoformat(cached_data['timestamp'])
+    return {
+        "found": True,
+        "result": cached_data['result'],
+        "cached_at": cached_data['timestamp'],
+        "age_hours": int(age.total_seconds() / 3600),
+        "tier": tier,
+        "stale": stale
+    }
+
+
+def encode_result(result: str, compression: str = None) -> bytes:
+    """
+    Serialize a result for the disk tier: one header byte, then the payload
+
+    Args:
+        result: Plan text
+        compression: "none", "zlib" or "lzma" (defaults to CACHE_COMPRESSION)
+
+    Returns:
+        Bytes stored in the result column
+    """
+    compression = compression or CACHE_COMPRESSION
+    data = str(result).encode("utf-8")
+
+    if compression == "none" or len(data) < CACHE_COMPRESS_MIN_BYTES:
+        return FORMAT_RAW + data
+    if compression == "lzma":
+        return FORMAT_LZMA + lzma.compress(data, preset=CACHE_LZMA_PRESET)
+    return FORMAT_ZLIB + zlib.compress(data, CACHE_ZLIB_LEVEL)
+
+
+def decode_result(payload) -> str:
+    """Inverse of encode_result; plain TEXT rows written before compression pass through"""
+    if isinstance(payload, str):
+        return payload
+
+    payload = bytes(payload)
+    header, body = payload[:1], payload[1:]
+    if header == FORMAT_ZLIB:
+        return zlib.decompress(body).decode("utf-8")
+    if header == FORMAT_LZMA:
+        return lzma.decompress(body).decode("utf-8")
+    if header == FORMAT_RAW:
+        return body.decode("utf-8")
+    raise ValueError(f"Unknown cache format header: {header!r}")
+
+
+def _write_entry(conn: sqlite3.Connection, cache_key: str, created_at: float,
+                 request: str, result: str, keep_newer: bool = False, kind: str = "plan"):
+    """Insert or replace one row (optionally only if it is newer than the stored one)"""
+    sql = """
+        INSERT INTO plans (cache_key, created_at, request, result, kind)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(cache_key) DO UPDATE SET
+            created_at = excluded.created_at,
+            request = excluded.request,
+            result = excluded.result
+    """
+    if keep_newer:
+        sql += " WHERE excluded.created_at > plans.created_at"
+    conn.execute(sql, (cache_key, created_at, request, encode_result(result), kind))
+
+
+def save_to_cache(user_request: str, result: str, cache_key: str = None, kind: str = "plan"):
+    """
+    Save result to cache (writes through both tiers)
+
+    Args:
+        user_request: Request text stored alongside the entry
+        result: Plan (or stage output) text
+        cache_key: Precomputed key (hashed from user_request if not given)
+        kind: "plan" for whole plans, "stage" for per-stage outputs (not
+              counted by get_cache_count)
+    """
+    cache_key = cache_key or get_cache_key(user_request)
+
     try:
+        now = datetime.now()
         cache_data = {
-            'timestamp': datetime.now().isoformat(),
-            'request': user_request[:500],  # Store first 500 chars
+            'timestamp': now.isoformat(),
             'result': str(result)
         }
-        
-        with open(cache_file, 'w') as f:
-            json.dump(cache_data, f, indent=2)
-        
+
+        _memory_cache.set(cache_key, cache_data, stored_at=now.timestamp())
+        _tier_stats["writes"] += 1
+
+        conn = _get_connection()
+        _write_entry(
+            conn,
+            cache_key,
+            now.timestamp(),
+            user_request[:500],  # Store first 500 chars
+            cache_data['result'],
+            kind=kind
+        )
+        # Keep the full request next to the hit counter so warming can replay it
+        if kind == "plan":
+            conn.execute(
+                """
+                INSERT INTO access_stats (cache_key, request) VALUES (?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET request = excluded.request
+                """,
+                (cache_key, user_request)
+            )
+
         print(f"✅ Cached result: {cache_key}")
     except Exception as e:
         print(f"Cache write error: {e}")
 
 
-def clear_old_cache():
-    """Clear cache files older than CACHE_DURATION_DAYS"""
-    cleared = 0
+def clear_old_cache() -> int:
+    """Clear cache entries older than CACHE_DURATION_DAYS (CACHE_STALE_MAX_DAYS in stale mode)"""
+    cutoff = (datetime.now() - timedelta(days=_retention_days())).timestamp()
+
+    try:
+        cleared = _get_connection().execute(
+            "DELETE FROM plans WHERE created_at < ?", (cutoff,)
+        ).rowcount
+    except Exception as e:
+        print(f"Cache cleanup error: {e}")
+        return 0
+
+    if cleared > 0:
+        print(f"🧹 Cleared {cleared} old cache entries")
+
+    return cleared
+
+
+def _claim_owner() -> str:
+    return f"{os.getpid()}:{threading.get_ident()}"
+
+
+def claim_inflight(cache_key: str) -> bool:
+    """
+    Claim a key for generation across processes
+
+    Returns:
+        True if this caller now owns the claim, False if someone else holds it
+    """
+    conn = _get_connection()
+    now = datetime.now().timestamp()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "DELETE FROM inflight WHERE cache_key = ? AND claimed_at < ?",
+            (cache_key, now - INFLIGHT_TIMEOUT_SECONDS)
+        )
+        claimed = conn.execute(
+            "INSERT OR IGNORE INTO inflight (cache_key, owner, claimed_at) VALUES (?, ?, ?)",
+            (cache_key, _claim_owner(), now)
+        ).rowcount == 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return claimed
+
+
+def release_inflight(cache_key: str):
+    """Give back a claim taken with claim_inflight (from the same thread)"""
+    _get_connection().execute(
+        "DELETE FROM inflight WHERE cache_key = ? AND owner = ?",
+        (cache_key, _claim_owner())
+    )
+
+
+def is_inflight(cache_key: str) -> bool:
+    """Whether any process currently holds a live claim on this key"""
+    cutoff = datetime.now().timestamp() - INFLIGHT_TIMEOUT_SECONDS
+    row = _get_connection().execute(
+        "SELECT 1 FROM inflight WHERE cache_key = ? AND claimed_at >= ?",
+        (cache_key, cutoff)
+    ).fetchone()
+    return row is not None
+
+
+def _record_hit(cache_key: str, kind: str = "plan"):
+    """Count a hit; the flusher thread writes them every ACCESS_STATS_FLUSH_EVERY hits or seconds"""
+    if kind != "plan":
+        return  # stage outputs can't be warmed on their own
+    with _pending_lock:
+        _pending_hits[cache_key] += 1
+        _pending_count[0] += 1
+        due = _pending_count[0] >= ACCESS_STATS_FLUSH_EVERY
+        # Threads don't survive a fork: each process starts its own flusher
+        if _flusher["pid"] != os.getpid():
+            _flusher["pid"] = os.getpid()
+            _flusher["thread"] = threading.Thread(target=_flush_loop, name="cache-stats-flush", daemon=True)
+            _flusher["thread"].start()
+    if due:
+        _flush_wanted.set()
+
+
+def _flush_loop():
+    while True:
+        _flush_wanted.wait(ACCESS_STATS_FLUSH_SECONDS)
+        _flush_wanted.clear()
+        flush_access_stats()
+
+
+def flush_access_stats():
+    """Write buffered hit counts to the access_stats table"""
+    with _pending_lock:
+        pending = list(_pending_hits.items())
+        _pending_hits.clear()
+        _pending_count[0] = 0
+
+    if not pending:
+        return
+
+    now = datetime.now().timestamp()
+    try:
+        _get_connection().executemany(
+            """
+            INSERT INTO access_stats (cache_key, hits, last_hit_at) VALUES (?, ?, ?)
+            ON CONFLICT(cache_key) DO UPDATE SET
+                hits = hits + excluded.hits,
+                last_hit_at = excluded.last_hit_at
+            """,
+            [(key, hits, now) for key, hits in pending]
+        )
+    except Exception as e:
+        print(f"Cache stats flush error: {e}")
+
+
+def get_popular_requests(limit: int = 50, min_hits: int = 1) -> list:
+    """
+    Most frequently hit cache entries, for cache warming
+
+    Returns:
+        list of dicts with 'cache_key', 'request', 'hits', 'last_hit_at', most hits first
+    """
+    flush_access_stats()
+    rows = _get_connection().execute(
+        """
+        SELECT cache_key, request, hits, last_hit_at FROM access_stats
+        WHERE hits >= ? AND request IS NOT NULL
+        ORDER BY hits DESC LIMIT ?
+        """,
+        (min_hits, limit)
+    ).fetchall()
+    return [
+        {"cache_key": key, "request": request, "hits": hits, "last_hit_at": last_hit_at}
+        for key, request, hits, last_hit_at in rows
+    ]
+
+
+def get_entry_age_hours(cache_key: str):
+    """Age of a stored entry in hours (None if not stored), without reading the payload"""
+    row = _get_connection().execute(
+        "SELECT created_at FROM plans WHERE cache_key = ?", (cache_key,)
+    ).fetchone()
+    if row is None:
+        return None
+    return (datetime.now().timestamp() - row[0]) / 3600
+
+
+def get_cache_count() -> int:
+    """Number of cached plans (read from a maintained counter, no table scan)"""
+    try:
+        row = _get_connection().execute(
+            "SELECT value FROM cache_meta WHERE name = 'entry_count'"
+        ).fetchone()
+        return row[0] if row else 0
+    except Exception as e:
+        print(f"Cache count error: {e}")
+        return 0
+
+
+def migrate_json_cache(remove: bool = True) -> int:
+    """
+    Import legacy cache/<key>.json files into the SQLite store
+
+    Args:
+        remove: Delete each JSON file once it has been imported
+
+    Returns:
+        Number of files imported
+    """
+    conn = _get_connection()
+    imported = 0
+
     for cache_file in CACHE_DIR.glob("*.json"):
         try:
             with open(cache_file, 'r') as f:
                 cached_data = json.load(f)
-            
-            cached_time = datetime.fromisoformat(cached_data['timestamp'])
-            age = datetime.now() - cached_time
-            
-            if age > timedelta(days=CACHE_DURATION_DAYS):
+
+            created_at = datetime.fromisoformat(cached_data['timestamp']).timestamp()
+            _write_entry(
+                conn,
+                cache_file.stem,
+                created_at,
+                cached_data.get('request', ''),
+                cached_data['result'],
+                keep_newer=True
+            )
+            imported += 1
+
+            if remove:
                 cache_file.unlink()
-                cleared += 1
-        except:
-            pass
-    
-    if cleared > 0:
-        print(f"🧹 Cleared {cleared} old cache files")
+        except Exception as e:
+            print(f"Cache migration error ({cache_file.name}): {e}")
+
+    if imported > 0:
+        print(f"📦 Migrated {imported} JSON cache files into {CACHE_DB_NAME}")
+
+    return imported
+
+
+def get_cache_stats() -> dict:
+    """
+    Hit/miss counters for each cache tier
+
+    Returns:
+        dict with per-tier hits, misses, hit rate and memory tier occupancy
+    """
+    hits = _tier_stats["memory_hits"] + _tier_stats["disk_hits"] + _tier_stats["stale_hits"]
+    lookups = hits + _tier_stats["misses"]
+    return {
+        **_tier_stats,
+        "lookups": lookups,
+        "hit_rate": hits / lookups if lookups else 0.0,
+        "disk_entries": get_cache_count(),
+        "memory": _memory_cache.get_stats()
+    }
 
 
 if __name__ == "__main__":
     # Test caching
     test_request = "I want to go trekking in Himalayas, budget $500"
-    
+
     # Save test
     save_to_cache(test_request, "Test travel plan result")
-    
+
     # Retrieve test
     cached = get_cached_result(test_request)
     print("Cache test:", cached)
-    
+    print("Cache stats:", get_cache_stats())
+
     # Clear old
-    clear_old_cache()
\ No newline at end of file
+    clear_old_cache()
@@ -0,0 +1,247 @@
+"""
+LLM wrapper used by every agent
+Paces calls through the shared per-model rate limiter and routes each agent
+to a model tier, falling back along the tier's chain when a model is rate
+limited, slow or down.
+"""
+
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import litellm
+from crewai import LLM
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import replay
+from utils.budget import BudgetExceeded, check_deadline, current_budget
+from utils.rate_limit import (
+    EXPECTED_COMPLETION_TOKENS,
+    estimate_tokens,
+    get_limiter,
+    rate_limit_wait
+)
+
+# Model chains per tier: the first model is preferred, the rest are fallbacks.
+# Override with LLM_TIERS='{"large": ["groq/llama-3.3-70b-versatile", ...]}'
+DEFAULT_TIERS = {
+    "fast": ["groq/llama-3.1-8b-instant", "openai/gpt-4o-mini"],
+    "large": ["groq/llama-3.3-70b-versatile", "groq/llama-3.1-8b-instant", "openai/gpt-4o-mini"],
+}
+TIERS = {**DEFAULT_TIERS, **json.loads(os.getenv("LLM_TIERS", "{}"))}
+
+# Tier per agent. Tool-calling agents stay on the fast tier; Captain's
+# synthesis can be moved up with LLM_ROUTES='{"captain": "large"}'
+DEFAULT_ROUTES = {
+    "atlas": "fast",
+    "shelter": "fast",
+    "buddy": "fast",
+    "captain": "fast",
+}
+ROUTES = {**DEFAULT_ROUTES, **json.loads(os.getenv("LLM_ROUTES", "{}"))}
+
+# A call slower than this counts as failed and moves on to the next model
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+# Skip ahead to a fallback instead of waiting longer than this for our own limiter
+FALLBACK_MAX_WAIT_SECONDS = float(os.getenv("FALLBACK_MAX_WAIT_SECONDS", "10"))
+
+# Errors worth retrying on another model (anything else is re-raised as is)
+_FALLBACK_ERRORS = (
+    litellm.exceptions.RateLimitError,
+    litellm.exceptions.Timeout,
+    litellm.exceptions.APIConnectionError,
+    litellm.exceptions.ServiceUnavailableError,
+    litellm.exceptions.InternalServerError,
+)
+
+
+def provider_api_key(model: str):
+    """API key for a 'provider/model' name from <PROVIDER>_API_KEY"""
+    provider = model.split("/", 1)[0]
+    return os.getenv(f"{provider.upper()}_API_KEY")
+
+
+def should_fall_back(error: Exception) -> bool:
+    """Whether another model might succeed where this call failed"""
+    if isinstance(error, BudgetExceeded):
+        return False  # the stage is out of time, whichever model runs
+    if isinstance(error, _FALLBACK_ERRORS) or rate_limit_wait(error) is not None:
+        return True
+    message = str(error).lower()
+    return "timed out" in message or "timeout" in message
+
+
+class RateLimitedLLM(LLM):
+    """crewai LLM that waits for its model's requests/min and tokens/min budget"""
+
+    def expected_wait(self, messages) -> float:
+        """Seconds the limiter would hold this call back right now"""
+        return get_limiter(self.model).expected_wait(self._estimate(messages))
+
+    def _estimate(self, messages) -> int:
+        return estimate_tokens(messages) + (self.max_tokens or EXPECTED_COMPLETION_TOKENS)
+
+    def _check_deadline(self, limiter, estimate: int):
+        """Fail fast instead of waiting for the limiter past the stage's budget"""
+        if current_budget() is not None:
+            check_deadline(limiter.expected_wait(estimate))
+
+    def _complete(self, messages, callbacks) -> str:
+        """The provider call (recorded or replayed when utils.replay is on)"""
+        return replay.completion(messages, lambda: LLM.call(self, messages, callbacks))
+
+    def call(self, messages: List[Dict[str, str]], callbacks: List[Any] = []) -> str:
+        if replay.replaying():
+            return self._complete(messages, callbacks)  # no provider, nothing to pace
+
+        limiter = get_limiter(self.model)
+        prompt_tokens = estimate_tokens(messages)
+        estimate = self._estimate(messages)
+        self._check_deadline(limiter, estimate)
+        limiter.acquire(estimate)
+
+        try:
+            response = self._complete(messages, callbacks)
+        except Exception as e:
+            wait_time = rate_limit_wait(e)
+            if wait_time is not None:
+                limiter.pause(wait_time)
+            limiter.settle(estimate, prompt_tokens)
+            raise
+
+        limiter.settle(estimate, prompt_tokens + estimate_tokens(response or ""))
+        return response
+
+    def stream(self, messages: List[Dict[str, str]], on_token: Callable) -> str:
+        """
+        Like call(), but streams the answer through on_token(text)
+
+        crewai's LLM.call always requests a complete response, so this goes
+        to litellm directly.
+        """
+        if replay.replaying():
+            text = replay.completion(messages)
+            for chunk in re.split(r"(?<=\s)(?=\S)", text):
+                on_token(chunk)
+            return text
+
+        limiter = get_limiter(self.model)
+        prompt_tokens = estimate_tokens(messages)
+        estimate = self._estimate(messages)
+        self._check_deadline(limiter, estimate)
+        limiter.acquire(estimate)
+
+        parts = []
+
+        def live():
+            response = litellm.completion(
+                model=self.model,
+                messages=messages,
+                api_key=self.api_key,
+                base_url=self.base_url,
+                temperature=self.temperature,
+                timeout=self.timeout,
+                stream=True
+            )
+            for chunk in response:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    parts.append(text)
+                    on_token(text)
+                check_deadline()
+            return "".join(parts)
+
+        try:
+            replay.completion(messages, live)
+        except Exception as e:
+            wait_time = rate_limit_wait(e)
+            if wait_time is not None:
+                limiter.pause(wait_time)
+            raise
+        finally:
+            limiter.settle(estimate, prompt_tokens + estimate_tokens("".join(parts)))
+
+        return "".join(parts)
+
+
+class RoutedLLM(RateLimitedLLM):
+    """
+    Rate limited LLM with a fallback chain
+
+    Tries its own model first, then each fallback whose provider has an API
+    key. A model is skipped when our limiter would make the call wait longer
+    than FALLBACK_MAX_WAIT_SECONDS, and abandoned when the provider rate
+    limits, times out or is unavailable.
+    """
+
+    def __init__(self, model: str, fallbacks: List[str] = None, **kwargs):
+        super().__init__(model=model, **kwargs)
+        self.fallbacks = [m for m in (fallbacks or []) if m != model]
+        self._fallback_llms = {}
+
+    def chain(self) -> List[RateLimitedLLM]:
+        """This model followed by the usable fallbacks"""
+        llms = [self]
+        for model in self.fallbacks:
+            api_key = provider_api_key(model)
+            if not api_key:
+                continue
+            if model not in self._fallback_llms:
+                self._fallback_llms[model] = RateLimitedLLM(
+                    model=model, api_key=api_key, timeout=self.timeout,
+                    temperature=self.temperature, max_tokens=self.max_tokens
+                )
+            llms.append(self._fallback_llms[model])
+        return llms
+
+    def _route(self, messages, run):
+        chain = self.chain()
+        for i, llm in enumerate(chain):
+            last = i == len(chain) - 1
+            if not last and llm.expected_wait(messages) > FALLBACK_MAX_WAIT_SECONDS:
+                print(f"↪️ {llm.model} is at its rate limit; using {chain[i + 1].model}")
+                continue
+            try:
+                return run(llm)
+            except Exception as e:
+                if last or not should_fall_back(e):
+                    raise
+                print(f"↪️ {llm.model} failed ({type(e).__name__}); falling back to {chain[i + 1].model}")
+
+    def call(self, messages: List[Dict[str, str]], callbacks: List[Any] = []) -> str:
+        return self._route(messages, lambda llm: RateLimitedLLM.call(llm, messages, callbacks))
+
+    def stream(self, messages: List[Dict[str, str]], on_token: Callable) -> str:
+        started = []
+
+        def run(llm):
+            def forward(text):
+                started.append(True)
+                on_token(text)
+            try:
+                return RateLimitedLLM.stream(llm, messages, forward)
+            except BudgetExceeded:
+                raise  # the pipeline degrades the stage instead of failing the plan
+            except Exception as e:
+                if started:
+                    raise RuntimeError(f"{llm.model} failed mid-stream") from e
+                raise
+
+        # A fallback can only take over before the first token was shown
+        return self._route(messages, run)
+
+
+def create_llm(agent_name: str) -> RoutedLLM:
+    """The LLM for an agent according to ROUTES and TIERS"""
+    models = TIERS[ROUTES.get(agent_name, "fast")]
+    return RoutedLLM(
+        model=models[0],
+        fallbacks=models[1:],
+        api_key=provider_api_key(models[0]),
+        timeout=LLM_TIMEOUT_SECONDS
+    )
@@ -0,0 +1,127 @@
+"""
+In-process LRU cache with TTL and size limits
+Sits in front of slower stores so repeat lookups never leave memory
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """Thread-safe LRU cache bounded by entry count and approximate bytes"""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 32 * 1024 * 1024,
+                 ttl_seconds: float = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, size, stored_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    @staticmethod
+    def _sizeof(value) -> int:
+        """Approximate memory footprint of a cached value"""
+        if isinstance(value, (str, bytes)):
+            return len(value)
+        if isinstance(value, dict):
+            return sum(MemoryCache._sizeof(v) for v in value.values()) + sys.getsizeof(value)
+        if isinstance(value, (list, tuple)):
+            return sum(MemoryCache._sizeof(v) for v in value) + sys.getsizeof(value)
+        return sys.getsizeof(value)
+
+    def get(self, key: str):
+        """
+        Look up a key
+
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+
+            value, size, stored_at = entry
+            if self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key: str, value, stored_at: float = None):
+        """
+        Store a value, evicting least recently used entries if over limits
+
+        Args:
+            key: Cache key
+            value: Value to store
+            stored_at: Unix time the value was produced (defaults to now)
+        """
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            # Never let a single huge value flush the whole tier
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, stored_at if stored_at is not None else time.time())
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.stats["evictions"] += 1
+
+    def delete(self, key: str):
+        """Remove a key if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        # Caller must hold the lock
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get_stats(self) -> dict:
+        """Current counters plus occupancy"""
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,259 @@
+"""
+Rate limit helpers shared by everything that calls the LLM providers
+
+Each model gets a requests/min and a tokens/min token bucket. Every agent's
+LLM call takes from the buckets before it is sent, so bursts are paced on our
+side instead of being rejected by the provider. Buckets live in this process
+or, with RATE_LIMIT_SHARED, in a small SQLite file that all worker processes
+use.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Limits per model (requests and tokens per minute). Defaults follow the Groq
+# free tier; override with LLM_RATE_LIMITS='{"groq/...": {"rpm": 30, "tpm": 6000}}'
+DEFAULT_RATE_LIMITS = {
+    "groq/llama-3.1-8b-instant": {"rpm": 30, "tpm": 6000},
+    "groq/llama-3.3-70b-versatile": {"rpm": 30, "tpm": 6000},
+    "openai/gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+}
+FALLBACK_RATE_LIMIT = {"rpm": 30, "tpm": 6000}
+RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))}
+
+# Share buckets across processes (job workers, cache warming) through SQLite
+RATE_LIMIT_SHARED = os.getenv("RATE_LIMIT_SHARED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_DIR = Path(__file__).parent.parent.parent / "cache"
+RATE_LIMIT_DB_NAME = "ratelimit.db"
+
+# Completion tokens reserved per call before the real size is known
+EXPECTED_COMPLETION_TOKENS = 800
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def rate_limit_wait(error: Exception):
+    """Seconds to wait if `error` is a provider rate limit, else None"""
+    error_str = str(error)
+    if "rate_limit" not in error_str.lower():
+        return None
+    wait_match = re.search(r'(\d+\.?\d*)\s*s', error_str)
+    wait_time = float(wait_match.group(1)) if wait_match else 20
+    return min(wait_time + 5, 60)
+
+
+def estimate_tokens(messages) -> int:
+    """Rough token count of a prompt (about 4 characters per token)"""
+    if isinstance(messages, str):
+        return len(messages) // 4 + 1
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4 + 1
+
+
+class RateGate:
+    """
+    Spaces out job starts and pauses every worker after a rate limit error
+
+    Shared by all threads of a bulk run (cache warming, batch planning) so
+    they back off together instead of hammering the provider one after another.
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until this worker may start its next job"""
+        with self._lock:
+            start_at = max(time.time(), self._next_start)
+            self._next_start = start_at + self.min_interval
+        time.sleep(max(0.0, start_at - time.time()))
+
+    def pause(self, seconds: float):
+        """Hold back every worker for `seconds`"""
+        with self._lock:
+            self._next_start = max(self._next_start, time.time() + seconds)
+
+
+class TokenBucket:
+    """
+    In-process token bucket
+
+    Holds up to `capacity` tokens and refills at `per_minute` tokens a minute.
+    The balance may go negative (a correction after a call used more than
+    estimated, or a pause after a 429); callers then wait until it recovers.
+    """
+
+    def __init__(self, name: str, per_minute: float, capacity: float = None):
+        self.name = name
+        self.per_minute = per_minute
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._updated_at = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self, tokens: float, updated_at: float, now: float) -> float:
+        return min(self.capacity, tokens + (now - updated_at) * self.per_minute / 60)
+
+    def _wait_for(self, tokens: float, amount: float) -> float:
+        return (amount - tokens) * 60 / self.per_minute
+
+    def _update(self, fn) -> float:
+        """Apply fn(balance) -> (new balance, result) atomically; returns result"""
+        with self._lock:
+            now = time.time()
+            tokens, result = fn(self._refill(self._tokens, self._updated_at, now))
+            self._tokens, self._updated_at = tokens, now
+        return result
+
+    def try_take(self, amount: float) -> float:
+        """
+        Take `amount` tokens if available
+
+        Returns:
+            0 if taken, else the seconds until enough tokens will be available
+        """
+        amount = min(amount, self.capacity)  # a single huge call must still fit
+
+        def take(tokens):
+            if tokens >= amount:
+                return tokens - amount, 0.0
+            return tokens, self._wait_for(tokens, amount)
+
+        return self._update(take)
+
+    def acquire(self, amount: float = 1) -> float:
+        """Block until `amount` tokens are taken; returns seconds waited"""
+        waited = 0.0
+        while True:
+            wait_time = self.try_take(amount)
+            if wait_time <= 0:
+                return waited
+            wait_time = min(wait_time, 5.0)  # re-check: other callers may refund
+            time.sleep(wait_time)
+            waited += wait_time
+
+    def adjust(self, delta: float):
+        """Add (refund) or remove (charge) tokens without waiting"""
+        self._update(lambda tokens: (min(self.capacity, tokens + delta), None))
+
+    def drain(self, seconds: float):
+        """Empty the bucket so nothing is taken for about `seconds`"""
+        debt = seconds * self.per_minute / 60
+        self._update(lambda tokens: (min(tokens, 0.0) - debt, None))
+
+    def available(self) -> float:
+        return self._update(lambda tokens: (tokens, tokens))
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket kept in SQLite so every process on the machine shares it"""
+
+    _local = threading.local()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        db_path = RATE_LIMIT_DIR / RATE_LIMIT_DB_NAME
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.path == db_path and self._local.pid == os.getpid():
+            return conn
+
+        RATE_LIMIT_DIR.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        self._local.conn = conn
+        self._local.path = db_path
+        self._local.pid = os.getpid()
+        return conn
+
+    def _update(self, fn):
+        conn = self._get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            tokens = self._refill(*row, now) if row else self.capacity
+            tokens, result = fn(tokens)
+            conn.execute(
+                "INSERT INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, "
+                "updated_at = excluded.updated_at",
+                (self.name, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+
+class RateLimiter:
+    """Requests/min and tokens/min limits for one model"""
+
+    def __init__(self, model: str, rpm: float, tpm: float, shared: bool = False):
+        bucket = SharedTokenBucket if shared else TokenBucket
+        self.model = model
+        self.requests = bucket(f"{model}:requests", rpm)
+        self.tokens = bucket(f"{model}:tokens", tpm)
+        self.stats = {"calls": 0, "tokens": 0, "waited_seconds": 0.0, "pauses": 0}
+
+    def acquire(self, estimated_tokens: int) -> float:
+        """Wait until one request of about `estimated_tokens` may be sent"""
+        waited = self.requests.acquire(1)
+        waited += self.tokens.acquire(estimated_tokens)
+        self.stats["calls"] += 1
+        self.stats["waited_seconds"] += waited
+        return waited
+
+    def expected_wait(self, estimated_tokens: int) -> float:
+        """Seconds acquire() would block right now (without taking anything)"""
+        waits = []
+        for bucket, amount in ((self.requests, 1), (self.tokens, estimated_tokens)):
+            amount = min(amount, bucket.capacity)
+            waits.append(max(0.0, bucket._wait_for(bucket.available(), amount)))
+        return max(waits)
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the real size of a call is known"""
+        self.tokens.adjust(estimated_tokens - actual_tokens)
+        self.stats["tokens"] += actual_tokens
+
+    def pause(self, seconds: float):
+        """The provider rejected a call: hold back every caller for `seconds`"""
+        self.requests.drain(seconds)
+        self.stats["pauses"] += 1
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model: str) -> RateLimiter:
+    """The shared limiter for a model (one per process, buckets optionally shared)"""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limits = RATE_LIMITS.get(model, FALLBACK_RATE_LIMIT)
+            limiter = _limiters[model] = RateLimiter(
+                model, limits["rpm"], limits["tpm"], shared=RATE_LIMIT_SHARED
+            )
+        return limiter
+
+
+def get_rate_limit_stats() -> dict:
+    """Calls, tokens used (estimated), time spent waiting and 429 pauses per model"""
+    with _limiters_lock:
+        return {model: dict(limiter.stats) for model, limiter in _limiters.items()}
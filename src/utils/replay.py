@@ -0,0 +1,146 @@
+"""
+Record/replay of LLM completions and web searches
+Records every completion and DuckDuckGo result of a real run into a fixture
+file, then serves them back deterministically so the whole crew can be
+benchmarked and profiled without network access or provider rate limits.
+
+Usage:
+    REPLAY_MODE=record REPLAY_FILE=benchmarks/fixtures/manali.json python src/main.py
+    REPLAY_MODE=replay REPLAY_FILE=benchmarks/fixtures/manali.json python src/main.py
+    REPLAY_LATENCY=0.5 ...        # add 0.5s to every replayed call
+    REPLAY_LATENCY=recorded ...   # wait as long as the recorded call took
+
+Completions are keyed by the prompt (not the model, so routing and fallbacks
+don't matter) and searches by the normalized query. A key recorded several
+times is served in the same order. Calls crewai sends to litellm on its own
+(the instructor fallback when an answer doesn't parse into its output model)
+are not covered.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+REPLAY_MODE = os.getenv("REPLAY_MODE", "").lower()  # "", "record" or "replay"
+REPLAY_FILE = Path(os.getenv(
+    "REPLAY_FILE", Path(__file__).parent.parent.parent / "benchmarks" / "fixtures" / "replay.json"
+))
+REPLAY_LATENCY = os.getenv("REPLAY_LATENCY", "0")  # seconds, or "recorded"
+
+FIXTURE_VERSION = 1
+
+
+class ReplayMiss(KeyError):
+    """Replay asked for a call that was never recorded"""
+
+
+class Cassette:
+    """Recorded calls of one fixture file"""
+
+    def __init__(self, path: Path, latency: str = "0"):
+        self.path = Path(path)
+        self.latency = latency
+        self.calls = {"llm": {}, "search": {}}
+        self._served = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            data = json.loads(self.path.read_text())
+            self.calls.update({kind: data.get(kind, {}) for kind in self.calls})
+
+    def add(self, kind: str, key: str, value, seconds: float):
+        """Record one call and rewrite the fixture (a crashed run keeps what it had)"""
+        with self._lock:
+            self.calls[kind].setdefault(key, []).append({"value": value, "seconds": round(seconds, 3)})
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(
+                {"version": FIXTURE_VERSION, **self.calls}, ensure_ascii=False, indent=1
+            ))
+            tmp_path.replace(self.path)
+
+    def take(self, kind: str, key: str):
+        """The next recorded value for `key`, after the configured latency"""
+        with self._lock:
+            recorded = self.calls[kind].get(key)
+            if not recorded:
+                raise ReplayMiss(f"No recorded {kind} call for key {key} in {self.path}")
+            # Repeats of a key are served in order; the last one keeps being reused
+            index = self._served.get((kind, key), 0)
+            self._served[(kind, key)] = index + 1
+            call = recorded[min(index, len(recorded) - 1)]
+
+        delay = call["seconds"] if self.latency == "recorded" else float(self.latency or 0)
+        if delay > 0:
+            time.sleep(delay)
+        return call["value"]
+
+
+_cassette = None
+_mode = REPLAY_MODE
+_cassette_lock = threading.Lock()
+
+
+def configure(mode: str, path: Path = None, latency: str = None):
+    """
+    Switch record/replay on or off at runtime (benchmarks, tests)
+
+    Args:
+        mode: "record", "replay" or "" (off)
+        path: Fixture file (defaults to REPLAY_FILE)
+        latency: Seconds added to each replayed call, or "recorded"
+    """
+    global _cassette, _mode
+    with _cassette_lock:
+        _mode = mode.lower()
+        _cassette = None
+        if _mode:
+            _cassette = Cassette(path or REPLAY_FILE, REPLAY_LATENCY if latency is None else str(latency))
+
+
+def _get_cassette() -> Optional[Cassette]:
+    global _cassette
+    with _cassette_lock:
+        if _mode and _cassette is None:
+            _cassette = Cassette(REPLAY_FILE, REPLAY_LATENCY)
+        return _cassette
+
+
+def replaying() -> bool:
+    return _mode == "replay"
+
+
+def recording() -> bool:
+    return _mode == "record"
+
+
+def prompt_key(messages) -> str:
+    """Replay key of a completion: a hash of the prompt text"""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    text = json.dumps([[m.get("role"), str(m.get("content", ""))] for m in messages], ensure_ascii=False)
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def _through(kind: str, key: str, live: Callable):
+    if replaying():
+        return _get_cassette().take(kind, key)
+    if not recording():
+        return live()
+    start = time.time()
+    value = live()
+    _get_cassette().add(kind, key, value, time.time() - start)
+    return value
+
+
+def completion(messages, live: Callable[[], str] = None) -> str:
+    """Run (or record, or replay) one LLM completion; live() makes the real call (not needed when replaying)"""
+    return _through("llm", prompt_key(messages), live)
+
+
+def search(key: str, live: Callable[[], list]) -> list:
+    """Run (or record, or replay) one web search; live() makes the real call"""
+    return _through("search", key, live)
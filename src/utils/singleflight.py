@@ -0,0 +1,129 @@
+"""
+Request coalescing ("single flight")
+Concurrent callers asking for the same key share one computation instead of
+each running their own crew
+"""
+
+import threading
+import time
+
+
+class _Call:
+    """One in-flight computation that followers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls per key
+
+    Within a process, followers block on the leader's result. Across processes,
+    the leader holds a claim (see claim/release/is_claimed); followers poll
+    `recheck` (e.g. a cache lookup) until the other process has published its
+    result or given up the claim.
+    """
+
+    def __init__(self, claim=None, release=None, is_claimed=None,
+                 poll_interval: float = 1.0, wait_timeout: float = 600):
+        """
+        Args:
+            claim: callable(key) -> bool, take the cross-process claim (None = in-process only)
+            release: callable(key), give the claim back
+            is_claimed: callable(key) -> bool, whether another process holds the claim
+            poll_interval: Seconds between rechecks while another process computes
+            wait_timeout: Give up waiting on another process after this many seconds
+        """
+        self.claim = claim
+        self.release = release
+        self.is_claimed = is_claimed
+        self.poll_interval = poll_interval
+        self.wait_timeout = wait_timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "leaders": 0,
+            "coalesced": 0,
+            "cross_process_coalesced": 0,
+        }
+
+    def do(self, key: str, fn, recheck=None):
+        """
+        Run fn() once per key across all concurrent callers
+
+        Args:
+            key: Coalescing key (e.g. the plan cache key)
+            fn: Zero-argument callable producing the result
+            recheck: Optional zero-argument callable returning a finished result
+                     (or None) - used while another process is computing
+
+        Returns:
+            (result, shared) where shared is True if another caller computed it
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            self.stats["coalesced"] += 1
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        self.stats["leaders"] += 1
+        try:
+            call.result, shared = self._run_across_processes(key, fn, recheck)
+            return call.result, shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _run_across_processes(self, key: str, fn, recheck):
+        if self.claim is None:
+            return fn(), False
+
+        deadline = time.time() + self.wait_timeout
+        while not self.claim(key):
+            # Another process is computing this key; wait for it to publish
+            if recheck is not None:
+                result = recheck()
+                if result is not None:
+                    self.stats["cross_process_coalesced"] += 1
+                    return result, True
+            if time.time() > deadline:
+                # Don't wait forever on a stuck worker - compute it ourselves
+                return fn(), False
+            if self.is_claimed is not None and not self.is_claimed(key):
+                continue  # claim was released, try to take it
+            time.sleep(self.poll_interval)
+
+        try:
+            # The other process may have finished between our miss and the claim
+            if recheck is not None:
+                result = recheck()
+                if result is not None:
+                    self.stats["cross_process_coalesced"] += 1
+                    return result, True
+            return fn(), False
+        finally:
+            self.release(key)
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed in this process"""
+        with self._lock:
+            return len(self._calls)
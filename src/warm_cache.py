@@ -0,0 +1,156 @@
+"""
+Cache warming
+Pre-generates plans for popular form combinations so peak-hour users get
+instant results instead of triggering a crew
+
+Usage:
+    python src/warm_cache.py                         # warm src/data/popular_trips.json
+    python src/warm_cache.py --file my_trips.json    # JSON list or JSONL of form fields
+    python src/warm_cache.py --from-stats --top 30   # replay the most requested plans
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pipeline import TripRequest, plan_trip
+from utils.cache import CACHE_DURATION_DAYS, get_entry_age_hours, get_popular_requests
+from utils.rate_limit import RateGate, rate_limit_wait
+
+DEFAULT_TRIPS_FILE = Path(__file__).parent / "data" / "popular_trips.json"
+
+
+def load_trips(path: Path) -> list:
+    """Read TripRequests from a JSON list or a JSONL file"""
+    text = path.read_text()
+    if text.lstrip().startswith("["):
+        records = json.loads(text)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [TripRequest(**record) for record in records]
+
+
+def trips_from_stats(top: int, min_hits: int) -> list:
+    """Most requested plans according to cache access stats"""
+    trips = []
+    for entry in get_popular_requests(limit=top * 4, min_hits=min_hits):
+        try:
+            trips.append(TripRequest.model_validate_json(entry["request"]))
+        except Exception:
+            continue  # stage entries and free-text requests aren't replayable
+        if len(trips) >= top:
+            break
+    return trips
+
+
+def needs_warming(trip: TripRequest, refresh_within_hours: float) -> bool:
+    """True if the plan is missing or expires within `refresh_within_hours`"""
+    age = get_entry_age_hours(trip.cache_key())
+    if age is None:
+        return True
+    return age > CACHE_DURATION_DAYS * 24 - refresh_within_hours
+
+
+def warm_one(trip: TripRequest, gate: RateGate, max_retries: int) -> str:
+    """Generate one plan; returns 'warmed' or raises after max_retries"""
+    for attempt in range(max_retries):
+        gate.wait()
+        try:
+            plan = plan_trip(trip, refresh=True, allow_stale=False)
+        except Exception as e:
+            wait_time = rate_limit_wait(e)
+            if wait_time is None or attempt == max_retries - 1:
+                raise
+            print(f"⏳ Rate limit hit while warming {trip.destination}. Pausing all workers {int(wait_time)}s...")
+            gate.pause(wait_time)
+            continue
+        if plan["degraded"]:
+            # Incomplete plans are never cached, so nothing was warmed
+            raise RuntimeError(f"{', '.join(plan['degraded'])} ran out of time; plan not cached")
+        return "warmed"
+    return "failed"
+
+
+def warm_cache(trips: list, workers: int = 2, min_interval: float = 5.0,
+               refresh_within_hours: float = 24, max_retries: int = 3) -> dict:
+    """
+    Populate the plan cache for the given trips
+
+    Args:
+        trips: TripRequests to warm
+        workers: Max plans generated at once
+        min_interval: Min seconds between job starts (across all workers)
+        refresh_within_hours: Rebuild plans this close to expiry
+        max_retries: Attempts per plan when rate limited
+
+    Returns:
+        dict with counts of 'warmed', 'skipped' and 'failed'
+    """
+    summary = {"warmed": 0, "skipped": 0, "failed": 0}
+    todo = []
+    for trip in trips:
+        if needs_warming(trip, refresh_within_hours):
+            todo.append(trip)
+        else:
+            summary["skipped"] += 1
+
+    print(f"🔥 Warming {len(todo)} plans ({summary['skipped']} already fresh) with {workers} workers")
+
+    gate = RateGate(min_interval)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(warm_one, trip, gate, max_retries): trip for trip in todo}
+        for future in as_completed(futures):
+            trip = futures[future]
+            try:
+                summary[future.result()] += 1
+                print(f"✅ Warmed: {trip.destination} ({', '.join(trip.interest_names)})")
+            except Exception as e:
+                summary["failed"] += 1
+                print(f"❌ Failed: {trip.destination} - {e}")
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate popular travel plans")
+    parser.add_argument("--file", type=Path, default=DEFAULT_TRIPS_FILE,
+                        help="JSON list or JSONL of planner form fields")
+    parser.add_argument("--from-stats", action="store_true",
+                        help="Warm the most requested plans from cache access stats")
+    parser.add_argument("--top", type=int, default=30, help="How many plans to take from stats")
+    parser.add_argument("--min-hits", type=int, default=2, help="Ignore plans requested fewer times")
+    parser.add_argument("--workers", type=int, default=2, help="Plans generated concurrently")
+    parser.add_argument("--min-interval", type=float, default=5.0,
+                        help="Seconds between plan starts across all workers")
+    parser.add_argument("--refresh-within-hours", type=float, default=24,
+                        help="Also rebuild plans that expire within this many hours")
+    args = parser.parse_args()
+
+    if args.from_stats:
+        trips = trips_from_stats(args.top, args.min_hits)
+    else:
+        trips = load_trips(args.file)
+
+    print("=" * 60)
+    print(f"🔥 CACHE WARMING - {len(trips)} candidate plans")
+    print("=" * 60)
+
+    summary = warm_cache(
+        trips,
+        workers=args.workers,
+        min_interval=args.min_interval,
+        refresh_within_hours=args.refresh_within_hours
+    )
+
+    print("=" * 60)
+    print(f"Warmed: {summary['warmed']} | Skipped: {summary['skipped']} | Failed: {summary['failed']}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
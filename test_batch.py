@@ -0,0 +1,91 @@
+"""
+Tests for the batch planning CLI (plan_trip is replaced by a fake, no LLM calls)
+Run with: python -m pytest -q test_batch.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import batch
+
+
+@pytest.fixture
+def fake_planner(monkeypatch):
+    planned = []
+
+    def fake_plan_trip(trip, **kwargs):
+        planned.append(trip.destination or trip.notes)
+        if trip.destination == "Nowhere":
+            raise RuntimeError("no such place")
+        degraded = ["captain"] if trip.destination == "Slowville" else []
+        return {"result": f"plan for {trip.destination or trip.notes}", "cached": False, "degraded": degraded}
+
+    monkeypatch.setattr(batch, "plan_trip", fake_plan_trip)
+    return planned
+
+
+def write_requests(path, records):
+    path.write_text("\n".join(json.dumps(r) for r in records) + "\n")
+
+
+def read_output(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_every_request_gets_a_result_line(tmp_path, fake_planner):
+    requests, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_requests(requests, [
+        {"id": "manali", "destination": "Manali", "interests": ["🥾 Trekking"]},
+        {"request": "A relaxed week in Goa"},
+        {"id": "bad", "budget": "lots"},
+        {"id": "nowhere", "destination": "Nowhere"},
+    ])
+
+    summary = batch.run_batch(requests, output, workers=2, min_interval=0)
+
+    results = {r["id"]: r for r in read_output(output)}
+    assert results["manali"]["plan"] == "plan for Manali"
+    assert results["line-2"]["plan"] == "plan for A relaxed week in Goa"
+    assert results["bad"]["status"] == "failed"
+    assert results["nowhere"]["error"] == "no such place"
+    assert (summary["done"], summary["failed"]) == (2, 2)
+    assert summary["plans_per_minute"] > 0
+
+
+def test_rerun_resumes_after_the_last_finished_request(tmp_path, fake_planner):
+    requests, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_requests(requests, [{"id": f"trip-{i}", "destination": f"Place {i}"} for i in range(4)])
+    batch.run_batch(requests, output, workers=1, min_interval=0)
+    # Simulate a crash that lost the last result mid-write
+    lines = output.read_text().splitlines()
+    output.write_text("\n".join(lines[:2]) + "\n" + lines[2][:10])
+    fake_planner.clear()
+
+    summary = batch.run_batch(requests, output, workers=1, min_interval=0)
+
+    assert sorted(fake_planner) == ["Place 2", "Place 3"]
+    assert summary["skipped"] == 2
+    assert batch.completed_ids(output) == {f"trip-{i}" for i in range(4)}
+
+
+def test_incomplete_plans_are_retried_on_resume(tmp_path, fake_planner):
+    requests, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_requests(requests, [{"id": "ok", "destination": "Manali"}, {"id": "slow", "destination": "Slowville"}])
+
+    summary = batch.run_batch(requests, output, workers=1, min_interval=0)
+    fake_planner.clear()
+    batch.run_batch(requests, output, workers=1, min_interval=0)
+
+    assert (summary["done"], summary["degraded"]) == (1, 1)
+    assert read_output(output)[1]["status"] == "degraded"
+    assert fake_planner == ["Slowville"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-q", __file__]))
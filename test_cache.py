@@ -0,0 +1,254 @@
+"""
+Tests for the plan cache
+Run with: python -m pytest -q test_cache.py
+"""
+
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from utils import cache
+from utils.memory_cache import MemoryCache
+
+
+@pytest.fixture
+def isolated_cache(tmp_path, monkeypatch):
+    """Point the cache at a temp directory with empty tiers"""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    cache._memory_cache.clear()
+    cache._pending_hits.clear()
+    cache._pending_count[0] = 0
+    for name in cache._tier_stats:
+        cache._tier_stats[name] = 0
+    yield cache
+    cache._memory_cache.clear()
+
+
+def test_memory_cache_evicts_by_entry_count():
+    lru = MemoryCache(max_entries=2, max_bytes=1024)
+    lru.set("a", "1")
+    lru.set("b", "2")
+    lru.get("a")  # "b" is now least recently used
+    lru.set("c", "3")
+
+    assert lru.get("b") is None
+    assert lru.get("a") == "1"
+    assert lru.get("c") == "3"
+    assert lru.stats["evictions"] == 1
+
+
+def test_memory_cache_evicts_by_bytes():
+    lru = MemoryCache(max_entries=100, max_bytes=10)
+    lru.set("a", "x" * 6)
+    lru.set("b", "y" * 6)
+
+    assert "a" not in lru
+    assert lru.size_bytes == 6
+
+
+def test_memory_cache_ttl():
+    lru = MemoryCache(ttl_seconds=60)
+    lru.set("old", "value", stored_at=0)
+
+    assert lru.get("old") is None
+    assert lru.stats["expired"] == 1
+
+
+def test_save_then_get_hits_memory_tier(isolated_cache):
+    request = "Trekking in Himalayas, budget $500"
+    isolated_cache.save_to_cache(request, "plan")
+
+    cached = isolated_cache.get_cached_result(request)
+
+    assert cached["found"]
+    assert cached["result"] == "plan"
+    assert cached["tier"] == "memory"
+    assert isolated_cache.get_cache_stats()["memory_hits"] == 1
+
+
+def test_disk_hit_is_promoted_to_memory(isolated_cache):
+    request = "Beaches in Bali"
+    isolated_cache.save_to_cache(request, "plan")
+    isolated_cache._memory_cache.clear()
+
+    first = isolated_cache.get_cached_result(request)
+    second = isolated_cache.get_cached_result(request)
+
+    assert first["tier"] == "disk"
+    assert second["tier"] == "memory"
+    stats = isolated_cache.get_cache_stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+
+
+def test_miss_is_counted(isolated_cache):
+    assert not isolated_cache.get_cached_result("never saved")["found"]
+    assert isolated_cache.get_cache_stats()["misses"] == 1
+
+
+def test_count_tracks_inserts_and_overwrites(isolated_cache):
+    isolated_cache.save_to_cache("Bali", "plan 1")
+    isolated_cache.save_to_cache("Bali", "plan 2")
+    isolated_cache.save_to_cache("Peru", "plan 3")
+
+    assert isolated_cache.get_cache_count() == 2
+
+
+def test_count_skips_stage_entries(isolated_cache):
+    isolated_cache.save_to_cache("Bali", "plan")
+    isolated_cache.save_to_cache("[discovery] {}", "destinations", cache_key="s1", kind="stage")
+    isolated_cache.save_to_cache("[captain] {}", "plan text", cache_key="s2", kind="stage")
+    isolated_cache._get_connection().execute("DELETE FROM plans WHERE cache_key = 's1'")
+
+    assert isolated_cache.get_cache_count() == 1
+
+
+def test_forked_process_opens_its_own_connection(isolated_cache, monkeypatch):
+    parent = isolated_cache._get_connection()
+    monkeypatch.setattr(isolated_cache.os, "getpid", lambda: -1)
+
+    assert isolated_cache._get_connection() is not parent
+
+
+def test_clear_old_cache_uses_expiry_index(isolated_cache):
+    isolated_cache.save_to_cache("fresh", "plan")
+    old = (datetime.now() - timedelta(days=isolated_cache.CACHE_DURATION_DAYS + 1)).timestamp()
+    isolated_cache._write_entry(isolated_cache._get_connection(), "stale-key", old, "", "old plan")
+
+    assert isolated_cache.clear_old_cache() == 1
+    assert isolated_cache.get_cache_count() == 1
+
+
+def test_legacy_json_files_are_migrated(tmp_path, monkeypatch):
+    legacy_key = cache.get_cache_key("Iceland road trip")
+    (tmp_path / f"{legacy_key}.json").write_text(json.dumps({
+        "timestamp": datetime.now().isoformat(),
+        "request": "Iceland road trip",
+        "result": "legacy plan"
+    }))
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    cache._memory_cache.clear()
+
+    cached = cache.get_cached_result("Iceland road trip")
+
+    assert cached["found"]
+    assert cached["result"] == "legacy plan"
+    assert not list(tmp_path.glob("*.json"))
+    assert cache.get_cache_count() == 1
+
+
+def test_plan_key_ignores_order_emoji_and_case():
+    a = cache.build_plan_cache_key("Bali", ["🥾 Trekking", "📸 Photography"], 500, 5, "💵 Budget (Hostels)", True)
+    b = cache.build_plan_cache_key(" bali ", ["photography", "trekking"], 600, 4, "budget hostels", True)
+
+    assert a == b
+
+
+def test_plan_key_separates_budget_and_duration_classes():
+    base = cache.build_plan_cache_key("Bali", ["Adventure"], 500, 5, "Any", False)
+
+    assert base != cache.build_plan_cache_key("Bali", ["Adventure"], 5000, 5, "Any", False)
+    assert base != cache.build_plan_cache_key("Bali", ["Adventure"], 500, 30, "Any", False)
+    assert base != cache.build_plan_cache_key("Bali", ["Adventure"], 500, 5, "Any", True)
+
+
+def test_text_key_keeps_numbers():
+    assert cache.get_cache_key("Bali, budget $500") != cache.get_cache_key("Bali, budget $5000")
+
+
+def _write_expired(module, cache_key, result="old plan"):
+    old = (datetime.now() - timedelta(days=module.CACHE_DURATION_DAYS + 1)).timestamp()
+    module._write_entry(module._get_connection(), cache_key, old, "", result)
+
+
+def test_expired_entry_is_a_miss_by_default(isolated_cache):
+    _write_expired(isolated_cache, "k1")
+
+    assert not isolated_cache.get_cached_result("", cache_key="k1")["found"]
+
+
+def test_expired_entry_served_stale_when_allowed(isolated_cache):
+    _write_expired(isolated_cache, "k1")
+
+    cached = isolated_cache.get_cached_result("", cache_key="k1", allow_stale=True)
+
+    assert cached["found"]
+    assert cached["stale"]
+    assert cached["age_hours"] >= isolated_cache.CACHE_DURATION_DAYS * 24
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib", "lzma"])
+def test_result_encoding_round_trips(compression):
+    plan = "## Day 1\n" + "Trek to Triund, camp under the stars. " * 100
+
+    encoded = cache.encode_result(plan, compression)
+
+    assert cache.decode_result(encoded) == plan
+    if compression != "none":
+        assert len(encoded) < len(plan) / 3
+
+
+def test_small_results_are_stored_raw():
+    assert cache.encode_result("short", "zlib")[:1] == cache.FORMAT_RAW
+
+
+def test_legacy_text_rows_still_read(isolated_cache):
+    isolated_cache._get_connection().execute(
+        "INSERT INTO plans (cache_key, created_at, request, result) VALUES ('k1', ?, '', 'text plan')",
+        (datetime.now().timestamp(),)
+    )
+
+    assert isolated_cache.get_cached_result("", cache_key="k1")["result"] == "text plan"
+
+
+def test_hits_are_counted_for_popular_requests(isolated_cache):
+    isolated_cache.save_to_cache('{"destination": "Bali"}', "plan", cache_key="bali")
+    isolated_cache.save_to_cache('{"destination": "Peru"}', "plan", cache_key="peru")
+    for _ in range(3):
+        isolated_cache.get_cached_result("", cache_key="bali")
+    isolated_cache.get_cached_result("", cache_key="peru")
+
+    popular = isolated_cache.get_popular_requests(limit=10)
+
+    assert [(p["cache_key"], p["hits"]) for p in popular] == [("bali", 3), ("peru", 1)]
+    assert popular[0]["request"] == '{"destination": "Bali"}'
+
+
+def test_stage_entries_stay_out_of_popular_requests(isolated_cache):
+    isolated_cache.save_to_cache('{"destination": "Bali"}', "plan", cache_key="bali")
+    isolated_cache.save_to_cache("[discovery] {}", "destinations", cache_key="s1", kind="stage")
+    isolated_cache.get_cached_result("", cache_key="bali")
+    for _ in range(3):
+        isolated_cache.get_cached_result("", cache_key="s1", kind="stage")
+
+    popular = isolated_cache.get_popular_requests(limit=10)
+
+    assert [p["cache_key"] for p in popular] == ["bali"]
+
+
+def test_hit_counts_are_flushed_off_the_lookup_path(isolated_cache, monkeypatch):
+    import threading
+    import time
+    flushed = threading.Event()
+
+    def slow_flush():
+        time.sleep(0.5)
+        flushed.set()
+
+    monkeypatch.setattr(isolated_cache, "flush_access_stats", slow_flush)
+    start = time.time()
+    for _ in range(isolated_cache.ACCESS_STATS_FLUSH_EVERY):
+        isolated_cache._record_hit("bali")
+
+    assert time.time() - start < 0.2
+    assert flushed.wait(2)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-q", __file__]))
@@ -0,0 +1,178 @@
+"""
+Tests for the background job queue (plan_trip is replaced by a fake, no LLM calls)
+Run with: python -m pytest -q test_jobs.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import jobs
+from pipeline import TripRequest
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DIR", tmp_path)
+
+    def fake_plan_trip(trip, on_progress=None, on_token=None, **kwargs):
+        on_progress("discovery")
+        on_progress("discovery", True)
+        on_token("## Plan")
+        return {"result": f"plan for {trip.destination}", "cached": False, "stale": False,
+                "coalesced": False, "stages": {"discovery": True}}
+
+    monkeypatch.setattr(jobs, "plan_trip", fake_plan_trip)
+    return jobs
+
+
+def test_worker_drains_queue_and_stores_plan(queue):
+    job_id = queue.submit_job(TripRequest(destination="Bali"), session="s1")
+    assert queue.get_job(job_id)["status"] == "queued"
+
+    queue.run_worker("w1", exit_when_idle=True)
+
+    job = queue.get_job(job_id)
+    assert job["status"] == "done"
+    assert job["plan"]["result"] == "plan for Bali"
+    assert job["stages"] == {"discovery": True}
+    assert job["attempts"] == 1
+    assert queue.active_workers() == 0
+
+
+def test_jobs_are_claimed_in_submission_order(queue):
+    first = queue.submit_job(TripRequest(destination="Bali"))
+    second = queue.submit_job(TripRequest(destination="Peru"))
+
+    assert queue.claim_job("w1")["job_id"] == first
+    assert queue.claim_job("w2")["job_id"] == second
+    assert queue.claim_job("w3") is None
+
+
+def test_rate_limited_job_is_rescheduled_not_slept_on(queue, monkeypatch):
+    def rate_limited(trip, **kwargs):
+        raise RuntimeError("rate_limit_exceeded: try again in 12.5s")
+
+    monkeypatch.setattr(queue, "plan_trip", rate_limited)
+    job_id = queue.submit_job(TripRequest(destination="Bali"))
+
+    status = queue.run_job(queue.claim_job("w1"))
+
+    job = queue.get_job(job_id)
+    assert status == "queued"
+    assert job["status"] == "queued"
+    assert job["available_at"] > time.time() + 10
+    assert "Rate limit" in job["message"]
+    assert queue.claim_job("w1") is None  # not runnable until the backoff passes
+
+
+def test_other_errors_fail_the_job(queue, monkeypatch):
+    def broken(trip, **kwargs):
+        raise ValueError("bad request")
+
+    monkeypatch.setattr(queue, "plan_trip", broken)
+    job_id = queue.submit_job(TripRequest(destination="Bali"))
+
+    queue.run_job(queue.claim_job("w1"))
+
+    job = queue.get_job(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "bad request"
+
+
+def test_rate_limit_pauses_the_whole_queue(queue, monkeypatch):
+    def rate_limited(trip, **kwargs):
+        raise RuntimeError("rate_limit_exceeded: try again in 12.5s")
+
+    monkeypatch.setattr(queue, "plan_trip", rate_limited)
+    queue.submit_job(TripRequest(destination="Bali"))
+    queue.submit_job(TripRequest(destination="Peru"))
+
+    queue.run_job(queue.claim_job("w1"))
+
+    assert queue.paused_for() > 10
+    assert queue.claim_job("w2") is None  # Peru waits too
+
+
+def test_session_and_ip_quotas(queue, monkeypatch):
+    monkeypatch.setattr(queue, "JOB_SESSION_QUOTA", 2)
+    monkeypatch.setattr(queue, "JOB_IP_QUOTA", 3)
+    queue.submit_job(TripRequest(destination="Bali"), session="a", client_ip="1.2.3.4")
+    queue.submit_job(TripRequest(destination="Peru"), session="a", client_ip="1.2.3.4")
+
+    with pytest.raises(queue.AdmissionError):
+        queue.submit_job(TripRequest(destination="Goa"), session="a", client_ip="1.2.3.4")
+
+    queue.submit_job(TripRequest(destination="Goa"), session="b", client_ip="1.2.3.4")
+    with pytest.raises(queue.AdmissionError):
+        queue.submit_job(TripRequest(destination="Leh"), session="c", client_ip="1.2.3.4")
+
+
+def test_full_queue_turns_new_jobs_away(queue, monkeypatch):
+    monkeypatch.setattr(queue, "JOB_MAX_QUEUED", 1)
+    queue.submit_job(TripRequest(destination="Bali"))
+
+    with pytest.raises(queue.AdmissionError):
+        queue.submit_job(TripRequest(destination="Peru"))
+
+
+def test_fair_scheduling_alternates_between_sessions(queue, monkeypatch):
+    monkeypatch.setattr(queue, "JOB_SESSION_QUOTA", 10)
+    busy = [queue.submit_job(TripRequest(destination=f"Busy {i}"), session="busy") for i in range(3)]
+    other = queue.submit_job(TripRequest(destination="Other"), session="other")
+
+    assert queue.queue_position(other)["position"] == 2
+    claimed = [queue.claim_job(f"w{i}")["job_id"] for i in range(3)]
+
+    assert claimed == [busy[0], other, busy[1]]
+
+
+def test_fifo_scheduling_and_running_cap(queue, monkeypatch):
+    monkeypatch.setattr(queue, "JOB_SCHEDULING", "fifo")
+    monkeypatch.setattr(queue, "JOB_SESSION_QUOTA", 10)
+    monkeypatch.setattr(queue, "JOB_MAX_RUNNING", 2)
+    ids = [queue.submit_job(TripRequest(destination=f"Trip {i}"), session="busy") for i in range(3)]
+    queue.submit_job(TripRequest(destination="Other"), session="other")
+
+    assert queue.claim_job("w1")["job_id"] == ids[0]
+    assert queue.claim_job("w2")["job_id"] == ids[1]
+    assert queue.claim_job("w3") is None  # two already running
+    assert queue.queue_position(ids[2])["position"] == 1
+
+
+def test_jobs_of_dead_workers_are_requeued(queue):
+    job_id = queue.submit_job(TripRequest(destination="Bali"))
+    queue.claim_job("crashed-worker")  # never heartbeats
+
+    assert queue.requeue_stuck_jobs() == 1
+    assert queue.get_job(job_id)["status"] == "queued"
+
+
+def test_stale_plan_refresh_runs_after_user_jobs(queue):
+    refresh = queue.submit_refresh(TripRequest(destination="Bali"))
+    assert queue.submit_refresh(TripRequest(destination="Bali")) is None  # already pending
+    user_job = queue.submit_job(TripRequest(destination="Peru"), session="s1")
+
+    assert queue.claim_job("w1")["job_id"] == user_job
+    assert queue.claim_job("w2")["job_id"] == refresh
+
+
+def test_job_that_keeps_killing_workers_is_failed(queue):
+    job_id = queue.submit_job(TripRequest(destination="Bali"))
+    for attempt in range(queue.JOB_MAX_ATTEMPTS):
+        queue.claim_job(f"crashed-worker-{attempt}")
+        queue.requeue_stuck_jobs()
+
+    job = queue.get_job(job_id)
+    assert job["status"] == "failed"
+    assert "3 times" in job["error"]
+    assert queue.claim_job("w1") is None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-q", __file__]))
@@ -0,0 +1,439 @@
+"""
+Tests for the staged planning pipeline (crews are replaced by a fake, no LLM calls)
+Run with: python -m pytest -q test_pipeline.py
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import pipeline
+from utils import cache, rate_limit
+
+
+class FakeCrew:
+    """Stands in for crewai.Crew and records which agents ran"""
+    runs = []
+
+    def __init__(self, agents, tasks, verbose=False, **kwargs):
+        self.task = tasks[0]
+
+    def kickoff(self):
+        FakeCrew.runs.append(self.task.agent.role)
+        return f"{self.task.agent.role}: {len(self.task.description)}"
+
+
+@pytest.fixture
+def fake_pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_DIR", tmp_path)
+    monkeypatch.setattr(pipeline, "Crew", FakeCrew)
+    # Exercise Buddy by default; the direct matcher has its own tests
+    monkeypatch.setattr(pipeline, "GROUP_MATCHING", "agent")
+    cache._memory_cache.clear()
+    cache._pending_hits.clear()
+    cache._pending_count[0] = 0
+    FakeCrew.runs = []
+    yield pipeline
+    cache._memory_cache.clear()
+
+
+def make_trip(**overrides):
+    fields = dict(
+        destination="Manali",
+        interests=["🥾 Trekking", "📸 Photography"],
+        budget=500,
+        duration=5,
+        accommodation="💵 Budget (Hostels)",
+        looking_for_group=True,
+    )
+    fields.update(overrides)
+    return pipeline.TripRequest(**fields)
+
+
+def test_cold_run_executes_every_stage(fake_pipeline):
+    plan = fake_pipeline.plan_trip(make_trip())
+
+    assert not plan["cached"]
+    assert plan["stages"] == {
+        "discovery": False, "accommodation": False, "community": False, "captain": False
+    }
+    assert len(FakeCrew.runs) == 4
+
+
+def test_repeat_request_is_served_from_plan_cache(fake_pipeline):
+    fake_pipeline.plan_trip(make_trip())
+    FakeCrew.runs = []
+
+    plan = fake_pipeline.plan_trip(make_trip(budget=550))
+
+    assert plan["cached"]
+    assert FakeCrew.runs == []
+
+
+def test_changed_accommodation_only_reruns_downstream_stages(fake_pipeline):
+    fake_pipeline.plan_trip(make_trip())
+    FakeCrew.runs = []
+
+    plan = fake_pipeline.plan_trip(make_trip(accommodation="⭐ Luxury (Resorts)"))
+
+    assert plan["stages"]["discovery"] is True
+    assert plan["stages"]["community"] is True
+    assert plan["stages"]["accommodation"] is False
+    assert "Travel Discovery Specialist" not in FakeCrew.runs
+
+
+def test_community_stage_skipped_without_group(fake_pipeline):
+    plan = fake_pipeline.plan_trip(make_trip(looking_for_group=False))
+
+    assert "community" not in plan["stages"]
+    assert "Travel Community Connector" not in FakeCrew.runs
+
+
+def test_groups_matched_from_the_form_skip_buddy(fake_pipeline, monkeypatch):
+    from datetime import date
+    monkeypatch.setattr(pipeline, "GROUP_MATCHING", "direct")
+
+    plan = fake_pipeline.plan_trip(make_trip(destination="Triund", start_date=date(2026, 3, 14)))
+
+    assert plan["stages"]["community"] is True
+    assert "Travel Community Connector" not in FakeCrew.runs
+    groups = pipeline.compact_output("community", pipeline.match_groups_directly(
+        make_trip(destination="Triund", start_date=date(2026, 3, 14))
+    ))
+    assert groups.startswith("1. Adventure Squad | Triund Trek")
+
+
+def test_buddy_searches_when_nothing_matches_directly(fake_pipeline, monkeypatch):
+    monkeypatch.setattr(pipeline, "GROUP_MATCHING", "direct")
+
+    plan = fake_pipeline.plan_trip(make_trip(destination="Bali", interests=["🍜 Food"]))
+
+    assert plan["stages"]["community"] is False
+    assert "Travel Community Connector" in FakeCrew.runs
+
+
+def test_ranking_respects_budget_and_dates():
+    from datetime import date
+    from tools.group_matching import rank_groups
+
+    names = [g["name"] for g in rank_groups("Triund", ["Trekking"], budget=320)]
+    assert names[:2] == ["Solo to Group", "Adventure Squad"]
+    assert rank_groups("Triund", ["Trekking"], budget=150) == []
+    assert rank_groups("Triund", [], start_date=date(2026, 9, 1)) == []
+
+
+def test_start_date_only_keys_plans_with_group_matching():
+    from datetime import date
+
+    assert make_trip(looking_for_group=False, start_date=date(2026, 3, 1)).cache_key() == \
+        make_trip(looking_for_group=False).cache_key()
+    assert make_trip(start_date=date(2026, 3, 1)).cache_key() != make_trip().cache_key()
+
+
+def test_buddy_runs_concurrently_with_atlas(fake_pipeline, monkeypatch):
+    import threading
+    atlas_started = threading.Event()
+    buddy_started = threading.Event()
+    overlapped = []
+
+    class RendezvousCrew(FakeCrew):
+        def kickoff(self):
+            role = self.task.agent.role
+            if role == "Travel Discovery Specialist":
+                atlas_started.set()
+                overlapped.append(buddy_started.wait(5))
+            elif role == "Travel Community Connector":
+                buddy_started.set()
+                overlapped.append(atlas_started.wait(5))
+            return super().kickoff()
+
+    monkeypatch.setattr(pipeline, "Crew", RendezvousCrew)
+
+    plan = fake_pipeline.plan_trip(make_trip())
+
+    assert overlapped == [True, True]
+    assert FakeCrew.runs[-1] == "Travel Planning Coordinator"
+    assert set(plan["stages"]) == {"discovery", "accommodation", "community", "captain"}
+
+
+def test_async_plans_run_concurrently_under_the_cap(fake_pipeline, monkeypatch):
+    import asyncio
+    import threading
+    import time
+    monkeypatch.setattr(pipeline, "_async_semaphores", type(pipeline._async_semaphores)())
+    monkeypatch.setattr(pipeline, "PLAN_CONCURRENCY", 3)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_plan_trip(trip, **kwargs):
+        with lock:
+            active.append(trip.destination)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(trip.destination)
+        return {"result": f"plan for {trip.destination}"}
+
+    monkeypatch.setattr(pipeline, "plan_trip", slow_plan_trip)
+
+    async def plan_many():
+        trips = [make_trip(destination=f"Place {i}") for i in range(9)]
+        return await asyncio.gather(*(pipeline.plan_trip_async(t) for t in trips))
+
+    results = asyncio.run(plan_many())
+
+    assert [r["result"] for r in results] == [f"plan for Place {i}" for i in range(9)]
+    assert max(peak) == 3
+
+
+def test_stale_plan_is_served_and_refreshed(fake_pipeline, monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(pipeline, "_queue_refresh", lambda trip: refreshed.append(trip.cache_key()))
+    trip = make_trip()
+    old = (datetime.now() - timedelta(days=cache.CACHE_DURATION_DAYS + 1)).timestamp()
+    cache._write_entry(cache._get_connection(), trip.cache_key(), old, "", "old plan")
+
+    plan = fake_pipeline.plan_trip(trip, allow_stale=True)
+
+    assert plan["stale"]
+    assert plan["result"] == "old plan"
+    assert refreshed == [trip.cache_key()]
+    assert FakeCrew.runs == []
+
+
+def test_stale_plan_is_rebuilt_here_without_workers(fake_pipeline, monkeypatch):
+    import threading
+    import jobs
+    queued = []
+    done = threading.Event()
+    refresh_plan = pipeline._refresh_plan
+
+    def tracked_refresh(trip):
+        refresh_plan(trip)
+        done.set()
+
+    monkeypatch.setattr(jobs, "active_workers", lambda: 0)
+    monkeypatch.setattr(jobs, "submit_refresh", queued.append)
+    monkeypatch.setattr(pipeline, "_refresh_plan", tracked_refresh)
+    trip = make_trip()
+    old = (datetime.now() - timedelta(days=cache.CACHE_DURATION_DAYS + 1)).timestamp()
+    cache._write_entry(cache._get_connection(), trip.cache_key(), old, "", "old plan")
+
+    assert fake_pipeline.plan_trip(trip, allow_stale=True)["result"] == "old plan"
+    assert done.wait(5)
+
+    assert queued == []
+    assert FakeCrew.runs
+    fresh = cache.get_cached_result("", cache_key=trip.cache_key(), allow_stale=False)
+    assert fresh["found"]
+    assert fresh["result"] != "old plan"
+
+
+def test_stale_plan_is_queued_when_workers_run(fake_pipeline, monkeypatch):
+    import jobs
+    queued = []
+    monkeypatch.setattr(jobs, "active_workers", lambda: 1)
+    monkeypatch.setattr(jobs, "submit_refresh", queued.append)
+    trip = make_trip()
+    old = (datetime.now() - timedelta(days=cache.CACHE_DURATION_DAYS + 1)).timestamp()
+    cache._write_entry(cache._get_connection(), trip.cache_key(), old, "", "old plan")
+
+    fake_pipeline.plan_trip(trip, allow_stale=True)
+
+    assert queued == [trip]
+    assert FakeCrew.runs == []
+
+
+def test_slow_stage_is_cut_off_and_captain_plans_without_it(fake_pipeline, monkeypatch):
+    import threading
+    import time
+    from utils import budget
+    release = threading.Event()
+
+    class SlowAtlasCrew(FakeCrew):
+        def kickoff(self):
+            if self.task.agent.role == "Travel Discovery Specialist":
+                release.wait(5)
+            return super().kickoff()
+
+    monkeypatch.setattr(pipeline, "Crew", SlowAtlasCrew)
+    monkeypatch.setitem(budget.STAGE_BUDGETS, "discovery", {"seconds": 0.3, "max_iter": 2})
+
+    start = time.time()
+    plan = fake_pipeline.plan_trip(make_trip())
+    release.set()
+
+    assert time.time() - start < 2
+    assert plan["degraded"] == ["discovery", "accommodation"]
+    assert "Accommodation Specialist" not in FakeCrew.runs
+    assert FakeCrew.runs[-1] == "Travel Planning Coordinator"
+    # An incomplete plan is not cached
+    assert fake_pipeline.lookup_plan(make_trip()) is None
+
+
+def test_captain_out_of_time_returns_what_the_agents_found(fake_pipeline, monkeypatch):
+    from utils.budget import BudgetExceeded
+
+    class OutOfTimeCaptainCrew(FakeCrew):
+        def kickoff(self):
+            if self.task.agent.role == "Travel Planning Coordinator":
+                raise BudgetExceeded("captain ran out of time")
+            return super().kickoff()
+
+    monkeypatch.setattr(pipeline, "Crew", OutOfTimeCaptainCrew)
+
+    plan = fake_pipeline.plan_trip(make_trip())
+
+    assert plan["degraded"] == ["captain"]
+    assert plan["result"].startswith("⏱️ The full itinerary could not be finished in time")
+    assert "Travel Discovery Specialist:" in plan["result"]
+
+
+def test_captain_out_of_time_while_streaming_returns_what_the_agents_found(fake_pipeline, monkeypatch):
+    import time
+    from types import SimpleNamespace
+    import litellm
+    from utils import budget
+
+    def slow_completion(**kwargs):
+        for text in ["## Plan", " for", " Manali"]:
+            time.sleep(0.3)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    monkeypatch.setattr(litellm, "completion", slow_completion)
+    monkeypatch.setitem(budget.STAGE_BUDGETS, "captain", {"seconds": 0.5, "max_iter": 1})
+    tokens = []
+
+    plan = fake_pipeline.plan_trip(make_trip(), on_token=tokens.append)
+
+    assert tokens[0] == "## Plan"
+    assert plan["degraded"] == ["captain"]
+    assert plan["result"].startswith("⏱️ The full itinerary could not be finished in time")
+    assert fake_pipeline.lookup_plan(make_trip()) is None
+
+
+def test_tools_stop_answering_once_the_stage_budget_is_spent():
+    from tools.community_db import community_db_tool
+    from utils.budget import WRAP_UP_MESSAGE, StageBudget, stage_budget
+
+    with stage_budget(StageBudget("community", seconds=60, max_tool_calls=1)):
+        first = community_db_tool._run("trekking")
+        second = community_db_tool._run("trekking")
+
+    assert first != WRAP_UP_MESSAGE
+    assert second == WRAP_UP_MESSAGE
+    assert community_db_tool._run("trekking") == first
+
+
+def test_captain_streams_in_calling_thread_and_is_cached(fake_pipeline, monkeypatch):
+    import threading
+    from types import SimpleNamespace
+    calls = []
+
+    def fake_completion(**kwargs):
+        calls.append(kwargs)
+        for text in ["## Plan", " for", " Manali"]:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    import litellm
+    monkeypatch.setattr(litellm, "completion", fake_completion)
+    tokens = []
+    threads = set()
+
+    def on_token(text):
+        tokens.append(text)
+        threads.add(threading.current_thread())
+
+    plan = fake_pipeline.plan_trip(make_trip(), on_token=on_token)
+
+    assert tokens == ["## Plan", " for", " Manali"]
+    assert threads == {threading.current_thread()}
+    assert plan["result"] == "## Plan for Manali"
+    assert calls[0]["stream"] is True
+    assert "Travel Planning Coordinator" not in FakeCrew.runs
+    assert fake_pipeline.plan_trip(make_trip())["result"] == "## Plan for Manali"
+
+
+def test_structured_outputs_are_cached_as_json_and_forwarded_compactly(fake_pipeline, monkeypatch):
+    from types import SimpleNamespace
+    from tasks.models import Destination, DiscoveryResult
+    descriptions = {}
+    discovery = DiscoveryResult(destinations=[
+        Destination(name="Old Manali", location="Himachal", estimated_budget_usd=450,
+                    why="Trails and cafes", best_time="Mar-Jun")
+    ])
+
+    class StructuredCrew(FakeCrew):
+        def kickoff(self):
+            descriptions[self.task.agent.role] = self.task.description
+            if self.task.agent.role == "Travel Discovery Specialist":
+                return SimpleNamespace(pydantic=discovery)
+            return super().kickoff()
+
+    monkeypatch.setattr(pipeline, "Crew", StructuredCrew)
+
+    fake_pipeline.plan_trip(make_trip())
+
+    cached = cache.get_cached_result(
+        "", cache_key=cache.build_stage_cache_key("discovery", pipeline._discovery_inputs(make_trip()))
+    )
+    assert DiscoveryResult.model_validate_json(cached["result"]) == discovery
+    for role in ["Accommodation Specialist", "Travel Planning Coordinator"]:
+        assert "1. Old Manali (Himachal) | ~$450 | best: Mar-Jun | Trails and cafes" in descriptions[role]
+        assert '"destinations"' not in descriptions[role]
+
+
+def test_importing_pipeline_and_jobs_does_not_load_crewai():
+    import subprocess
+    code = (
+        f"import sys; sys.path.insert(0, {str(Path(__file__).parent / 'src')!r}); "
+        "import pipeline, jobs, main; print('crewai' in sys.modules, 'litellm' in sys.modules)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout
+
+    assert output.split() == ["False", "False"]
+
+
+def test_warming_skips_fresh_plans_and_builds_missing_ones(fake_pipeline):
+    import warm_cache
+    fresh = make_trip(destination="Bali")
+    fake_pipeline.plan_trip(fresh)
+    FakeCrew.runs = []
+
+    summary = warm_cache.warm_cache([fresh, make_trip(destination="Peru")], workers=2, min_interval=0)
+
+    assert summary == {"warmed": 1, "skipped": 1, "failed": 0}
+    assert len(FakeCrew.runs) == 4
+    assert fake_pipeline.plan_trip(make_trip(destination="Peru"))["cached"]
+
+
+def test_warming_counts_incomplete_plans_as_failed(fake_pipeline, monkeypatch):
+    import warm_cache
+    monkeypatch.setattr(warm_cache, "plan_trip", lambda trip, **kwargs: {"result": "partial", "degraded": ["captain"]})
+
+    summary = warm_cache.warm_cache([make_trip(destination="Peru")], workers=1, min_interval=0)
+
+    assert summary == {"warmed": 0, "skipped": 0, "failed": 1}
+
+
+def test_warming_from_stats_replays_structured_requests(fake_pipeline):
+    import warm_cache
+    trip = make_trip(destination="Bali")
+    fake_pipeline.plan_trip(trip)
+    fake_pipeline.plan_trip(trip)
+    fake_pipeline.plan_trip(trip)
+
+    trips = warm_cache.trips_from_stats(top=5, min_hits=2)
+
+    assert trips == [trip]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-q", __file__]))
@@ -0,0 +1,180 @@
+"""
+Tests for the client-side LLM rate limiter (no provider calls)
+Run with: python -m pytest -q test_rate_limit.py
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from crewai import LLM
+
+from utils import llm as llm_module
+from utils import rate_limit
+from utils.llm import RateLimitedLLM, RoutedLLM
+
+
+@pytest.fixture
+def limiter_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_DIR", tmp_path)
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    return tmp_path
+
+
+def test_bucket_paces_bursts():
+    bucket = rate_limit.TokenBucket("test", per_minute=1200, capacity=2)  # 20/s
+
+    start = time.time()
+    waits = [bucket.acquire(1) for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert time.time() - start >= 0.09
+
+
+def test_oversized_request_is_clamped_to_capacity():
+    bucket = rate_limit.TokenBucket("test", per_minute=60, capacity=10)
+
+    assert bucket.try_take(500) == 0
+    assert bucket.try_take(1) > 0
+
+
+def test_drain_blocks_until_the_pause_is_over():
+    bucket = rate_limit.TokenBucket("test", per_minute=60)
+
+    bucket.drain(30)
+
+    assert bucket.try_take(1) >= 30
+
+
+def test_shared_buckets_see_each_others_usage(limiter_dir):
+    first = rate_limit.SharedTokenBucket("model:requests", per_minute=60, capacity=3)
+    second = rate_limit.SharedTokenBucket("model:requests", per_minute=60, capacity=3)
+
+    assert first.try_take(2) == 0
+    assert second.try_take(1) == 0
+    assert first.try_take(1) > 0
+
+
+def test_limiter_is_shared_by_threads():
+    limiter = rate_limit.RateLimiter("test-model", rpm=5, tpm=10**6)
+    taken = []
+
+    def call():
+        if limiter.requests.try_take(1) == 0:
+            taken.append(1)
+
+    threads = [threading.Thread(target=call) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(taken) == 5
+
+
+def test_rate_limited_llm_paces_and_settles(limiter_dir, monkeypatch):
+    monkeypatch.setattr(LLM, "call", lambda self, messages, callbacks=[]: "x" * 400)
+    llm = RateLimitedLLM(model="groq/llama-3.1-8b-instant", api_key="test")
+
+    assert llm.call([{"role": "user", "content": "y" * 4000}]) == "x" * 400
+
+    limiter = rate_limit.get_limiter("groq/llama-3.1-8b-instant")
+    assert limiter.stats["calls"] == 1
+    # Only the real usage (~1000 prompt + ~100 completion tokens) stays charged
+    used = limiter.tokens.capacity - limiter.tokens.available()
+    assert 1000 <= used < 1200
+
+
+def test_provider_rate_limit_pauses_every_caller(limiter_dir, monkeypatch):
+    def rejected(self, messages, callbacks=[]):
+        raise RuntimeError("rate_limit_exceeded: please try again in 20s")
+
+    monkeypatch.setattr(LLM, "call", rejected)
+    llm = RateLimitedLLM(model="groq/llama-3.1-8b-instant", api_key="test")
+
+    with pytest.raises(RuntimeError):
+        llm.call([{"role": "user", "content": "hi"}])
+
+    limiter = rate_limit.get_limiter("groq/llama-3.1-8b-instant")
+    assert limiter.stats["pauses"] == 1
+    assert limiter.requests.try_take(1) > 20
+
+
+def test_llm_call_refuses_to_start_past_the_stage_deadline(limiter_dir, monkeypatch):
+    from utils.budget import BudgetExceeded, StageBudget, stage_budget
+    tried = fake_provider(monkeypatch, {})
+    llm = RoutedLLM(model="groq/llama-3.1-8b-instant", fallbacks=["openai/gpt-4o-mini"], api_key="test")
+    budget = StageBudget("discovery", seconds=60)
+    budget.expires_at = time.time() - 1
+
+    with stage_budget(budget), pytest.raises(BudgetExceeded):
+        llm.call([{"role": "user", "content": "hi"}])
+    assert tried == []
+
+
+def fake_provider(monkeypatch, failing):
+    """LLM.call that fails for models in `failing` and records every model tried"""
+    tried = []
+
+    def call(self, messages, callbacks=[]):
+        tried.append(self.model)
+        if self.model in failing:
+            raise failing[self.model]
+        return f"answer from {self.model}"
+
+    monkeypatch.setattr(LLM, "call", call)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    return tried
+
+
+def test_router_falls_back_when_rate_limited(limiter_dir, monkeypatch):
+    tried = fake_provider(monkeypatch, {
+        "groq/llama-3.1-8b-instant": RuntimeError("rate_limit_exceeded: try again in 2s")
+    })
+    llm = RoutedLLM(model="groq/llama-3.1-8b-instant", fallbacks=["openai/gpt-4o-mini"], api_key="test")
+
+    assert llm.call([{"role": "user", "content": "hi"}]) == "answer from openai/gpt-4o-mini"
+    assert tried == ["groq/llama-3.1-8b-instant", "openai/gpt-4o-mini"]
+
+
+def test_router_skips_a_model_our_limiter_is_holding_back(limiter_dir, monkeypatch):
+    tried = fake_provider(monkeypatch, {})
+    rate_limit.get_limiter("groq/llama-3.1-8b-instant").pause(30)
+    llm = RoutedLLM(model="groq/llama-3.1-8b-instant", fallbacks=["openai/gpt-4o-mini"], api_key="test")
+
+    llm.call([{"role": "user", "content": "hi"}])
+
+    assert tried == ["openai/gpt-4o-mini"]
+
+
+def test_router_reraises_errors_another_model_would_not_fix(limiter_dir, monkeypatch):
+    tried = fake_provider(monkeypatch, {"groq/llama-3.1-8b-instant": ValueError("bad prompt")})
+    llm = RoutedLLM(model="groq/llama-3.1-8b-instant", fallbacks=["openai/gpt-4o-mini"], api_key="test")
+
+    with pytest.raises(ValueError):
+        llm.call([{"role": "user", "content": "hi"}])
+    assert tried == ["groq/llama-3.1-8b-instant"]
+
+
+def test_fallbacks_without_an_api_key_are_left_out(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    llm = RoutedLLM(model="groq/llama-3.1-8b-instant", fallbacks=["openai/gpt-4o-mini"], api_key="test")
+
+    assert [l.model for l in llm.chain()] == ["groq/llama-3.1-8b-instant"]
+
+
+def test_routes_pick_the_tier_per_agent(monkeypatch):
+    monkeypatch.setitem(llm_module.ROUTES, "captain", "large")
+
+    assert llm_module.create_llm("captain").model == "groq/llama-3.3-70b-versatile"
+    assert llm_module.create_llm("atlas").model == "groq/llama-3.1-8b-instant"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-q", __file__]))
@@ -0,0 +1,107 @@
+"""
+Tests for recording and replaying LLM and search calls (no network)
+Run with: python -m pytest -q test_replay.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from crewai import LLM
+
+from tools import web_search
+from utils import rate_limit, replay
+from utils.llm import RateLimitedLLM
+
+MESSAGES = [{"role": "user", "content": "Suggest a trek"}]
+
+
+class OfflineDDGS:
+    """DDGS that fails like a machine without network"""
+
+    def __init__(self, timeout=None):
+        pass
+
+    def __enter__(self):
+        raise ConnectionError("no network")
+
+    def __exit__(self, *args):
+        return False
+
+
+class OneResultDDGS(OfflineDDGS):
+    def __enter__(self):
+        return self
+
+    def text(self, query, max_results=5):
+        return [{"title": f"About {query}", "body": "body", "href": "https://example.com"}]
+
+
+@pytest.fixture
+def fixture_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_DIR", tmp_path)
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    web_search._search_cache.clear()
+    web_search._client_pool.close()
+    yield tmp_path / "fixture.json"
+    replay.configure("")
+    web_search._search_cache.clear()
+    web_search._client_pool.close()
+
+
+def record_a_run(path, monkeypatch):
+    replay.configure("record", path)
+    monkeypatch.setattr(LLM, "call", lambda self, messages, callbacks=[]: "Try Triund")
+    monkeypatch.setattr(web_search, "DDGS", OneResultDDGS)
+    llm = RateLimitedLLM(model="groq/llama-3.1-8b-instant", api_key="test")
+    answer = llm.call(MESSAGES)
+    results = web_search.web_search_tool._run("treks near Manali")
+    return answer, results
+
+
+def test_replay_serves_a_recorded_run_without_network(fixture_file, monkeypatch):
+    answer, results = record_a_run(fixture_file, monkeypatch)
+
+    def offline(self, messages, callbacks=[]):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(LLM, "call", offline)
+    monkeypatch.setattr(web_search, "DDGS", OfflineDDGS)
+    web_search._search_cache.clear()
+    replay.configure("replay", fixture_file)
+    llm = RateLimitedLLM(model="openai/gpt-4o-mini", api_key="test")
+
+    assert llm.call(MESSAGES) == answer == "Try Triund"
+    assert web_search.web_search_tool._run("treks near Manali") == results
+    tokens = []
+    assert llm.stream(MESSAGES, tokens.append) == "Try Triund"
+    assert tokens == ["Try ", "Triund"]
+
+
+def test_replay_fails_loudly_on_unrecorded_calls(fixture_file, monkeypatch):
+    record_a_run(fixture_file, monkeypatch)
+    replay.configure("replay", fixture_file)
+    llm = RateLimitedLLM(model="groq/llama-3.1-8b-instant", api_key="test")
+
+    with pytest.raises(replay.ReplayMiss):
+        llm.call([{"role": "user", "content": "Something new"}])
+
+
+def test_replay_can_inject_latency(fixture_file, monkeypatch):
+    record_a_run(fixture_file, monkeypatch)
+    replay.configure("replay", fixture_file, latency=0.2)
+    llm = RateLimitedLLM(model="groq/llama-3.1-8b-instant", api_key="test")
+
+    start = time.time()
+    llm.call(MESSAGES)
+
+    assert time.time() - start >= 0.2
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-q", __file__]))
@@ -0,0 +1,108 @@
+"""
+Tests for request coalescing
+Run with: python -m pytest -q test_singleflight.py
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from utils import cache
+from utils.singleflight import SingleFlight
+
+
+@pytest.fixture
+def isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    cache._memory_cache.clear()
+    yield cache
+    cache._memory_cache.clear()
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def compute():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return "plan"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", compute))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    while flight.stats["coalesced"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+
+    assert len(runs) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert all(result == "plan" for result, _ in results)
+
+
+def test_followers_see_leader_error():
+    flight = SingleFlight()
+
+    def boom():
+        raise RuntimeError("rate_limit")
+
+    with pytest.raises(RuntimeError):
+        flight.do("k", boom)
+    assert flight.in_flight() == 0
+
+
+def test_claims_are_exclusive_and_released(isolated_cache):
+    assert isolated_cache.claim_inflight("k")
+    assert isolated_cache.is_inflight("k")
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(isolated_cache.claim_inflight("k")))
+    t.start()
+    t.join()
+    assert other == [False]
+
+    isolated_cache.release_inflight("k")
+    assert not isolated_cache.is_inflight("k")
+
+
+def test_waits_for_other_process_result(isolated_cache):
+    # Simulate another process holding the claim
+    isolated_cache._get_connection().execute(
+        "INSERT INTO inflight (cache_key, owner, claimed_at) VALUES ('k', 'other', ?)",
+        (time.time(),)
+    )
+    flight = SingleFlight(
+        claim=isolated_cache.claim_inflight,
+        release=isolated_cache.release_inflight,
+        is_claimed=isolated_cache.is_inflight,
+        poll_interval=0.01
+    )
+    checks = []
+
+    def recheck():
+        checks.append(1)
+        return "their plan" if len(checks) >= 3 else None
+
+    result, shared = flight.do("k", lambda: "our plan", recheck=recheck)
+
+    assert (result, shared) == ("their plan", True)
+    assert flight.stats["cross_process_coalesced"] == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-q", __file__]))
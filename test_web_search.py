@@ -0,0 +1,198 @@
+"""
+Tests for the web search tool (DuckDuckGo is replaced by a fake, no network)
+Run with: python -m pytest -q test_web_search.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from tools import web_search
+
+
+class FakeDDGS:
+    """Stands in for duckduckgo_search.DDGS and counts live searches"""
+    searches = []
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def text(self, query, max_results=5):
+        FakeDDGS.searches.append(query)
+        return [
+            {"title": f"Result {i} for {query}", "body": "body", "href": f"https://example.com/{i}"}
+            for i in range(max_results)
+        ]
+
+
+@pytest.fixture
+def tool(monkeypatch):
+    monkeypatch.setattr(web_search, "DDGS", FakeDDGS)
+    web_search._client_pool.close()
+    web_search._search_cache.clear()
+    web_search._search_cache.stats.update(hits=0, misses=0)
+    FakeDDGS.searches = []
+    yield web_search.WebSearchTool()
+    web_search._search_cache.clear()
+    web_search._client_pool.close()
+
+
+def test_normalize_query_ignores_case_punctuation_and_filler():
+    assert web_search.normalize_query("Budget hotels in Manali!") == \
+        web_search.normalize_query("budget  hotels, the manali")
+    assert web_search.normalize_query("hotels under $30") != \
+        web_search.normalize_query("hotels under $300")
+
+
+def test_normalize_query_keeps_meaning():
+    assert web_search.normalize_query("flights from delhi to goa") != \
+        web_search.normalize_query("flights from goa to delhi")
+    assert web_search.normalize_query("best time to visit Spiti") != \
+        web_search.normalize_query("visit Spiti time")
+
+
+def test_near_identical_queries_hit_the_cache(tool):
+    first = tool._run("budget hotels in Manali")
+    second = tool._run("Budget hotels, Manali")
+
+    assert len(FakeDDGS.searches) == 1
+    assert "Search results for 'Budget hotels, Manali'" in second
+    assert first.split("\n", 1)[1] == second.split("\n", 1)[1]
+    stats = web_search.get_search_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_max_results_is_part_of_the_key(tool):
+    tool._run("trekking Himalayas")
+    tool.max_results = 3
+    tool._run("trekking Himalayas")
+
+    assert len(FakeDDGS.searches) == 2
+
+
+class PerQueryDDGS(FakeDDGS):
+    """FakeDDGS whose URLs differ between queries"""
+
+    def text(self, query, max_results=5):
+        results = super().text(query, max_results)
+        for result in results:
+            result["href"] += "/" + query.replace(" ", "-")
+        return results
+
+
+def test_several_queries_run_concurrently_and_merge_by_url(tool, monkeypatch):
+    import threading
+    barrier = threading.Barrier(3, timeout=5)
+
+    class OverlappingDDGS(PerQueryDDGS):
+        def text(self, query, max_results=5):
+            barrier.wait()  # only passes if all three searches are in flight together
+            results = super().text(query, max_results)
+            results.append({"title": "Shared", "body": "body", "href": "https://example.com/shared/"})
+            return results
+
+    monkeypatch.setattr(web_search, "DDGS", OverlappingDDGS)
+    tool.max_results = 2
+
+    output = tool._run(queries=["treks Manali", "hostels Manali", "Treks in Manali!", "cafes Manali"])
+
+    assert sorted(FakeDDGS.searches) == ["cafes Manali", "hostels Manali", "treks Manali"]
+    assert output.startswith("Search results for 'treks Manali', 'hostels Manali', 'cafes Manali'")
+    assert output.count("example.com/shared") == 1
+    assert output.index("Result 0 for cafes Manali") < output.index("Result 1 for treks Manali")
+
+
+def test_list_passed_as_query_is_searched_too(tool, monkeypatch):
+    monkeypatch.setattr(web_search, "DDGS", PerQueryDDGS)
+    output = tool._run(query=["treks Manali", "treks Kasol"])
+
+    assert len(FakeDDGS.searches) == 2
+    assert "Result 0 for treks Kasol" in output
+
+
+def test_search_clients_are_reused_bounded_and_replaced_after_errors(monkeypatch):
+    import threading
+    created = []
+    in_use = []
+    peak = []
+    lock = threading.Lock()
+
+    class CountingDDGS(FakeDDGS):
+        def __init__(self, timeout=None):
+            created.append(self)
+
+        def text(self, query, max_results=5):
+            with lock:
+                in_use.append(self)
+                peak.append(len(in_use))
+            try:
+                if query == "fail":
+                    raise RuntimeError("202 Ratelimit")
+                return super().text(query, max_results)
+            finally:
+                with lock:
+                    in_use.remove(self)
+
+    monkeypatch.setattr(web_search, "DDGS", CountingDDGS)
+    pool = web_search.SearchClientPool(size=2, timeout=5)
+
+    pool.text("treks", 1)
+    pool.text("hostels", 1)
+    assert len(created) == 1  # kept alive between searches
+
+    with pytest.raises(RuntimeError):
+        pool.text("fail", 1)
+    pool.text("cafes", 1)
+    assert len(created) == 2  # the failed client was not reused
+
+    threads = [threading.Thread(target=pool.text, args=(f"q{i}", 1)) for i in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) <= 2
+    assert len({id(c) for c in created}) <= 3
+
+    pool.close()
+    assert pool._idle == []
+
+
+def test_search_waiting_for_a_client_takes_the_slot_of_a_discarded_one(monkeypatch):
+    import threading
+    import time
+    failing = threading.Event()
+
+    class FlakyDDGS(FakeDDGS):
+        def text(self, query, max_results=5):
+            if query == "fail":
+                failing.set()
+                time.sleep(0.2)  # the other search is now waiting for this client
+                raise RuntimeError("202 Ratelimit")
+            return super().text(query, max_results)
+
+    monkeypatch.setattr(web_search, "DDGS", FlakyDDGS)
+    pool = web_search.SearchClientPool(size=1, timeout=5)
+    failed = threading.Thread(target=lambda: pytest.raises(RuntimeError, pool.text, "fail", 1))
+    failed.start()
+    failing.wait(1)
+
+    start = time.time()
+    assert pool.text("treks", 1)
+    failed.join()
+
+    assert time.time() - start < 2
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-q", __file__]))